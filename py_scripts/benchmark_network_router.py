@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import tracemalloc
+
+# the router lives in server/reels_scroller like the automator that uses it
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from reels_scroller.network_router import NetworkRouter, GRAPHQL_URL, CLIPS_HOME, CLIPS_USER, USER_INFO, FEED_TIMELINE, ROOT_DECODERS
+
+# CPU per graphql response: one listener per phase that never unregisters (every listener of the earlier
+# phases decodes the body again) vs the router (decoded once, dispatched by root key, bodies of
+# operations nobody reads are skipped). half of the fake traffic are queries the scraper ignores.
+# and decode time / memory per thousand reels: full media dicts (json.loads) vs typed records (msgspec)
+#   python -m py_scripts.benchmark_network_router [responses]
+
+LEFTOVER_LISTENERS = 4  # reels, profile reels, bios, target app: what a page had after one loop
+IGNORED_ROOT = "xdt_api__v1__discover__chaining"
+
+def fake_media(i: int) -> dict:
+    # roughly the shape / size of a clips media node
+    return {
+        "code": f"C{i:010d}", "pk": str(3_000_000_000 + i), "taken_at": 1_714_000_000 + i,
+        "caption": {"text": "✅ Play on FUN88 this IPL - Instant Deposits & Withdrawals " * 3, "pk": str(i)},
+        "user": {"username": f"user_{i}", "pk": str(i), "profile_pic_url": "https://instagram.example/p/" + "x" * 120, "is_verified": False},
+        "image_versions2": {"candidates": [{"url": "https://instagram.example/v/" + "y" * 300, "width": 640, "height": 1136}] * 8},
+        "video_versions": [{"url": "https://instagram.example/o/" + "z" * 300, "type": 101, "width": 720}] * 4,
+        "clips_metadata": {"music_info": None, "original_sound_info": {"audio_asset_id": str(i), "progressive_download_url": "a" * 200}},
+        "like_count": i * 7, "comment_count": i, "play_count": i * 100,
+    }
+
+def fake_body(root_key: str) -> bytes:
+    connection = {"edges": [{"node": {"media": fake_media(i)}} for i in range(12)], "page_info": {"has_next_page": True, "end_cursor": "c" * 40}}
+    return json.dumps({"data": {root_key: connection}, "extensions": {"is_final": True}}).encode("utf-8")
+
+class FakeRequest:
+    def __init__(self, operation: str):
+        self.headers = {"x-fb-friendly-name": operation}
+        self.post_data = f"av=1&fb_api_req_friendly_name={operation}&doc_id=1"
+        self.resource_type = "xhr"
+
+class FakeResponse:
+    def __init__(self, operation: str, body: bytes):
+        self.url = GRAPHQL_URL
+        self.request = FakeRequest(operation)
+        self.ok = True
+        self._body = body
+
+    async def body(self) -> bytes:
+        return self._body
+
+    async def json(self):
+        return json.loads(self._body)
+
+class FakePage:
+    def __init__(self):
+        self.listeners = []
+
+    def on(self, event: str, listener):
+        self.listeners.append(listener)
+
+async def noop(value: dict):
+    pass
+
+async def old_listener(response: FakeResponse):
+    response_data = await response.json()
+    for root_key in [CLIPS_HOME, CLIPS_USER, USER_INFO, FEED_TIMELINE]:
+        if response_data["data"].get(root_key, False):
+            pass
+
+async def run(responses: int):
+    bodies = [(root_key, fake_body(root_key)) for root_key in [CLIPS_HOME, IGNORED_ROOT, CLIPS_USER, IGNORED_ROOT, FEED_TIMELINE, IGNORED_ROOT]]
+    print(f"body size ~{sum(len(body) for _, body in bodies) // len(bodies) // 1024} KiB, {LEFTOVER_LISTENERS} leftover listeners")
+
+    start = time.process_time()
+    for i in range(responses):
+        response = FakeResponse(*bodies[i % len(bodies)])
+        for _ in range(LEFTOVER_LISTENERS):
+            await old_listener(response)
+    before = (time.process_time() - start) / responses * 1e6
+
+    router = NetworkRouter(FakePage())
+    router.start_phase({CLIPS_HOME: noop, CLIPS_USER: noop, FEED_TIMELINE: noop})
+    start = time.process_time()
+    for i in range(responses):
+        await router.on_response(FakeResponse(*bodies[i % len(bodies)]))
+    after = (time.process_time() - start) / responses * 1e6
+
+    print(f"listener per phase: {before:8.1f} us cpu per response")
+    print(f"router:             {after:8.1f} us cpu per response ({before / after:.1f}x less)")
+    print("router stats:", router.stats())
+
+def measure(decode, raw_values: list) -> tuple[float, float]:
+    ''' (ms to decode, KiB held) for the reels of the raw connections '''
+    start = time.process_time()
+    decode(raw_values)
+    elapsed = (time.process_time() - start) * 1e3
+
+    tracemalloc.start()
+    kept = decode(raw_values)
+    held = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    del kept
+    return elapsed, held
+
+def compare_records(reels: int = 1000):
+    raw_values = [json.dumps(json.loads(fake_body(CLIPS_HOME))["data"][CLIPS_HOME]).encode("utf-8") for _ in range(reels // 12 + 1)]
+    decoder = ROOT_DECODERS[CLIPS_HOME]
+
+    dict_ms, dict_kib = measure(lambda values: [edge["node"]["media"] for raw in values for edge in json.loads(raw)["edges"]], raw_values)
+    record_ms, record_kib = measure(lambda values: [reel for raw in values for reel in decoder.decode(raw).reels()], raw_values)
+
+    count = len(raw_values) * 12
+    print(f"per 1000 reels, media dicts:   {dict_ms / count * 1000:7.1f} ms decode, {dict_kib / count * 1000:8.0f} KiB held")
+    print(f"per 1000 reels, typed records: {record_ms / count * 1000:7.1f} ms decode, {record_kib / count * 1000:8.0f} KiB held")
+
+if __name__ == '__main__':
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
+    compare_records()
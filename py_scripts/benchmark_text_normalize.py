@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+import statistics
+
+# the normalizer lives in server/ like the scraper modules that use it
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from text_normalize import normalize_text
+
+# per caption cost of normalize_text() on typical promo / ordinary captions
+#   python -m py_scripts.benchmark_text_normalize [rounds]
+
+CAPTIONS = [
+    "✅ Play on FUN88 this IPL - Instant Deposits & Withdrawals, Safe & Secure Platform! 🥳",
+    "JOIN AND GET FREE !D NO DEPOS!T",
+    "RP EXCH 🆔 in Just 2 Minutes. Msg Now. GET Your Online Satta !D.",
+    "🎁 100% Bonus on 1st Deposit!🔄 Get 5% Refill Bonus – Every Time!🛡️ Safe & Secure",
+    "𝐁𝐞𝐭𝐭𝐢𝐧𝐠 𝐈𝐃 𝐢𝐧 𝟐 𝐦𝐢𝐧𝐮𝐭𝐞𝐬 ➡️ ＤＭ ＮＯＷ #OnlineBetting #CricketBetting #IPL2025",
+    "Вet оn the bіg match tonight 🔥🔥 #fantasysports #dream11",
+    "Sunday morning run with the crew, 10k done 🏃‍♂️💨 #fitness #running #mondaymotivation",
+    "Made my grandma's biryani recipe today, turned out amazing!! Full recipe in the comments 👇",
+]
+
+def main(rounds: int = 2000):
+    per_caption_us = []
+    for caption in CAPTIONS:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            normalize_text(caption)
+        per_caption_us.append((time.perf_counter() - start) / rounds * 1e6)
+
+    for caption, cost in zip(CAPTIONS, per_caption_us):
+        print(f"{cost:7.2f} us | {caption[:60]!r} -> {normalize_text(caption)[:60]!r}")
+    print(f"mean {statistics.mean(per_caption_us):.2f} us, max {max(per_caption_us):.2f} us per caption")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
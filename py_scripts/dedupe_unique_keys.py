@@ -0,0 +1,89 @@
+from server.database.connection import get_db
+from server.database.indexes import ensure_indexes
+from pymongo import DeleteMany, UpdateOne
+from collections import Counter
+import asyncio
+import sys
+
+# merge the duplicates that stop the unique indexes from being built, then build the indexes
+#   scrape_profiles (scraper_id, username), scraped_content (scraper_id, code), ads (scraper_id, code),
+#   keywords_stats (scraper_id)
+# one document of every duplicate group is kept (the oldest, for profiles the oldest scraped one),
+# ads keep the sum of times_seen and the first / last sighting of the whole group,
+# keyword stats keep the sum of every topic's freq (priorities of the kept document win).
+#   python -m py_scripts.dedupe_unique_keys [--dry-run]
+
+UNIQUE_KEYS = {
+    "scrape_profiles": ["scraper_id", "username"],
+    "scraped_content": ["scraper_id", "code"],
+    "ads": ["scraper_id", "code"],
+    "keywords_stats": ["scraper_id"],
+}
+
+def pick_keeper(collection_name: str, docs: list[dict]) -> dict:
+    docs = sorted(docs, key=lambda doc: doc["_id"])
+    if collection_name == "scrape_profiles":
+        # a scraped copy has the bio / links, the unscraped ones would only queue the profile again
+        return next((doc for doc in docs if doc.get("scraped")), docs[0])
+    return docs[0]
+
+def merged_ad_fields(docs: list[dict]) -> dict:
+    first_seen = [doc["first_seen"] for doc in docs if doc.get("first_seen") is not None]
+    last_seen = [doc["last_seen"] for doc in docs if doc.get("last_seen") is not None]
+    merged = {"times_seen": sum(doc.get("times_seen", 1) for doc in docs)}
+    if first_seen:
+        merged["first_seen"] = min(first_seen)
+    if last_seen:
+        merged["last_seen"] = max(last_seen)
+    return merged
+
+def merged_stats_fields(keeper: dict, docs: list[dict]) -> dict:
+    freq = Counter()
+    priority = dict()
+    for doc in docs:
+        freq.update(doc.get("freq", dict()))
+        if doc["_id"] != keeper["_id"]:
+            priority.update(doc.get("priority", dict()))
+    priority.update(keeper.get("priority", dict()))
+    return {"freq": dict(freq), "priority": priority}
+
+async def dedupe_collection(collection_name: str, key_fields: list[str], dry_run: bool = False) -> int:
+    ''' merge the duplicates of one collection, returns the number of documents removed '''
+    collection = get_db()[collection_name]
+    pipeline = [
+        {"$group": {"_id": {field: f"${field}" for field in key_fields}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    groups = await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+    removed = 0
+    for group in groups:
+        docs = await collection.find({"_id": {"$in": group["ids"]}}).to_list(length=None)
+        keeper = pick_keeper(collection_name, docs)
+        duplicate_ids = [doc["_id"] for doc in docs if doc["_id"] != keeper["_id"]]
+        removed += len(duplicate_ids)
+        if dry_run:
+            continue
+
+        operations = [DeleteMany({"_id": {"$in": duplicate_ids}})]
+        if collection_name == "ads":
+            operations.insert(0, UpdateOne({"_id": keeper["_id"]}, {"$set": merged_ad_fields(docs)}))
+        elif collection_name == "keywords_stats":
+            operations.insert(0, UpdateOne({"_id": keeper["_id"]}, {"$set": merged_stats_fields(keeper, docs)}))
+        await collection.bulk_write(operations, ordered=True)
+
+    print(f"{collection_name}: {len(groups)} duplicate groups, {removed} documents {'to remove' if dry_run else 'removed'}")
+    return removed
+
+async def main(dry_run: bool = False):
+    for collection_name, key_fields in UNIQUE_KEYS.items():
+        await dedupe_collection(collection_name, key_fields, dry_run)
+
+    if not dry_run:
+        if await ensure_indexes():
+            print("all indexes built")
+        else:
+            print("some indexes could not be built, see above")
+
+if __name__ == '__main__':
+    asyncio.run(main(dry_run="--dry-run" in sys.argv))
@@ -0,0 +1,31 @@
+from server.database.connection import get_db
+from server.database.screenshots import save_screenshot
+import asyncio
+import base64
+
+# move the base64 screenshots stored inside links / ads documents to the screenshot store
+
+async def move_screenshots(collection_name: str):
+    collection = get_db()[collection_name]
+    moved = 0
+
+    cursor = collection.find({"screenshot": {"$type": "string"}}, {"screenshot": 1})
+    async for doc in cursor:
+        screenshot_id = await save_screenshot(base64.b64decode(doc["screenshot"]))
+        await collection.update_one(
+            {"_id": doc["_id"]},
+            {
+                "$set": {"screenshot_id": screenshot_id},
+                "$unset": {"screenshot": ""}
+            }
+        )
+        moved += 1
+
+    print(f"{collection_name}: moved {moved} screenshots")
+
+async def main():
+    await move_screenshots("links")
+    await move_screenshots("ads")
+
+if __name__ == '__main__':
+    asyncio.run(main())
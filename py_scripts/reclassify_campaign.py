@@ -0,0 +1,21 @@
+import os
+import sys
+import asyncio
+
+# the job uses the modules in server/ the same way the scraper processes do
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from reclassify import reclassify_campaign
+
+# re-score the stored reels and bios of a campaign against its current text / keywords
+#   python -m py_scripts.reclassify_campaign <scraper_id>
+
+async def main(scraper_id: str):
+    stats = await reclassify_campaign(scraper_id)
+    print(stats)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("usage: python -m py_scripts.reclassify_campaign <scraper_id>")
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1]))
@@ -0,0 +1,86 @@
+import os
+import re
+from typing import Optional
+from text_normalize import normalize_text
+
+# RULE BASED CAPTION PREFILTER
+# scores a caption on campaign keywords / hashtags and known promo phrasing (deposit, bonus, id selling...).
+# captions and keywords are normalized first, so "DEPOS!T" or "𝐁𝐞𝐭𝐭𝐢𝐧𝐠" match like plain words.
+# clear cases are decided here, only the uncertain middle band goes to the LLM relevancy check.
+#   score >= accept_at and at least one campaign term -> relevant (promo phrasing alone can be a competitor)
+#   score <= reject_at -> not relevant (off by default: captions without literal matches are judged on meaning)
+
+PREFILTER_ACCEPT_AT = int(os.getenv("PREFILTER_ACCEPT_AT", "4"))
+PREFILTER_REJECT_AT = int(os.getenv("PREFILTER_REJECT_AT", "-1"))
+
+KEYWORD_WEIGHT = 1
+PROMO_WEIGHT = 2
+
+# promo phrasing of betting / gambling ads, each pattern counts once per caption
+PROMO_PATTERNS = {
+    "deposit": r"depos[i1!l]t",
+    "withdrawal": r"withdraw",
+    "bonus": r"\bbonus|\brefill\b|\bcashback\b",
+    "id_selling": r"(?:\bget|\bfree|\bnew|\byour|\bonline|\bbetting|\bcricket|\bsatta|\bexch)\s*\bid\b",
+    "satta": r"\bsatta\b|\bmatka\b",
+    "exchange": r"\bexch\b|\bexchange\s+id\b",
+    "instant_payout": r"\b(?:instant|fast|quick)\s+(?:deposit|withdraw|payout|payment)",
+    "contact_now": r"\b(?:msg|message|dm|whatsapp|call)\s+(?:now|me|us)\b",
+    "trusted_site": r"\b(?:most\s+)?trusted\s+(?:site|platform|app)\b",
+}
+
+class CaptionPrefilter:
+    def __init__(self, keywords: list[str], promo_patterns: dict[str, str] = PROMO_PATTERNS, accept_at: int = PREFILTER_ACCEPT_AT, reject_at: int = PREFILTER_REJECT_AT):
+        self.accept_at = accept_at
+        self.reject_at = reject_at
+
+        # one alternation for all the campaign terms, longest first so "fantasy sports" wins over "fantasy"
+        terms = sorted({normalize_text(keyword) for keyword in keywords} - {""}, key=len, reverse=True)
+        self.keyword_pattern = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(term) for term in terms) + r")(?!\w)") if terms else None
+
+        # one alternation for the promo patterns, the named group tells which one matched
+        self.promo_pattern = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in promo_patterns.items())) if promo_patterns else None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.uncertain = 0
+
+    def hits(self, caption: str) -> tuple[int, int]:
+        ''' (distinct campaign terms, distinct promo patterns) found in the caption '''
+        text = normalize_text(caption)
+        keyword_hits = len(set(self.keyword_pattern.findall(text))) if self.keyword_pattern is not None else 0
+        promo_hits = len({match.lastgroup for match in self.promo_pattern.finditer(text)}) if self.promo_pattern is not None else 0
+        return keyword_hits, promo_hits
+
+    def score(self, caption: str) -> int:
+        keyword_hits, promo_hits = self.hits(caption)
+        return KEYWORD_WEIGHT * keyword_hits + PROMO_WEIGHT * promo_hits
+
+    def decide(self, keyword_hits: int, promo_hits: int) -> Optional[bool]:
+        score = KEYWORD_WEIGHT * keyword_hits + PROMO_WEIGHT * promo_hits
+        if score >= self.accept_at and keyword_hits > 0:
+            return True
+        if score <= self.reject_at:
+            return False
+        return None
+
+    def verdict(self, caption: str) -> Optional[bool]:
+        ''' True / False for the clear cases, None if the LLM has to decide '''
+        verdict = self.decide(*self.hits(caption))
+        if verdict is True:
+            self.accepted += 1
+        elif verdict is False:
+            self.rejected += 1
+        else:
+            self.uncertain += 1
+        return verdict
+
+    def stats(self) -> dict:
+        checked = self.accepted + self.rejected + self.uncertain
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "sent_to_llm": self.uncertain,
+            "llm_calls_avoided": self.accepted + self.rejected,
+            "avoided_rate": (self.accepted + self.rejected) / checked if checked else 0.0,
+        }
@@ -0,0 +1,151 @@
+import os
+import re
+import hashlib
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+from text_normalize import normalize_text
+from server.database.caption_signatures import get_caption_signatures_chunk
+
+# NEAR-DUPLICATE CAPTIONS
+# coordinated promo accounts post the same caption with small edits. every caption gets a MinHash
+# signature (16 x 32 bit, over normalized words and word pairs): the share of equal values estimates
+# how many words / word pairs two captions have in common.
+# the index splits signatures into 8 bands of 2 values, near-duplicates almost always share a band
+# exactly, so a lookup only compares against the few captions in the caption's own 8 buckets.
+# every caption gets the cluster id of its near-duplicates (stored on scraped_content for analysts).
+# reusing a verdict needs a much closer match: a caption with a few words swapped can be about
+# something else entirely, so only near-identical captions of an already judged one skip the LLM.
+# the index lives in memory and only holds the newest MAX_LOADED_SIGNATURES of a campaign: a lookup per
+# reel has to stay off the database, and memory grows ~1.7 KB per signature (~350 MB for 200k when no
+# two captions share a band bucket, lower the cap on small nodes). a caption whose only near-duplicates
+# are older than that gets a new cluster id and its own LLM check.
+
+NUM_HASHES = 16
+BANDS = 8
+ROWS = NUM_HASHES // BANDS
+MIN_EQUAL = 10          # of 16 values, ~0.6 estimated similarity: same cluster
+MIN_EQUAL_VERDICT = 14  # of 16 values, ~0.9 estimated similarity: same verdict
+MIN_TOKENS = 4      # shorter captions are too generic to call duplicates
+MAX_LOADED_SIGNATURES = int(os.getenv("MAX_LOADED_SIGNATURES", "200000"))    # newest ones, per campaign and process
+LOAD_CHUNK_SIZE = 10_000
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# fixed seed: signatures are persisted, every process must hash the same way
+_rng = np.random.default_rng(20240501)
+HASH_MULTIPLIERS = _rng.integers(1, 2**63, size=NUM_HASHES, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+HASH_OFFSETS = _rng.integers(0, 2**63, size=NUM_HASHES, dtype=np.uint64)
+
+def _gram_hash(gram: str) -> int:
+    return int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+
+@lru_cache(maxsize=4096)
+def minhash(text: str) -> Optional[bytes]:
+    ''' MinHash signature of the text as bytes, None if it is too short to compare '''
+    tokens = TOKEN_PATTERN.findall(normalize_text(text))
+    if len(tokens) < MIN_TOKENS:
+        return None
+    grams = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    hashes = np.fromiter((_gram_hash(gram) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    # one multiply-shift hash per signature value, uint64 arithmetic wraps around on purpose
+    values = (hashes[:, None] * HASH_MULTIPLIERS + HASH_OFFSETS) >> np.uint64(32)
+    return values.min(axis=0).astype(np.uint32).tobytes()
+
+def equal_values(first: bytes, second: bytes) -> int:
+    return int((np.frombuffer(first, dtype=np.uint32) == np.frombuffer(second, dtype=np.uint32)).sum())
+
+class MinHashIndex:
+    def __init__(self, min_equal: int = MIN_EQUAL):
+        self.min_equal = min_equal
+        self.bands: list[dict[bytes, list]] = [dict() for _ in range(BANDS)]
+        self.entries: dict[bytes, list] = dict()  # signature -> [signature, cluster_id, verdict]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _band_keys(self, signature: bytes) -> list[bytes]:
+        band_bytes = ROWS * 4
+        return [signature[i * band_bytes:(i + 1) * band_bytes] for i in range(BANDS)]
+
+    def add(self, signature: bytes, cluster_id: str, verdict: Optional[bool] = None) -> list:
+        entry = self.entries.get(signature)
+        if entry is not None:
+            if verdict is not None:
+                entry[2] = verdict
+            return entry
+
+        entry = [signature, cluster_id, verdict]
+        self.entries[signature] = entry
+        for band, band_key in zip(self.bands, self._band_keys(signature)):
+            band.setdefault(band_key, []).append(entry)
+        return entry
+
+    def nearest(self, signature: bytes, judged_only: bool = False, min_equal: int = None) -> Optional[list]:
+        ''' most similar entry with at least min_equal equal values (only ones with a verdict if judged_only) '''
+        min_equal = min_equal if min_equal is not None else self.min_equal
+        exact = self.entries.get(signature)
+        if exact is not None and not (judged_only and exact[2] is None):
+            return exact
+
+        best, best_equal = None, min_equal - 1
+        checked = set()
+        for band, band_key in zip(self.bands, self._band_keys(signature)):
+            for entry in band.get(band_key, ()):
+                if id(entry) in checked or (judged_only and entry[2] is None):
+                    continue
+                checked.add(id(entry))
+                equal = equal_values(entry[0], signature)
+                if equal > best_equal:
+                    best, best_equal = entry, equal
+        return best
+
+class CampaignSignatures:
+    ''' signature index of one campaign, loaded from the database and extended as captions come in '''
+
+    def __init__(self, campaign_key: str):
+        self.campaign_key = campaign_key
+        self.index = MinHashIndex()
+
+        self.reused = 0
+
+    async def load(self):
+        ''' the newest MAX_LOADED_SIGNATURES signatures, in chunks so the raw documents are never all in memory '''
+        try:
+            before, loaded = None, 0
+            while loaded < MAX_LOADED_SIGNATURES:
+                docs = await get_caption_signatures_chunk(self.campaign_key, before, min(LOAD_CHUNK_SIZE, MAX_LOADED_SIGNATURES - loaded))
+                for doc in docs:
+                    self.index.add(bytes(doc["signature"]), doc["cluster_id"], doc.get("verdict"))
+                loaded += len(docs)
+                if len(docs) < LOAD_CHUNK_SIZE:
+                    break
+                before = docs[-1]["_id"]
+        except Exception as e:
+            print(f"Failed to load caption signatures: {e}")
+
+    def judged_verdict(self, caption: str) -> Optional[bool]:
+        ''' verdict of an already judged near-duplicate, None if there is none '''
+        signature = minhash(caption)
+        if signature is None:
+            return None
+        entry = self.index.nearest(signature, judged_only=True, min_equal=MIN_EQUAL_VERDICT)
+        if entry is None:
+            return None
+        self.reused += 1
+        return entry[2]
+
+    def record(self, caption: str, verdict: Optional[bool] = None) -> Optional[dict]:
+        ''' put the caption in the index (in the cluster of its near-duplicates),
+            returns the signature document to save, None if the caption can't be signed '''
+        signature = minhash(caption)
+        if signature is None:
+            return None
+        nearest = self.index.nearest(signature)
+        cluster_id = nearest[1] if nearest is not None else signature[:8].hex()
+        entry = self.index.add(signature, cluster_id, verdict)
+        return {"signature": signature, "cluster_id": entry[1], "verdict": entry[2]}
+
+    def stats(self) -> dict:
+        return {"signatures": len(self.index), "verdicts_reused": self.reused}
@@ -1,24 +1,22 @@
 
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
+from server.database.connection import get_db
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+# filters shared with index_check
+UNASSIGNED_ACCOUNT_FILTER = {"scraper_id": None}
 
 # CREATE
 async def insert_account(account_data: dict) -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     result = await collection.insert_one(account_data)
     return {"id": str(result.inserted_id), **account_data}
@@ -26,7 +24,7 @@ async def insert_account(account_data: dict) -> dict:
 # GET
 async def get_account_by_scraper_id(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     document = await collection.find_one({"scraper_id": scraper_id})
     document["username"] = base64.b64decode(document["username"]).decode("utf-8")
@@ -38,16 +36,16 @@ async def get_account_by_scraper_id(scraper_id: str) -> dict:
 
 async def get_unassigned_account() -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
     
-    document = await collection.find_one({"scraper_id": None})
+    document = await collection.find_one(UNASSIGNED_ACCOUNT_FILTER)
     if document:
         return {"id": str(document["_id"]), **document}
     return None
 
 async def get_all_accounts() -> list:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     documents = await collection.find({}).to_list(length=None)
     return [dict({
@@ -58,7 +56,7 @@ async def get_all_accounts() -> list:
 # UPDATE
 async def save_new_auth(auth_data: dict, account_id:str) -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
     
     try:
         account_object_id = ObjectId(account_id)
@@ -78,7 +76,7 @@ async def save_new_auth(auth_data: dict, account_id:str) -> dict:
 
 async def assign_scraper_to_account(scraper_id: str, account_id: str) -> None:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     try:
         account_object_id = ObjectId(account_id)
@@ -1,19 +1,20 @@
 
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from server.database.connection import get_db
+from server.database.pagination import DEFAULT_PAGE_SIZE, find_page
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+# filters shared with index_check
+NON_FILTERED_ADS_FILTER = {"filtered_link": {"$exists": False}}
 
 # ADS
 # {
@@ -25,31 +26,58 @@ db = client[DB_NAME]
 #     profile,
 #     caption,
 #     link_text,
+#     first_seen,
+#     last_seen,
+#     times_seen,
 # }
 
 async def insert_ads_data(scraper_id: str, data) -> dict:
+    ''' upsert the ads of one feed response, an ad seen again only bumps times_seen / last_seen '''
     # select the correct collection
-    collection = db["ads"]
-    
+    collection = get_db()["ads"]
+
+    now = datetime.utcnow()
+    operations = []
+    codes = set()
     for ad in data:
+        # the same ad can show up twice in one response
+        if ad["code"] in codes:
+            continue
+        codes.add(ad["code"])
+
+        operations.append(UpdateOne(
+            {"scraper_id": scraper_id, "code": ad["code"]},
+            {
+                "$setOnInsert": {
+                    "link": ad["link"],
+                    "profile": ad["user"]["username"],
+                    "caption": ad["caption"],
+                    "link_text": ad["link_text"],
+                    "first_seen": now,
+                },
+                "$set": {
+                    "like_count": ad["like_count"],
+                    "comment_count": ad["comment_count"],
+                    "last_seen": now,
+                },
+                "$inc": {"times_seen": 1}
+            },
+            upsert=True
+        ))
 
-        ad_data = dict({
-            "scraper_id": scraper_id,
-            "link": ad["link"],
-            "code": ad["code"],
-            "like_count": ad["like_count"],
-            "comment_count": ad["comment_count"],
-            "profile": ad["user"]["username"],
-            "caption": ad["caption"],
-            "link_text": ad["link_text"]
-        })
-
-        result = await collection.insert_one(ad_data)
+    if not operations:
+        return True
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # two scrapers upserting the same new ad at once, the other write won
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
     return True
 
 async def update_ad_data(ad_id: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["ads"]
+    collection = get_db()["ads"]
 
     try:
         ad_object_id = ObjectId(ad_id)
@@ -66,9 +94,9 @@ async def update_ad_data(ad_id: str, data: dict) -> dict:
 
 async def get_ads_data(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["ads"]
+    collection = get_db()["ads"]
     
-    documents = await collection.find({"scraper_id": scraper_id}).to_list(length=None)
+    documents = await collection.find({"scraper_id": scraper_id}, {"screenshot": 0}).to_list(length=None)
     return [dict({
         "id": str(doc["_id"]),
         "link": doc["link"],
@@ -78,15 +106,31 @@ async def get_ads_data(scraper_id: str) -> dict:
         "profile": doc["profile"],
         "caption": doc["caption"],
         "link_text": doc["link_text"],
-        "screenshot": doc["screenshot"],
-        "filtered_link": doc["filtered_link"]
+        "times_seen": doc.get("times_seen", 1),
+        "last_seen": doc.get("last_seen", None),
+        "screenshot_id": doc.get("screenshot_id", None),
+        "filtered_link": doc.get("filtered_link", None)
     }) for doc in documents]
 
+AD_FIELDS = ["link", "code", "like_count", "comment_count", "profile", "caption", "link_text", "times_seen", "last_seen", "filtered_link", "screenshot_id"]
+AD_ALLOWED_FIELDS = AD_FIELDS + ["first_seen", "suspicious", "screenshot"]
+AD_SORT_FIELDS = ["_id", "last_seen"]
+
+async def get_ads_page(scraper_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None, sort: str = "_id", order: str = "asc") -> dict:
+    # select the correct collection
+    collection = get_db()["ads"]
+
+    return await find_page(
+        collection, {"scraper_id": scraper_id},
+        default_fields=AD_FIELDS, allowed_fields=AD_ALLOWED_FIELDS, sort_fields=AD_SORT_FIELDS,
+        after=after, limit=limit, fields=fields, sort=sort, order=order
+    )
+
 async def get_all_non_filtered_ads(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["ads"]
+    collection = get_db()["ads"]
     
-    documents = await collection.find({"scraper_id": scraper_id, "filtered_link": {"$exists": False} }).to_list(length=None)
+    documents = await collection.find({"scraper_id": scraper_id, **NON_FILTERED_ADS_FILTER}).to_list(length=None)
     return [dict({
         "id": str(doc["_id"]),
         "link": doc["link"],
@@ -99,6 +143,6 @@ async def get_all_non_filtered_ads(scraper_id: str) -> dict:
     }) for doc in documents]
 
 async def get_all_sus_ads_links():
-    collection = db["ads"]
+    collection = get_db()["ads"]
     documents = await collection.find({}, {"_id": 0, "filtered_link": 1}).to_list(length=None)
     return [doc["filtered_link"] for doc in documents if "filtered_link" in doc]
@@ -0,0 +1,42 @@
+
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from server.database.connection import get_db
+
+# MINHASH SIGNATURES OF JUDGED / CLUSTERED CAPTIONS, PER CAMPAIGN
+# the signature (bytes) is stored as is, the near-duplicate index is rebuilt from these on scraper start
+
+# CREATE
+async def upsert_caption_signatures(campaign_key: str, signatures: list[dict]):
+    ''' save {"signature", "cluster_id", "verdict"} documents with one unordered bulk_write '''
+    collection = get_db()["caption_signatures"]
+
+    if not signatures:
+        return
+    now = datetime.utcnow()
+    operations = []
+    for doc in signatures:
+        fields = {"cluster_id": doc["cluster_id"]}
+        if doc["verdict"] is not None:
+            fields["verdict"] = doc["verdict"]
+        operations.append(UpdateOne(
+            {"campaign_key": campaign_key, "signature": doc["signature"]},
+            {"$set": fields, "$setOnInsert": {"created_on": now}},
+            upsert=True
+        ))
+    await collection.bulk_write(operations, ordered=False)
+
+# GET
+async def get_caption_signatures_chunk(campaign_key: str, before: ObjectId = None, limit: int = 10_000) -> list[dict]:
+    ''' signatures of a campaign older than the given _id, newest first, for loading in chunks '''
+    collection = get_db()["caption_signatures"]
+
+    query = {"campaign_key": campaign_key}
+    if before is not None:
+        query["_id"] = {"$lt": before}
+    cursor = collection.find(
+        query,
+        {"signature": 1, "cluster_id": 1, "verdict": 1}
+    ).sort("_id", -1).limit(limit)
+    return await cursor.to_list(length=limit)
@@ -0,0 +1,71 @@
+
+import os
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+
+# POOL / TIMEOUT / WRITE CONCERN SETTINGS
+# every process (server or scraper) keeps ONE pool, so keep these small
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "10"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_WRITE_CONCERN_W = os.getenv("MONGO_WRITE_CONCERN_W", "1")
+MONGO_WRITE_CONCERN_JOURNAL = os.getenv("MONGO_WRITE_CONCERN_JOURNAL", "false").lower() == "true"
+
+_client: AsyncIOMotorClient = None
+_client_pid: int = None
+
+def _write_concern_w():
+    # "majority" (or a tag set name) stays a string, node counts become ints
+    if MONGO_WRITE_CONCERN_W.isdigit():
+        return int(MONGO_WRITE_CONCERN_W)
+    return MONGO_WRITE_CONCERN_W
+
+def get_client() -> AsyncIOMotorClient:
+    ''' the one shared client of this process, created on first use '''
+    global _client, _client_pid
+
+    # a client inherited through fork() (scraper_runner) shares sockets with the parent,
+    # never reuse it in the child - build a fresh pool for this pid instead
+    if _client is not None and _client_pid != os.getpid():
+        _client = None
+
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            w=_write_concern_w(),
+            journal=MONGO_WRITE_CONCERN_JOURNAL,
+        )
+        _client_pid = os.getpid()
+
+    return _client
+
+def get_db() -> AsyncIOMotorDatabase:
+    return get_client()[DB_NAME]
+
+def reset_client():
+    ''' drop the current client reference without closing it (use right after a fork) '''
+    global _client, _client_pid
+    _client = None
+    _client_pid = None
+
+def close_client():
+    ''' close the pool of this process (use on shutdown) '''
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client = None
+    _client_pid = None
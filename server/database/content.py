@@ -1,21 +1,22 @@
 
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from server.database.connection import get_db
+from server.database.pagination import DEFAULT_PAGE_SIZE, find_page
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
-
 def create_doc(media):
+    # reel records (reels_scroller.records) are already reduced to the stored fields
+    if not isinstance(media, dict):
+        return media.content_doc()
     try:
         doc = {
             "code": media.get("code", ""),
@@ -43,39 +44,51 @@ def create_doc(media):
             "error": "Failed to process complete media data"
         }
 
-# CREATE
-async def save_scraped_content(scraper_id: str, content: dict) -> dict:
-    # select the correct collection
-    collection = db["scraped_content"]
-
+def build_content_doc(scraper_id: str, content: dict) -> dict:
+    ''' the scraped_content document of one media item '''
     doc = create_doc(content)
     doc["scraper_id"] = scraper_id
     doc["saved_on"] = datetime.utcnow()
 
-    if content.get("target_app_id", False):
-        doc["target_app_id"] = content["target_app_id"]
+    target_app_id = content.get("target_app_id", False) if isinstance(content, dict) else content.target_app_id
+    if target_app_id:
+        doc["target_app_id"] = target_app_id
+    return doc
+
+# CREATE
+async def save_scraped_content(scraper_id: str, content: dict) -> dict:
+    # select the correct collection
+    collection = get_db()["scraped_content"]
+
+    doc = build_content_doc(scraper_id, content)
 
     result = await collection.insert_one(doc)
     return {"id": str(result.inserted_id)}
 
-async def save_many_scraped_content(scraper_id: str, contents: list) -> None:
+async def insert_content_docs(documents: list[dict]) -> int:
+    ''' unordered insert_many, reels already saved for the scraper are skipped '''
     # select the correct collection
-    collection = db["scraped_content"]
-
-    documents = []
-    # print(len(contents))
-    for content in contents:
-        doc = create_doc(content)
-        doc["scraper_id"] = scraper_id
-        doc["saved_on"] = datetime.utcnow()
-        documents.append(doc)
-    # print(len(documents))        
-    await collection.insert_many(documents)
+    collection = get_db()["scraped_content"]
+
+    if not documents:
+        return 0
+    try:
+        result = await collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # the unique (scraper_id, code) index rejects duplicates, anything else is a real error
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+async def save_many_scraped_content(scraper_id: str, contents: list) -> int:
+    documents = [build_content_doc(scraper_id, content) for content in contents]
+    return await insert_content_docs(documents)
 
 # GET
 async def get_reels_data(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["scraped_content"]
+    collection = get_db()["scraped_content"]
 
     documents = await collection.find({"scraper_id": scraper_id}).to_list(length=None)
     return [dict({
@@ -89,3 +102,42 @@ async def get_reels_data(scraper_id: str) -> dict:
         "caption": doc["caption"]
         # "location": doc["location"]
     }) for doc in documents]
+
+REEL_FIELDS = ["code", "like_count", "comment_count", "view_count", "taken_at", "username", "caption"]
+REEL_ALLOWED_FIELDS = REEL_FIELDS + ["location", "saved_on", "target_app_id", "relevant", "relevancy_checked_on", "cluster_id"]
+REEL_SORT_FIELDS = ["_id", "taken_at", "like_count"]
+
+async def get_reels_page(scraper_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None, sort: str = "_id", order: str = "asc") -> dict:
+    # select the correct collection
+    collection = get_db()["scraped_content"]
+
+    return await find_page(
+        collection, {"scraper_id": scraper_id},
+        default_fields=REEL_FIELDS, allowed_fields=REEL_ALLOWED_FIELDS, sort_fields=REEL_SORT_FIELDS,
+        after=after, limit=limit, fields=fields, sort=sort, order=order
+    )
+
+async def get_captions_chunk(scraper_id: str, after: ObjectId = None, limit: int = 1000) -> list[dict]:
+    ''' {_id, caption} of the scraper's reels after the given _id, for batch jobs '''
+    # select the correct collection
+    collection = get_db()["scraped_content"]
+
+    query = {"scraper_id": scraper_id}
+    if after is not None:
+        query["_id"] = {"$gt": after}
+    return await collection.find(query, {"caption": 1}).sort("_id", 1).limit(limit).to_list(length=limit)
+
+# UPDATE
+async def set_reels_relevancy(verdicts: dict[ObjectId, bool]) -> int:
+    ''' write re-classification verdicts ({_id: relevant}) with one unordered bulk_write '''
+    # select the correct collection
+    collection = get_db()["scraped_content"]
+
+    if not verdicts:
+        return 0
+    now = datetime.utcnow()
+    result = await collection.bulk_write([
+        UpdateOne({"_id": _id}, {"$set": {"relevant": verdict, "relevancy_checked_on": now}})
+        for _id, verdict in verdicts.items()
+    ], ordered=False)
+    return result.modified_count
@@ -1,25 +1,20 @@
 # database.py
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
+from server.database.connection import get_db
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
-
 # SCRAPERS DATABASE FUNCTIONS
 
 async def new_scraper(text: str, topic_attributes, hashtags, scraper_name) -> dict:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
 
     document = {
         "text": text,
@@ -34,7 +29,7 @@ async def new_scraper(text: str, topic_attributes, hashtags, scraper_name) -> di
     return {"id": str(result.inserted_id), **document}
 
 async def get_scraper_name(scraper_id)-> str:
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     try:
         scraper_object_id = ObjectId(scraper_id)
     except: # invalid id format
@@ -47,7 +42,7 @@ async def get_scraper_name(scraper_id)-> str:
 
 async def get_all_scrapers() -> list:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     documents = await collection.find({}).to_list(length=None)
     return [ dict({
@@ -60,14 +55,14 @@ async def get_all_scrapers() -> list:
     }) for doc in documents]
 
 async def get_all_scraper_ids() -> list[str]:
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
 
     documents = await collection.find({}, {"_id": 1}).to_list(length=None)
     return [ str(doc["_id"]) for doc in documents]
 
 async def get_scraper_state(document_id: str) -> str:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
 
     try:
         object_id = ObjectId(document_id)
@@ -79,13 +74,13 @@ async def get_scraper_state(document_id: str) -> str:
 
 async def get_all_documents() -> list:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     documents = await collection.find().to_list(length=None)
     return [{"id": str(doc["_id"]), **doc} for doc in documents]
 
 async def get_scraper_data_by_id(document_id: str) -> dict:
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     # print(document_id)
     try:
         object_id = ObjectId(document_id)
@@ -107,7 +102,7 @@ async def get_scraper_data_by_id(document_id: str) -> dict:
 
 async def set_scraper_activity(document_id: str, new_status: bool) -> dict:
     ''' set the status of the scraper false for suspending, true for running '''
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     try:
         object_id = ObjectId(document_id)
     except: # invalid id format
@@ -139,7 +134,7 @@ def updated_doc_properties(doc: dict) -> dict:
 
 async def update_scraper_data(scraper_id: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     try:
         scraper_object_id = ObjectId(scraper_id)
@@ -156,7 +151,7 @@ async def update_scraper_data(scraper_id: str, data: dict) -> dict:
     return {"id": str(result.upserted_id), **data}
 
 async def update_activity(scraper_id: str, new_active_state: bool):
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     try:
         scraper_object_id = ObjectId(scraper_id)
@@ -171,7 +166,7 @@ async def update_activity(scraper_id: str, new_active_state: bool):
     return {"id": str(result.upserted_id)}
 
 async def scraper_check_suspended(scraper_id: str) -> bool :
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     try:
         scraper_object_id = ObjectId(scraper_id)
@@ -190,14 +185,14 @@ async def scraper_check_suspended(scraper_id: str) -> bool :
 
 async def insert_account(account_data: dict) -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     result = await collection.insert_one(account_data)
     return {"id": str(result.inserted_id), **account_data}
 
 async def get_account_by_scraper_id(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     document = await collection.find_one({"scraper_id": scraper_id})
     document["username"] = base64.b64decode(document["username"]).decode("utf-8")
@@ -209,7 +204,7 @@ async def get_account_by_scraper_id(scraper_id: str) -> dict:
 
 async def save_new_auth(auth_data: dict, account_id:str) -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
     
     try:
         account_object_id = ObjectId(account_id)
@@ -229,7 +224,7 @@ async def save_new_auth(auth_data: dict, account_id:str) -> dict:
 
 async def get_unassigned_account() -> dict:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
     
     document = await collection.find_one({"scraper_id": None})
     if document:
@@ -238,7 +233,7 @@ async def get_unassigned_account() -> dict:
 
 async def assign_scraper_to_account(scraper_id: str, account_id: str) -> None:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     try:
         account_object_id = ObjectId(account_id)
@@ -256,7 +251,7 @@ async def assign_scraper_to_account(scraper_id: str, account_id: str) -> None:
 
 async def get_all_accounts() -> list:
     # select the correct collection
-    collection = db["accounts"]
+    collection = get_db()["accounts"]
 
     documents = await collection.find({}).to_list(length=None)
     return [dict({
@@ -268,7 +263,7 @@ async def get_all_accounts() -> list:
 
 async def add_profile(scraper_id: str, username: str, targeted_app_id: str = "") -> dict:
     # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     double_check = await collection.find_one({"scraper_id": scraper_id, "username": username})
     if double_check:
@@ -288,7 +283,7 @@ async def add_profile(scraper_id: str, username: str, targeted_app_id: str = "")
 
 async def update_profile(scraper_id: str, username: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     result = await collection.update_one(
         {"scraper_id": scraper_id, "username": username},
@@ -304,7 +299,7 @@ async def update_profile(scraper_id: str, username: str, data: dict) -> dict:
 
 async def get_profile_data(username: str):
      # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     result = await collection.find_one(
         {"username": username},
@@ -314,7 +309,7 @@ async def get_profile_data(username: str):
 
 async def update_profile_data(username: str, data: dict):
      # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     result = await collection.update_one(
         {"username": username},
@@ -326,13 +321,13 @@ async def update_profile_data(username: str, data: dict):
 
 async def get_unscraped_profiles(scraper_id: str) -> list:
     # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     documents = await collection.find({"scraper_id": scraper_id, "scraped": False}, {"username": 1, "_id": 0}).to_list(length=None)
     return [doc["username"] for doc in documents]
 
 async def profiles_with_links(scraper_id: str) -> list:
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     documents = await collection.find(
         {"scraper_id": scraper_id, "links": {"$exists": True, "$ne": []}, "is_suspicious": {"$exists": False}},
@@ -350,7 +345,7 @@ async def profiles_with_links(scraper_id: str) -> list:
 
 async def get_profiles_data(scraper_id: str) -> dict:
         # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     documents = await collection.find({"scraper_id": scraper_id, "scraped": True}).to_list(length=None)
     return [dict({
@@ -365,7 +360,7 @@ async def get_profiles_data(scraper_id: str) -> dict:
 
 async def get_reels_data(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["scraped_content"]
+    collection = get_db()["scraped_content"]
 
     documents = await collection.find({"scraper_id": scraper_id}).to_list(length=None)
     return [dict({
@@ -410,7 +405,7 @@ def create_doc(media):
 
 async def save_scraped_content(scraper_id: str, content: dict) -> dict:
     # select the correct collection
-    collection = db["scraped_content"]
+    collection = get_db()["scraped_content"]
 
     doc = create_doc(content)
     doc["scraper_id"] = scraper_id
@@ -424,7 +419,7 @@ async def save_scraped_content(scraper_id: str, content: dict) -> dict:
 
 async def save_many_scraped_content(scraper_id: str, contents: list) -> None:
     # select the correct collection
-    collection = db["scraped_content"]
+    collection = get_db()["scraped_content"]
 
     documents = []
     # print(len(contents))
@@ -452,14 +447,14 @@ async def save_many_scraped_content(scraper_id: str, contents: list) -> None:
 # }
 
 async def create_freq_stats(doc: dict):
-    collection = db["keywords_stats"]
+    collection = get_db()["keywords_stats"]
     
     result = await collection.insert_one(doc)
     return {"id": str(result.inserted_id)}
 
 async def get_freq_stats(scraper_id: str):
     try:    
-        collection = db["keywords_stats"]
+        collection = get_db()["keywords_stats"]
         document = await collection.find_one(
             {"scraper_id": scraper_id},
             {"_id": 0}
@@ -470,7 +465,7 @@ async def get_freq_stats(scraper_id: str):
 
 async def update_freq_stats(scraper_id: str, new_stats: dict):
     # select the correct collection
-    collection = db["keywords_stats"]
+    collection = get_db()["keywords_stats"]
     
     await collection.update_one(
         {"scraper_id": scraper_id},
@@ -491,7 +486,7 @@ async def update_freq_stats(scraper_id: str, new_stats: dict):
 # }
 
 async def get_link_data(link_id: str)-> dict:
-    collection = db["links"]
+    collection = get_db()["links"]
      
     try:
         link_object_id = ObjectId(link_id)
@@ -504,7 +499,7 @@ async def get_link_data(link_id: str)-> dict:
 
 async def get_links_to_check(scraper_id: str) -> list:
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
     
     documents = await collection.find({"scraper_id": scraper_id, "suspicious": ""}).to_list(length=None)
     return [dict({
@@ -518,7 +513,7 @@ async def get_links_to_check(scraper_id: str) -> list:
 
 async def get_links_data(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
     links = set()
     documents: list[dict] = await collection.find({"scraper_id": scraper_id, }).to_list(length=None)
     
@@ -533,14 +528,14 @@ async def get_links_data(scraper_id: str) -> dict:
 
 async def get_all_links_data() -> list:
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
     documents = await collection.find({}).to_list(length=None)
 
     return [{"id": str(doc["_id"]), **doc} for doc in documents]
 
 async def save_links_data(data : dict, scraper_id: str):
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
 
     documents = []
     # print(len(contents))
@@ -561,7 +556,7 @@ async def save_links_data(data : dict, scraper_id: str):
 
 async def update_link_state(link_id: str, data: dict):
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
 
     try:
         link_object_id = ObjectId(link_id)
@@ -578,7 +573,7 @@ async def update_link_state(link_id: str, data: dict):
 
 async def update_link_data(link_id: str, data: dict):
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
 
     try:
         link_object_id = ObjectId(link_id)
@@ -594,7 +589,7 @@ async def update_link_data(link_id: str, data: dict):
     return True
 
 async def get_all_sus_links():
-    collection = db["links"]
+    collection = get_db()["links"]
     
     documents = await collection.find({}, {"_id": 0, "link": 1}).to_list(length=None)
     return [doc["link"] for doc in documents]
@@ -613,7 +608,7 @@ async def get_all_sus_links():
 
 async def insert_ads_data(scraper_id: str, data) -> dict:
     # select the correct collection
-    collection = db["ads"]
+    collection = get_db()["ads"]
     
     for ad in data:
 
@@ -633,7 +628,7 @@ async def insert_ads_data(scraper_id: str, data) -> dict:
 
 async def update_ad_data(ad_id: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["ads"]
+    collection = get_db()["ads"]
 
     try:
         ad_object_id = ObjectId(ad_id)
@@ -650,7 +645,7 @@ async def update_ad_data(ad_id: str, data: dict) -> dict:
 
 async def get_ads_data(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["ads"]
+    collection = get_db()["ads"]
     
     documents = await collection.find({"scraper_id": scraper_id}).to_list(length=None)
     return [dict({
@@ -668,7 +663,7 @@ async def get_ads_data(scraper_id: str) -> dict:
 
 async def get_all_non_filtered_ads(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["ads"]
+    collection = get_db()["ads"]
     
     documents = await collection.find({"scraper_id": scraper_id, "filtered_link": {"$exists": False} }).to_list(length=None)
     return [dict({
@@ -683,7 +678,7 @@ async def get_all_non_filtered_ads(scraper_id: str) -> dict:
     }) for doc in documents]
 
 async def get_all_sus_ads_links():
-    collection = db["ads"]
+    collection = get_db()["ads"]
     documents = await collection.find({}, {"_id": 0, "filtered_link": 1}).to_list(length=None)
     return [doc["filtered_link"] for doc in documents if "filtered_link" in doc]
 
@@ -700,13 +695,13 @@ async def get_all_sus_ads_links():
 
 async def get_targeted_apps(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
     result = await collection.find({"scraper_id": scraper_id}, {"_id": 0}).to_list(length=None)
     return result
 
 async def get_targeted_app(app_id: str) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
 
     try:
         app_object_id = ObjectId(app_id)
@@ -718,7 +713,7 @@ async def get_targeted_app(app_id: str) -> dict:
 
 async def update_targeted_app(target_app_id: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
 
     try:
         scraper_object_id = ObjectId(target_app_id)
@@ -736,7 +731,7 @@ async def update_targeted_app(target_app_id: str, data: dict) -> dict:
 
 async def insert_targeted_app( data ) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
     data = dict(data)
 
     doc = await collection.insert_one(data)
@@ -744,7 +739,7 @@ async def insert_targeted_app( data ) -> dict:
 
 async def get_targeted_app_profiles(app_id: str) -> list:
     # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
     profiles = await collection.find({"targeted_app_id": app_id}, {"_id": 0}).to_list(length=None)
 
     return profiles
\ No newline at end of file
@@ -0,0 +1,148 @@
+
+import sys
+import asyncio
+from bson.objectid import ObjectId
+from server.database.connection import get_db
+from server.database.indexes import ensure_indexes
+from server.database.pagination import keyset_filter
+from server.database.screenshots import SCREENSHOTS_BUCKET
+from server.database import accounts, ads, links, profiles
+
+# INDEX COVERAGE CHECK
+# run explain() for the query of every data-access function in server/database and
+# fail when one of them is planned as a COLLSCAN.
+#   python -m server.database.index_check [--ensure]
+
+SAMPLE_ID = "000000000000000000000000"
+SAMPLE_OBJECT_ID = ObjectId(SAMPLE_ID)
+
+def page_after(query: dict, sort: str = "_id") -> dict:
+    ''' the filter find_page runs for a page after SAMPLE_ID '''
+    if sort == "_id":
+        return {**query, "_id": {"$gt": SAMPLE_OBJECT_ID}}
+    return {"$and": [query, keyset_filter(sort, "asc", "sample", SAMPLE_OBJECT_ID)]}
+
+# (function, collection, filter), the constant parts of the filters come from the modules that run them,
+# tests/test_index_check.py runs every function and fails when its filter no longer has this shape
+QUERY_SHAPES: list[tuple[str, str, dict]] = [
+    # accounts
+    ("accounts.get_account_by_scraper_id", "accounts", {"scraper_id": SAMPLE_ID}),
+    ("accounts.get_unassigned_account", "accounts", accounts.UNASSIGNED_ACCOUNT_FILTER),
+    ("accounts.save_new_auth", "accounts", {"_id": SAMPLE_OBJECT_ID}),
+    ("accounts.assign_scraper_to_account", "accounts", {"_id": SAMPLE_OBJECT_ID}),
+    # ads
+    ("ads.insert_ads_data", "ads", {"scraper_id": SAMPLE_ID, "code": "sample"}),
+    ("ads.update_ad_data", "ads", {"_id": SAMPLE_OBJECT_ID}),
+    ("ads.get_ads_data", "ads", {"scraper_id": SAMPLE_ID}),
+    ("ads.get_ads_page", "ads", page_after({"scraper_id": SAMPLE_ID})),
+    ("ads.get_all_non_filtered_ads", "ads", {"scraper_id": SAMPLE_ID, **ads.NON_FILTERED_ADS_FILTER}),
+    # content
+    ("content.get_reels_data", "scraped_content", {"scraper_id": SAMPLE_ID}),
+    ("content.get_reels_page", "scraped_content", page_after({"scraper_id": SAMPLE_ID})),
+    ("content.get_captions_chunk", "scraped_content", page_after({"scraper_id": SAMPLE_ID})),
+    ("content.set_reels_relevancy", "scraped_content", {"_id": SAMPLE_OBJECT_ID}),
+    # links
+    ("links.get_links_data", "links", {"scraper_id": SAMPLE_ID}),
+    ("links.get_links_page", "links", page_after({"scraper_id": SAMPLE_ID})),
+    ("links.get_link_data", "links", {"_id": SAMPLE_OBJECT_ID}),
+    ("links.get_all_links_with_campaign_page", "links", page_after({})),
+    ("links.get_links_to_check", "links", {"scraper_id": SAMPLE_ID, **links.LINKS_TO_CHECK_FILTER}),
+    ("links.update_link_state", "links", {"_id": SAMPLE_OBJECT_ID}),
+    ("links.update_link_data", "links", {"_id": SAMPLE_OBJECT_ID}),
+    # profiles
+    ("profiles.add_profile", "scrape_profiles", {"scraper_id": SAMPLE_ID, "username": "sample"}),
+    ("profiles.add_profiles", "scrape_profiles", {"scraper_id": SAMPLE_ID, "username": "sample"}),
+    ("profiles.get_profile_data", "scrape_profiles", {"username": "sample"}),
+    ("profiles.get_profiles_data_by_usernames", "scrape_profiles", {"username": {"$in": ["sample", "other"]}}),
+    ("profiles.get_profiles_data", "scrape_profiles", {"scraper_id": SAMPLE_ID, **profiles.SCRAPED_FILTER}),
+    ("profiles.get_profiles_page", "scrape_profiles", page_after({"scraper_id": SAMPLE_ID, **profiles.SCRAPED_FILTER})),
+    ("profiles.get_profiles_page(sort=username)", "scrape_profiles", page_after({"scraper_id": SAMPLE_ID, **profiles.SCRAPED_FILTER}, sort="username")),
+    ("profiles.get_bios_chunk", "scrape_profiles", page_after({"scraper_id": SAMPLE_ID, **profiles.SCRAPED_FILTER})),
+    ("profiles.set_bios_relevancy", "scrape_profiles", {"_id": SAMPLE_OBJECT_ID}),
+    ("profiles.get_unscraped_profiles", "scrape_profiles", {"scraper_id": SAMPLE_ID, **profiles.UNSCRAPED_FILTER}),
+    ("profiles.profiles_with_links", "scrape_profiles", {"scraper_id": SAMPLE_ID, **profiles.LINKS_TO_CHECK_FILTER}),
+    ("profiles.update_profile", "scrape_profiles", {"scraper_id": SAMPLE_ID, "username": "sample"}),
+    ("profiles.update_profile_data", "scrape_profiles", {"username": "sample"}),
+    # scrapers
+    ("scrapers.get_scraper_name", "scrapers", {"_id": SAMPLE_OBJECT_ID}),
+    ("scrapers.get_scraper_names", "scrapers", {"_id": {"$in": [SAMPLE_OBJECT_ID]}}),
+    ("scrapers.get_scrapers_page", "scrapers", page_after({})),
+    ("scrapers.get_scrapers_page(sort=scraper_name)", "scrapers", page_after({}, sort="scraper_name")),
+    ("scrapers.get_scraper_data_by_id", "scrapers", {"_id": SAMPLE_OBJECT_ID}),
+    ("scrapers.get_scraper_state", "scrapers", {"_id": SAMPLE_OBJECT_ID}),
+    ("scrapers.scraper_check_suspended", "scrapers", {"_id": SAMPLE_OBJECT_ID}),
+    ("scrapers.set_scraper_activity", "scrapers", {"_id": SAMPLE_OBJECT_ID}),
+    ("scrapers.update_scraper_data", "scrapers", {"_id": SAMPLE_OBJECT_ID}),
+    ("scrapers.update_activity", "scrapers", {"_id": SAMPLE_OBJECT_ID}),
+    ("scrapers.create_freq_stats", "keywords_stats", {"scraper_id": SAMPLE_ID}),
+    ("scrapers.get_freq_stats", "keywords_stats", {"scraper_id": SAMPLE_ID}),
+    ("scrapers.update_freq_stats", "keywords_stats", {"scraper_id": SAMPLE_ID}),
+    ("scrapers.increment_freq_stats", "keywords_stats", {"scraper_id": SAMPLE_ID}),
+    # targeted apps
+    ("targeted_apps.get_targeted_apps", "targeted_apps", {"scraper_id": SAMPLE_ID}),
+    ("targeted_apps.get_targeted_app", "targeted_apps", {"_id": SAMPLE_OBJECT_ID}),
+    ("targeted_apps.get_targeted_app_profiles", "scrape_profiles", {"targeted_app_id": SAMPLE_ID}),
+    # screenshots
+    ("screenshots.save_screenshot", f"{SCREENSHOTS_BUCKET}.files", {"filename": "0" * 64}),
+    ("screenshots.get_screenshot", f"{SCREENSHOTS_BUCKET}.files", {"filename": "0" * 64}),
+    # relevancy labels
+    ("relevancy_labels.get_relevancy_labels", "relevancy_labels", {"campaign_key": "0" * 64}),
+    # caption signatures
+    ("caption_signatures.upsert_caption_signatures", "caption_signatures", {"campaign_key": "0" * 64, "signature": b"\0" * 64}),
+    ("caption_signatures.get_caption_signatures_chunk", "caption_signatures", {"campaign_key": "0" * 64, "_id": {"$lt": SAMPLE_OBJECT_ID}}),
+]
+
+# functions that list a whole collection on purpose, a scan is the plan for them
+FULL_LISTINGS = [
+    "accounts.get_all_accounts",
+    "ads.get_all_sus_ads_links",
+    "links.get_all_links_data",
+    "links.get_all_sus_links",
+    "scrapers.get_all_scrapers",
+    "scrapers.get_all_scraper_ids",
+]
+
+def plan_stages(plan: dict) -> list[str]:
+    ''' all stage names of a (possibly nested) query plan '''
+    stages = []
+    if not isinstance(plan, dict):
+        return stages
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    for key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for sub_plan in plan.get("inputStages", []):
+        stages.extend(plan_stages(sub_plan))
+    return stages
+
+async def explain_query(collection_name: str, query: dict) -> list[str]:
+    explanation = await get_db()[collection_name].find(query).explain()
+    return plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+async def check_index_coverage() -> list[tuple[str, list[str]]]:
+    ''' returns (function, stages) for every query that was planned as a COLLSCAN '''
+    collscans = []
+    for function_name, collection_name, query in QUERY_SHAPES:
+        stages = await explain_query(collection_name, query)
+        print(f"{function_name:45} {collection_name:16} {' <- '.join(stages)}")
+        if "COLLSCAN" in stages:
+            collscans.append((function_name, stages))
+    return collscans
+
+async def main(ensure: bool = False) -> int:
+    if ensure:
+        await ensure_indexes()
+
+    collscans = await check_index_coverage()
+    if collscans:
+        print(f"\n{len(collscans)} queries do a COLLSCAN:")
+        for function_name, _ in collscans:
+            print(f"  - {function_name}")
+        return 1
+
+    print(f"\nall {len(QUERY_SHAPES)} queries use an index ({len(FULL_LISTINGS)} full listings skipped)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(ensure="--ensure" in sys.argv)))
@@ -0,0 +1,86 @@
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from server.database.connection import get_db
+
+# INDEXES OF EVERY COLLECTION
+# create_index is a no-op when the same index already exists, so this is safe to run
+# on every server start and every scraper_runner start.
+# the unique indexes can not be built over existing duplicates: py_scripts/dedupe_unique_keys.py
+# merges them and builds the indexes, run it once on databases from before these indexes.
+INDEXES: dict[str, list[IndexModel]] = {
+    "scrape_profiles": [
+        # one profile document per (campaign, username)
+        IndexModel([("scraper_id", ASCENDING), ("username", ASCENDING)], unique=True, name="scraper_id_username_unique"),
+        IndexModel([("scraper_id", ASCENDING), ("scraped", ASCENDING), ("_id", ASCENDING)], name="scraper_id_scraped_id"),
+        IndexModel([("scraper_id", ASCENDING), ("scraped", ASCENDING), ("username", ASCENDING), ("_id", ASCENDING)], name="scraper_id_scraped_username_id"),
+        IndexModel([("username", ASCENDING)], name="username"),
+        IndexModel([("targeted_app_id", ASCENDING)], sparse=True, name="targeted_app_id"),
+    ],
+    "links": [
+        IndexModel([("scraper_id", ASCENDING), ("suspicious", ASCENDING)], name="scraper_id_suspicious"),
+        IndexModel([("scraper_id", ASCENDING), ("_id", ASCENDING)], name="scraper_id_id"),
+    ],
+    "scraped_content": [
+        IndexModel([("scraper_id", ASCENDING), ("_id", ASCENDING)], name="scraper_id_id"),
+        IndexModel([("scraper_id", ASCENDING), ("taken_at", ASCENDING), ("_id", ASCENDING)], name="scraper_id_taken_at_id"),
+        IndexModel([("scraper_id", ASCENDING), ("like_count", ASCENDING), ("_id", ASCENDING)], name="scraper_id_like_count_id"),
+        # a reel is saved once per campaign
+        IndexModel([("scraper_id", ASCENDING), ("code", ASCENDING)], unique=True, name="scraper_id_code_unique"),
+        # near-duplicate caption clusters, for analysts
+        IndexModel([("scraper_id", ASCENDING), ("cluster_id", ASCENDING)], sparse=True, name="scraper_id_cluster_id"),
+    ],
+    "ads": [
+        IndexModel([("scraper_id", ASCENDING), ("_id", ASCENDING)], name="scraper_id_id"),
+        IndexModel([("scraper_id", ASCENDING), ("last_seen", ASCENDING), ("_id", ASCENDING)], name="scraper_id_last_seen_id"),
+        # an ad is stored once per campaign, re-sightings only bump its counters
+        IndexModel([("scraper_id", ASCENDING), ("code", ASCENDING)], unique=True, name="scraper_id_code_unique"),
+    ],
+    "scrapers": [
+        # get_scrapers_page sorted by name
+        IndexModel([("scraper_name", ASCENDING), ("_id", ASCENDING)], name="scraper_name_id"),
+    ],
+    "keywords_stats": [
+        # one stats document per campaign
+        IndexModel([("scraper_id", ASCENDING)], unique=True, name="scraper_id_unique"),
+    ],
+    "accounts": [
+        IndexModel([("scraper_id", ASCENDING)], name="scraper_id"),
+    ],
+    "targeted_apps": [
+        IndexModel([("scraper_id", ASCENDING)], name="scraper_id"),
+    ],
+    "relevancy_labels": [
+        # newest labels of a campaign first, the classifiers train on them
+        IndexModel([("campaign_key", ASCENDING), ("labeled_on", ASCENDING)], name="campaign_key_labeled_on"),
+    ],
+    "caption_signatures": [
+        IndexModel([("campaign_key", ASCENDING), ("signature", ASCENDING)], unique=True, name="campaign_key_signature_unique"),
+        IndexModel([("campaign_key", ASCENDING), ("_id", ASCENDING)], name="campaign_key_id"),
+    ],
+    "screenshots.files": [
+        # the index GridFS itself builds on first upload, created early so lookups by hash never scan
+        IndexModel([("filename", ASCENDING), ("uploadDate", ASCENDING)], name="filename_1_uploadDate_1"),
+    ],
+}
+
+DUPLICATE_KEY = 11000
+
+async def ensure_indexes() -> bool:
+    ''' create missing indexes, returns False if any of them could not be built '''
+    db = get_db()
+    all_ok = True
+
+    for collection_name, index_models in INDEXES.items():
+        collection = db[collection_name]
+        for index_model in index_models:
+            try:
+                await collection.create_indexes([index_model])
+            except OperationFailure as e:
+                # usually duplicates that break a unique index, or an old index with other options
+                all_ok = False
+                print(f"Failed to create index {index_model.document['name']} on {collection_name}: {e}")
+                if e.code == DUPLICATE_KEY:
+                    print("  duplicates from before the index existed, merge them with: python -m py_scripts.dedupe_unique_keys")
+
+    return all_ok
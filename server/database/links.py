@@ -1,19 +1,19 @@
 
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from server.database.connection import get_db
+from server.database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, find_page
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+# filters shared with index_check
+LINKS_TO_CHECK_FILTER = {"suspicious": ""}
 
 # TYPICAL LINKS DATA
 # {
@@ -22,13 +22,13 @@ db = client[DB_NAME]
 #     "suspicious": "",
 #     "state": "",
 #     "manual_check_result": ""
-#     "screenshot": ""
+#     "screenshot_id": "" (sha256 of the screenshot in the screenshot store)
 # }
 
 # CREATE
 async def save_links_data(data : dict, scraper_id: str):
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
 
     documents = []
     # print(len(contents))
@@ -50,22 +50,37 @@ async def save_links_data(data : dict, scraper_id: str):
 # GET
 async def get_links_data(scraper_id: str, screenshot: bool = False) -> dict:
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
     links = set()
-    documents: list[dict] = await collection.find({"scraper_id": scraper_id, }).to_list(length=None)
+    # leave (legacy inline) screenshots in the database unless they are asked for
+    projection = None if screenshot else {"screenshot": 0}
+    documents: list[dict] = await collection.find({"scraper_id": scraper_id, }, projection).to_list(length=None)
     
     final_result = []
 
     for doc in documents:
         # doc["id"] = str(doc["_id"])
         doc["_id"] = str(doc["_id"])
-        if not screenshot:
-            doc.pop("screenshot", None) # no need for screenshots here
         final_result.append(doc)
     return final_result
 
+LINK_FIELDS = ["link", "profiles", "suspicious", "state", "manual_check_result", "review_notes", "scraper_id", "screenshot_id"]
+LINK_ALLOWED_FIELDS = LINK_FIELDS + ["screenshot"]
+LINK_SORT_FIELDS = ["_id"]
+
+async def get_links_page(scraper_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None, sort: str = "_id", order: str = "asc") -> dict:
+    # select the correct collection
+    collection = get_db()["links"]
+
+    # same "_id" key as get_links_data
+    return await find_page(
+        collection, {"scraper_id": scraper_id},
+        default_fields=LINK_FIELDS, allowed_fields=LINK_ALLOWED_FIELDS, sort_fields=LINK_SORT_FIELDS,
+        after=after, limit=limit, fields=fields, sort=sort, order=order, id_key="_id"
+    )
+
 async def get_link_data(link_id: str)-> dict:
-    collection = db["links"]
+    collection = get_db()["links"]
      
     try:
         link_object_id = ObjectId(link_id)
@@ -78,9 +93,9 @@ async def get_link_data(link_id: str)-> dict:
 
 async def get_links_to_check(scraper_id: str) -> list:
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
     
-    documents = await collection.find({"scraper_id": scraper_id, "suspicious": ""}).to_list(length=None)
+    documents = await collection.find({"scraper_id": scraper_id, **LINKS_TO_CHECK_FILTER}).to_list(length=None)
     return [dict({
         "id": str(doc["_id"]),
         "link": doc["link"],
@@ -92,13 +107,58 @@ async def get_links_to_check(scraper_id: str) -> list:
 
 async def get_all_links_data() -> list:
     # select the correct collection
-    collection = db["links"]
-    documents = await collection.find({}).to_list(length=None)
+    collection = get_db()["links"]
+    documents = await collection.find({}, {"screenshot": 0}).to_list(length=None)
 
     return [{"id": str(doc["_id"]), **doc} for doc in documents]
 
+async def get_all_links_with_campaign_page(after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    ''' one page of all links with their campaign name joined in by the database (no screenshots) '''
+    # select the correct collection
+    collection = get_db()["links"]
+
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    match = dict()
+    if after:
+        try:
+            match["_id"] = {"$gt": ObjectId(after)}
+        except (InvalidId, TypeError):
+            raise ValueError("after must be a document id")
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit + 1}, # one extra document tells whether there is a next page
+        # links keep the scraper id as a string, scrapers are keyed by ObjectId
+        {"$addFields": {"scraper_object_id": {"$convert": {"input": "$scraper_id", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {"from": "scrapers", "localField": "scraper_object_id", "foreignField": "_id", "as": "scraper"}},
+        {"$project": {
+            "_id": 0,
+            "link_id": {"$toString": "$_id"},
+            "link": 1,
+            "profiles": 1,
+            "suspicious": 1,
+            "campaign_id": "$scraper_id",
+            "campaign_name": {"$ifNull": [{"$arrayElemAt": ["$scraper.scraper_name", 0]}, ""]},
+            "manual_check_result": 1,
+            "state": 1,
+        }},
+    ]
+
+    links = await collection.aggregate(pipeline).to_list(length=limit + 1)
+
+    next_after = None
+    if len(links) > limit:
+        links = links[:limit]
+        next_after = links[-1]["link_id"]
+
+    return {"items": links, "next_after": next_after}
+
 async def get_all_sus_links():
-    collection = db["links"]
+    collection = get_db()["links"]
     
     documents = await collection.find({}, {"_id": 0, "link": 1}).to_list(length=None)
     return [doc["link"] for doc in documents]
@@ -106,7 +166,7 @@ async def get_all_sus_links():
 # UPDATE
 async def update_link_state(link_id: str, data: dict):
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
 
     try:
         link_object_id = ObjectId(link_id)
@@ -123,7 +183,7 @@ async def update_link_state(link_id: str, data: dict):
 
 async def update_link_data(link_id: str, data: dict):
     # select the correct collection
-    collection = db["links"]
+    collection = get_db()["links"]
 
     try:
         link_object_id = ObjectId(link_id)
@@ -0,0 +1,55 @@
+
+import asyncio
+from typing import Awaitable, Callable
+from server.database.profiles import get_profiles_data_by_usernames
+from server.database.scrapers import get_scraper_names
+
+# REQUEST-SCOPED BATCH LOADERS
+# load() calls made in the same event loop tick are deduped and resolved by one batch query.
+# make a new RequestLoaders per request, its cache must not outlive the request.
+
+class BatchLoader:
+    def __init__(self, batch_fn: Callable[[list], Awaitable[dict]]):
+        self.batch_fn = batch_fn    # keys -> {key: value}, missing keys resolve to None
+        self.futures: dict = {}     # key -> future, also the per-request cache
+        self.queue: list = []
+
+    def load(self, key) -> asyncio.Future:
+        if key in self.futures:
+            return self.futures[key]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.futures[key] = future
+        self.queue.append(key)
+
+        # first key of this tick, dispatch once everything else queued in the tick is in
+        if len(self.queue) == 1:
+            loop.call_soon(self._dispatch)
+        return future
+
+    def load_many(self, keys: list) -> asyncio.Future:
+        # not a coroutine, so the keys are queued right away in the caller's tick
+        return asyncio.gather(*[self.load(key) for key in keys])
+
+    def _dispatch(self):
+        keys, self.queue = self.queue, []
+        asyncio.ensure_future(self._resolve(keys))
+
+    async def _resolve(self, keys: list):
+        try:
+            results = await self.batch_fn(keys)
+        except Exception as e:
+            for key in keys:
+                if not self.futures[key].done():
+                    self.futures[key].set_exception(e)
+            return
+
+        for key in keys:
+            if not self.futures[key].done():
+                self.futures[key].set_result(results.get(key, None))
+
+class RequestLoaders:
+    def __init__(self):
+        self.profiles = BatchLoader(get_profiles_data_by_usernames)
+        self.scraper_names = BatchLoader(get_scraper_names)
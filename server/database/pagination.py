@@ -0,0 +1,106 @@
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+# KEYSET PAGINATION
+# pages are addressed by the _id of the last document of the previous page (after=<_id>),
+# so every page is an index range scan no matter how deep the client pages.
+# sorting by another field pages on (field, _id), the list functions keep an index for
+# each field they allow sorting on.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def parse_fields(fields: str, default_fields: list[str], allowed_fields: list[str]) -> dict:
+    ''' "a,b,c" -> projection, raises ValueError for fields that are not exposed '''
+    if not fields:
+        selected = default_fields
+    else:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in allowed_fields]
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(unknown)}")
+
+    return {field: 1 for field in selected}
+
+def keyset_filter(sort: str, order: str, anchor_value, after_id: ObjectId) -> dict:
+    ''' the documents after (anchor_value, after_id) in (sort, _id) order '''
+    compare = "$gt" if order == "asc" else "$lt"
+    # null and missing values sort before every other value, and {"$gt": None} / {"$lt": None}
+    # match nothing, so a null anchor (or a page that reaches the nulls) needs its own branches
+    if anchor_value is None:
+        after_anchor = [{sort: None, "_id": {compare: after_id}}]
+        if order == "asc":
+            after_anchor.append({sort: {"$ne": None}})
+    else:
+        after_anchor = [
+            {sort: {compare: anchor_value}},
+            {sort: anchor_value, "_id": {compare: after_id}},
+        ]
+        if order == "desc":
+            after_anchor.append({sort: None})
+    return {"$or": after_anchor}
+
+async def find_page(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    default_fields: list[str],
+    allowed_fields: list[str],
+    sort_fields: list[str],
+    after: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: str = None,
+    sort: str = "_id",
+    order: str = "asc",
+    id_key: str = "id",
+) -> dict:
+    ''' one page of documents, {"items": [...], "next_after": <_id of the last item> | None} '''
+    if sort not in sort_fields:
+        raise ValueError(f"can not sort by {sort}, use one of: {', '.join(sort_fields)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    projection = parse_fields(fields, default_fields, allowed_fields)
+    direction = ASCENDING if order == "asc" else DESCENDING
+    compare = "$gt" if order == "asc" else "$lt"
+
+    page_query = dict(query)
+    if after:
+        try:
+            after_id = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise ValueError("after must be a document id")
+
+        if sort == "_id":
+            page_query["_id"] = {compare: after_id}
+        else:
+            # continue right behind the (sort value, _id) of the last document seen
+            anchor = await collection.find_one({"_id": after_id}, {sort: 1})
+            if anchor is None:
+                raise ValueError("after does not point to an existing document")
+            page_query = {"$and": [query, keyset_filter(sort, order, anchor.get(sort, None), after_id)]}
+
+    sort_spec = [(sort, direction)]
+    if sort != "_id":
+        sort_spec.append(("_id", direction))
+
+    # one extra document tells whether there is a next page
+    cursor = collection.find(page_query, projection).sort(sort_spec).limit(limit + 1)
+    documents = await cursor.to_list(length=limit + 1)
+
+    next_after = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_after = str(documents[-1]["_id"])
+
+    items = []
+    for doc in documents:
+        doc[id_key] = str(doc.pop("_id"))
+        items.append(doc)
+
+    return {"items": items, "next_after": next_after}
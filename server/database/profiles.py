@@ -1,45 +1,86 @@
 
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from server.database.connection import get_db
+from server.database.pagination import DEFAULT_PAGE_SIZE, find_page
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+# filters shared with index_check
+SCRAPED_FILTER = {"scraped": True}
+UNSCRAPED_FILTER = {"scraped": False}
+LINKS_TO_CHECK_FILTER = {"links": {"$exists": True, "$ne": []}, "is_suspicious": {"$exists": False}}
 
 # CREATE
-async def add_profile(scraper_id: str, username: str, targeted_app_id: str = "") -> dict:
-    # select the correct collection
-    collection = db["scrape_profiles"]
-
-    double_check = await collection.find_one({"scraper_id": scraper_id, "username": username})
-    if double_check:
-        return {"id": str(double_check["_id"])}
-
+def new_profile_fields(targeted_app_id: str = "") -> dict:
+    ''' fields a profile gets when it is first discovered ($setOnInsert) '''
     profile = dict()
-    profile["scraper_id"] = scraper_id
     profile["saved_on"] = datetime.utcnow()
     profile["scraped"] = False
-    profile["username"] = username
 
     if targeted_app_id!= "":
         profile["targeted_app_id"] = targeted_app_id
+    return profile
 
-    result = await collection.insert_one(profile)
-    return {"id": str(result.inserted_id)}
+async def add_profile(scraper_id: str, username: str, targeted_app_id: str = "") -> dict:
+    # select the correct collection
+    collection = get_db()["scrape_profiles"]
+
+    query = {"scraper_id": scraper_id, "username": username}
+    try:
+        # single round trip, the unique (scraper_id, username) index keeps it one doc per profile
+        document = await collection.find_one_and_update(
+            query,
+            {"$setOnInsert": new_profile_fields(targeted_app_id)},
+            projection={"_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # another scraper upserted the same profile at the same moment
+        document = await collection.find_one(query, {"_id": 1})
+
+    return {"id": str(document["_id"])}
+
+async def add_profiles(scraper_id: str, usernames: list[str], targeted_app_id: str = "") -> dict:
+    ''' bulk version of add_profile, one unordered bulk_write for the whole batch '''
+    # select the correct collection
+    collection = get_db()["scrape_profiles"]
+
+    unique_usernames = list(dict.fromkeys(username for username in usernames if username))
+    if not unique_usernames:
+        return {"inserted": 0, "total": 0}
+
+    operations = [
+        UpdateOne(
+            {"scraper_id": scraper_id, "username": username},
+            {"$setOnInsert": new_profile_fields(targeted_app_id)},
+            upsert=True
+        ) for username in unique_usernames
+    ]
+
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        inserted = result.upserted_count
+    except BulkWriteError as e:
+        # duplicate key errors only mean a concurrent scraper inserted the profile first
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        inserted = e.details.get("nUpserted", 0)
+
+    return {"inserted": inserted, "total": len(unique_usernames)}
 
 # GET
 async def get_profile_data(username: str):
      # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     result = await collection.find_one(
         {"username": username},
@@ -47,11 +88,26 @@ async def get_profile_data(username: str):
     )
     return result
 
+async def get_profiles_data_by_usernames(usernames: list[str]) -> dict:
+    ''' batch get_profile_data, one $in query -> {username: profile} '''
+    # select the correct collection
+    collection = get_db()["scrape_profiles"]
+
+    profiles = dict()
+    documents = await collection.find(
+        {"username": {"$in": list(set(usernames))}},
+        {"_id": 0}
+    ).to_list(length=None)
+    for doc in documents:
+        # like find_one, the first match wins if a username was found by several scrapers
+        profiles.setdefault(doc["username"], doc)
+    return profiles
+
 async def get_profiles_data(scraper_id: str) -> dict:
         # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
-    documents = await collection.find({"scraper_id": scraper_id, "scraped": True}).to_list(length=None)
+    documents = await collection.find({"scraper_id": scraper_id, **SCRAPED_FILTER}).to_list(length=None)
     return [dict({
         "id": str(doc["_id"]),
         "username": doc["username"],
@@ -60,18 +116,42 @@ async def get_profiles_data(scraper_id: str) -> dict:
         "is_suspicious": doc.get("is_suspicious", "")
     }) for doc in documents]
 
+PROFILE_FIELDS = ["username", "bio", "links", "is_suspicious"]
+PROFILE_ALLOWED_FIELDS = PROFILE_FIELDS + ["saved_on", "targeted_app_id", "bio_relevant", "relevancy_checked_on"]
+PROFILE_SORT_FIELDS = ["_id", "username"]
+
+async def get_profiles_page(scraper_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None, sort: str = "_id", order: str = "asc") -> dict:
+    # select the correct collection
+    collection = get_db()["scrape_profiles"]
+
+    return await find_page(
+        collection, {"scraper_id": scraper_id, **SCRAPED_FILTER},
+        default_fields=PROFILE_FIELDS, allowed_fields=PROFILE_ALLOWED_FIELDS, sort_fields=PROFILE_SORT_FIELDS,
+        after=after, limit=limit, fields=fields, sort=sort, order=order
+    )
+
+async def get_bios_chunk(scraper_id: str, after: ObjectId = None, limit: int = 1000) -> list[dict]:
+    ''' {_id, bio} of the scraper's scraped profiles after the given _id, for batch jobs '''
+    # select the correct collection
+    collection = get_db()["scrape_profiles"]
+
+    query = {"scraper_id": scraper_id, **SCRAPED_FILTER}
+    if after is not None:
+        query["_id"] = {"$gt": after}
+    return await collection.find(query, {"bio": 1}).sort("_id", 1).limit(limit).to_list(length=limit)
+
 async def get_unscraped_profiles(scraper_id: str) -> list:
     # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
-    documents = await collection.find({"scraper_id": scraper_id, "scraped": False}, {"username": 1, "_id": 0}).to_list(length=None)
+    documents = await collection.find({"scraper_id": scraper_id, **UNSCRAPED_FILTER}, {"username": 1, "_id": 0}).to_list(length=None)
     return [doc["username"] for doc in documents]
 
 async def profiles_with_links(scraper_id: str) -> list:
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     documents = await collection.find(
-        {"scraper_id": scraper_id, "links": {"$exists": True, "$ne": []}, "is_suspicious": {"$exists": False}},
+        {"scraper_id": scraper_id, **LINKS_TO_CHECK_FILTER},
         {"username": 1, "links": 1, "_id": 0}
     ).to_list(length=None)
     
@@ -87,7 +167,7 @@ async def profiles_with_links(scraper_id: str) -> list:
 # UPDATE
 async def update_profile(scraper_id: str, username: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     result = await collection.update_one(
         {"scraper_id": scraper_id, "username": username},
@@ -103,7 +183,7 @@ async def update_profile(scraper_id: str, username: str, data: dict) -> dict:
 
 async def update_profile_data(username: str, data: dict):
      # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
 
     result = await collection.update_one(
         {"username": username},
@@ -112,3 +192,17 @@ async def update_profile_data(username: str, data: dict):
         }
     )
     return True
+
+async def set_bios_relevancy(verdicts: dict[ObjectId, bool]) -> int:
+    ''' write re-classification verdicts of bios ({_id: relevant}) with one unordered bulk_write '''
+    # select the correct collection
+    collection = get_db()["scrape_profiles"]
+
+    if not verdicts:
+        return 0
+    now = datetime.utcnow()
+    result = await collection.bulk_write([
+        UpdateOne({"_id": _id}, {"$set": {"bio_relevant": verdict, "relevancy_checked_on": now}})
+        for _id, verdict in verdicts.items()
+    ], ordered=False)
+    return result.modified_count
@@ -0,0 +1,32 @@
+
+from datetime import datetime
+from server.database.connection import get_db
+
+# LABELING LOG OF CAPTION VERDICTS
+# every verdict the LLM gives is kept per campaign (prompt + keywords),
+# the local relevance classifiers are trained on it.
+
+# CREATE
+def build_label_doc(scraper_id: str, campaign_key: str, caption: str, verdict: bool) -> dict:
+    return {
+        "scraper_id": scraper_id,
+        "campaign_key": campaign_key,
+        "caption": caption,
+        "verdict": verdict,
+        "source": "llm",
+        "labeled_on": datetime.utcnow(),
+    }
+
+async def insert_relevancy_labels(documents: list[dict]):
+    if not documents:
+        return
+    await get_db()["relevancy_labels"].insert_many(documents, ordered=False)
+
+# GET
+async def get_relevancy_labels(campaign_key: str, limit: int = 20000) -> list[dict]:
+    ''' newest labels of a campaign as {"caption", "verdict"} '''
+    cursor = get_db()["relevancy_labels"].find(
+        {"campaign_key": campaign_key},
+        {"_id": 0, "caption": 1, "verdict": 1}
+    ).sort("labeled_on", -1).limit(limit)
+    return await cursor.to_list(length=limit)
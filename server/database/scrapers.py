@@ -1,25 +1,21 @@
 
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
-from links import get_links_data
+from server.database.connection import get_db
+from server.database.pagination import DEFAULT_PAGE_SIZE, find_page
+from server.database.links import get_links_data
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
-
 # CREATE
 async def new_scraper(text: str, topic_attributes, hashtags, scraper_name) -> dict:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
 
     document = {
         "text": text,
@@ -37,7 +33,7 @@ async def new_scraper(text: str, topic_attributes, hashtags, scraper_name) -> di
 
 async def get_all_scrapers() -> list:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     documents = await collection.find({}).to_list(length=None)
     return [ dict({
@@ -49,21 +45,40 @@ async def get_all_scrapers() -> list:
         "relevant_reels_seen": doc.get("relevant_reels_seen", 0),
     }) for doc in documents]
 
+SCRAPER_FIELDS = ["scraper_name", "state", "active", "reels_seen", "relevant_reels_seen"]
+SCRAPER_ALLOWED_FIELDS = SCRAPER_FIELDS + ["text", "topic_attributes", "hashtags", "is_suspended", "total_time"]
+SCRAPER_SORT_FIELDS = ["_id", "scraper_name"]
+
+async def get_scrapers_page(after: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None, sort: str = "_id", order: str = "asc") -> dict:
+    # select the correct collection
+    collection = get_db()["scrapers"]
+
+    page = await find_page(
+        collection, {},
+        default_fields=SCRAPER_FIELDS, allowed_fields=SCRAPER_ALLOWED_FIELDS, sort_fields=SCRAPER_SORT_FIELDS,
+        after=after, limit=limit, fields=fields, sort=sort, order=order
+    )
+    # same shape as get_all_scrapers
+    for doc in page["items"]:
+        if "scraper_name" in doc:
+            doc["title"] = doc.pop("scraper_name")
+    return page
+
 async def get_all_scraper_ids() -> list[str]:
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
 
     documents = await collection.find({}, {"_id": 1}).to_list(length=None)
     return [ str(doc["_id"]) for doc in documents]
 
 # async def get_all_documents() -> list:
 #     # select the correct collection
-#     collection = db["scrapers"]
+#     collection = get_db()["scrapers"]
     
 #     documents = await collection.find().to_list(length=None)
 #     return [{"id": str(doc["_id"]), **doc} for doc in documents]
 
 async def get_scraper_name(scraper_id)-> str:
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     try:
         scraper_object_id = ObjectId(scraper_id)
     except: # invalid id format
@@ -74,8 +89,25 @@ async def get_scraper_name(scraper_id)-> str:
     )
     return result.get("scraper_name", "")
 
+async def get_scraper_names(scraper_ids: list[str]) -> dict:
+    ''' batch get_scraper_name, one $in query -> {scraper_id: name} '''
+    collection = get_db()["scrapers"]
+
+    object_ids = []
+    for scraper_id in set(scraper_ids):
+        try:
+            object_ids.append(ObjectId(scraper_id))
+        except: # invalid id format
+            pass
+
+    documents = await collection.find(
+        {"_id": {"$in": object_ids}},
+        {"scraper_name": 1}
+    ).to_list(length=None)
+    return {str(doc["_id"]): doc.get("scraper_name", "") for doc in documents}
+
 async def get_scraper_data_by_id(document_id: str) -> dict:
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     # print(document_id)
     try:
         object_id = ObjectId(document_id)
@@ -97,7 +129,7 @@ async def get_scraper_data_by_id(document_id: str) -> dict:
 
 async def get_scraper_state(document_id: str) -> str:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
 
     try:
         object_id = ObjectId(document_id)
@@ -108,7 +140,7 @@ async def get_scraper_state(document_id: str) -> str:
     return document["state"]
 
 async def scraper_check_suspended(scraper_id: str) -> bool :
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     try:
         scraper_object_id = ObjectId(scraper_id)
@@ -127,7 +159,7 @@ async def scraper_check_suspended(scraper_id: str) -> bool :
 # UPDATE
 async def set_scraper_activity(document_id: str, new_status: bool) -> dict:
     ''' set the status of the scraper false for suspending, true for running '''
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     try:
         object_id = ObjectId(document_id)
     except: # invalid id format
@@ -159,7 +191,7 @@ def updated_doc_properties(doc: dict) -> dict:
 
 async def update_scraper_data(scraper_id: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     try:
         scraper_object_id = ObjectId(scraper_id)
@@ -176,7 +208,7 @@ async def update_scraper_data(scraper_id: str, data: dict) -> dict:
     return {"id": str(result.upserted_id), **data}
 
 async def update_activity(scraper_id: str, new_active_state: bool):
-    collection = db["scrapers"]
+    collection = get_db()["scrapers"]
     
     try:
         scraper_object_id = ObjectId(scraper_id)
@@ -208,32 +240,93 @@ async def update_activity(scraper_id: str, new_active_state: bool):
 
 # CREATE
 async def create_freq_stats(doc: dict):
-    collection = db["keywords_stats"]
-    
-    result = await collection.insert_one(doc)
-    return {"id": str(result.inserted_id)}
+    ''' seed the stats of a scraper, an upsert so it can't race the $inc of increment_freq_stats '''
+    collection = get_db()["keywords_stats"]
+
+    doc = encode_topic_stats(doc)
+    # $max adds the missing topics and never lowers a count that was written first
+    seed = {f"{field}.{key}": value for field in ("freq", "priority") for key, value in doc.get(field, dict()).items()}
+    on_insert = {field: value for field, value in doc.items() if field not in ("scraper_id", "freq", "priority")}
+
+    update = {"$setOnInsert": {"freq": dict(), "priority": dict(), **on_insert}}
+    if seed:
+        update = {"$max": seed}
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+
+    result = await collection.update_one(
+        {"scraper_id": doc["scraper_id"]},
+        update,
+        upsert=True
+    )
+    return {"id": str(result.upserted_id)}
 
 # GET
 async def get_freq_stats(scraper_id: str):
     try:    
-        collection = db["keywords_stats"]
+        collection = get_db()["keywords_stats"]
         document = await collection.find_one(
             {"scraper_id": scraper_id},
             {"_id": 0}
         )
-        return document
+        return decode_topic_stats(document) if document is not None else None
     except: 
         return None
 
 # UPDATE
 async def update_freq_stats(scraper_id: str, new_stats: dict):
     # select the correct collection
-    collection = db["keywords_stats"]
+    collection = get_db()["keywords_stats"]
     
     await collection.update_one(
         {"scraper_id": scraper_id},
-        {"$set": {"freq": new_stats}},
+        {"$set": {"freq": {freq_key(topic): count for topic, count in new_stats.items()}}},
         upsert=True
     )
     return
 
+def freq_key(topic: str) -> str:
+    ''' stored key of a topic inside "freq" / "priority" (mongo paths can't hold "." or start with "$") '''
+    topic = topic.replace(".", "\uff0e")
+    if topic.startswith("$"):
+        topic = "\uff04" + topic[1:]
+    return topic
+
+def freq_topic(key: str) -> str:
+    ''' topic of a stored key, reverses freq_key '''
+    topic = key.replace("\uff0e", ".")
+    if topic.startswith("\uff04"):
+        topic = "$" + topic[1:]
+    return topic
+
+def encode_topic_stats(doc: dict) -> dict:
+    return {**doc, **{
+        field: {freq_key(topic): value for topic, value in doc[field].items()}
+        for field in ("freq", "priority") if isinstance(doc.get(field), dict)
+    }}
+
+def decode_topic_stats(doc: dict) -> dict:
+    return {**doc, **{
+        field: {freq_topic(key): value for key, value in doc[field].items()}
+        for field in ("freq", "priority") if isinstance(doc.get(field), dict)
+    }}
+
+def freq_field(topic: str) -> str:
+    ''' field path of a topic inside "freq" '''
+    return f"freq.{freq_key(topic)}"
+
+async def increment_freq_stats(scraper_id: str, deltas: dict):
+    ''' add the per-topic deltas with one atomic $inc, safe with many writers '''
+    # select the correct collection
+    collection = get_db()["keywords_stats"]
+
+    increments = {freq_field(topic): count for topic, count in deltas.items() if count}
+    if not increments:
+        return
+
+    await collection.update_one(
+        {"scraper_id": scraper_id},
+        {"$inc": increments},
+        upsert=True
+    )
+    return
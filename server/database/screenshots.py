@@ -0,0 +1,47 @@
+
+import hashlib
+import re
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from server.database.connection import get_db
+
+# SCREENSHOT BLOB STORE
+# screenshots live in GridFS, content-addressed by the sha256 of their bytes.
+# links / ads documents only keep the hash as "screenshot_id",
+# the binary is served by the /screenshots/{screenshot_id} endpoint.
+
+SCREENSHOTS_BUCKET = "screenshots"
+SCREENSHOT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+def get_bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(get_db(), bucket_name=SCREENSHOTS_BUCKET)
+
+def is_screenshot_id(screenshot_id: str) -> bool:
+    return bool(SCREENSHOT_ID_PATTERN.match(screenshot_id))
+
+# CREATE
+async def save_screenshot(data: bytes, content_type: str = "image/jpeg") -> str:
+    ''' store the bytes once and return their id (the sha256 hex digest) '''
+    screenshot_id = hashlib.sha256(data).hexdigest()
+
+    # identical screenshots (same landing page) are stored once
+    existing = await get_db()[f"{SCREENSHOTS_BUCKET}.files"].find_one({"filename": screenshot_id}, {"_id": 1})
+    if existing:
+        return screenshot_id
+
+    await get_bucket().upload_from_stream(
+        screenshot_id,
+        data,
+        metadata={"content_type": content_type}
+    )
+    return screenshot_id
+
+# GET
+async def get_screenshot(screenshot_id: str) -> tuple[bytes, str]:
+    ''' (bytes, content type) of a stored screenshot, None if there is none '''
+    file_doc = await get_db()[f"{SCREENSHOTS_BUCKET}.files"].find_one({"filename": screenshot_id})
+    if not file_doc:
+        return None
+
+    stream = await get_bucket().open_download_stream(file_doc["_id"])
+    data = await stream.read()
+    return data, file_doc.get("metadata", dict()).get("content_type", "image/jpeg")
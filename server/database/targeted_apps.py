@@ -1,20 +1,15 @@
 
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
 from bson.objectid import ObjectId
+from server.database.connection import get_db
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
-
 # TARGATED APPS
 
 # {
@@ -26,13 +21,13 @@ db = client[DB_NAME]
 
 async def get_targeted_apps(scraper_id: str) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
     result = await collection.find({"scraper_id": scraper_id}, {"_id": 0}).to_list(length=None)
     return result
 
 async def get_targeted_app(app_id: str) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
 
     try:
         app_object_id = ObjectId(app_id)
@@ -44,7 +39,7 @@ async def get_targeted_app(app_id: str) -> dict:
 
 async def update_targeted_app(target_app_id: str, data: dict) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
 
     try:
         scraper_object_id = ObjectId(target_app_id)
@@ -62,7 +57,7 @@ async def update_targeted_app(target_app_id: str, data: dict) -> dict:
 
 async def insert_targeted_app( data ) -> dict:
     # select the correct collection
-    collection = db["targeted_apps"]
+    collection = get_db()["targeted_apps"]
     data = dict(data)
 
     doc = await collection.insert_one(data)
@@ -70,7 +65,7 @@ async def insert_targeted_app( data ) -> dict:
 
 async def get_targeted_app_profiles(app_id: str) -> list:
     # select the correct collection
-    collection = db["scrape_profiles"]
+    collection = get_db()["scrape_profiles"]
     profiles = await collection.find({"targeted_app_id": app_id}, {"_id": 0}).to_list(length=None)
 
     return profiles
\ No newline at end of file
@@ -0,0 +1,218 @@
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections import Counter
+from server.database.scrapers import increment_freq_stats
+from server.database.content import build_content_doc, insert_content_docs
+from server.database.relevancy_labels import build_label_doc, insert_relevancy_labels
+from server.database.caption_signatures import upsert_caption_signatures
+from server.database.profiles import add_profiles
+
+# WRITE-BEHIND BUFFERS
+# the scroller loops record into these instead of awaiting a database write per reel,
+# the buffers flush in the background once enough items piled up, or flush_interval after the
+# first item that is not written yet (a timer, so the last items of a quiet phase don't wait for more).
+# a failed write keeps its items and is tried again an interval later.
+# call close() when the scraper stops so nothing recorded gets lost.
+
+CLOSE_RETRIES = 2
+CLOSE_RETRY_DELAY = 1   # seconds, doubled per retry
+
+class WriteBehindBuffer(ABC):
+    ''' size / time triggered background flushing, subclasses implement _write() '''
+
+    def __init__(self, scraper_id: str, flush_every: int, flush_interval: float):
+        self.scraper_id = scraper_id
+        self.flush_every = flush_every          # items
+        self.flush_interval = flush_interval    # seconds
+
+        self.items_since_flush = 0
+        self._flush_task: asyncio.Task = None
+        self._flush_timer: asyncio.TimerHandle = None
+
+    def _item_added(self):
+        self.items_since_flush += 1
+        if self.items_since_flush >= self.flush_every:
+            self._schedule_flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.flush_interval, self._interval_elapsed)
+
+    def _interval_elapsed(self):
+        self._flush_timer = None
+        if self._flush_task is not None and not self._flush_task.done():
+            # the running flush took its items already, the ones added meanwhile get another interval
+            self._flush_timer = asyncio.get_running_loop().call_later(self.flush_interval, self._interval_elapsed)
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> bool:
+        ''' write the buffered items, False if the write failed (the items are tried again an interval later) '''
+        self.items_since_flush = 0
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if await self._write():
+            return True
+        if self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.flush_interval, self._interval_elapsed)
+        return False
+
+    @abstractmethod
+    async def _write(self) -> bool:
+        ''' write the buffered items, on failure keep them and return False '''
+
+    async def close(self) -> bool:
+        ''' wait for a running flush and write whatever is left (retried), False if items are left unwritten '''
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        written = await self.flush()
+        for attempt in range(CLOSE_RETRIES):
+            if written:
+                break
+            await asyncio.sleep(CLOSE_RETRY_DELAY * 2**attempt)
+            written = await self.flush()
+
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not written:
+            print(f"{type(self).__name__} of {self.scraper_id}: giving up, buffered items are lost")
+        return written
+
+class FreqStatsBuffer(WriteBehindBuffer):
+    ''' accumulates keyword frequency deltas and writes them as one $inc '''
+
+    def __init__(self, scraper_id: str, flush_every: int = 25, flush_interval: float = 30):
+        super().__init__(scraper_id, flush_every, flush_interval)
+        self.deltas: Counter = Counter()
+
+    def record(self, topics: list[str]):
+        ''' count one reel and the topics its caption matched '''
+        self.deltas.update(topics)
+        self._item_added()
+
+    async def _write(self) -> bool:
+        # swap first, reels recorded while the write is in flight go to the next batch
+        deltas, self.deltas = self.deltas, Counter()
+        if not deltas:
+            return True
+        try:
+            await increment_freq_stats(self.scraper_id, deltas)
+        except Exception as e:
+            # keep the counts for the next flush instead of dropping them
+            self.deltas.update(deltas)
+            print(f"Failed to flush keyword stats for {self.scraper_id}: {e}")
+            return False
+        return True
+
+class ContentBuffer(WriteBehindBuffer):
+    ''' collects relevant reels and saves them with one unordered insert_many '''
+
+    def __init__(self, scraper_id: str, flush_every: int = 10, flush_interval: float = 60):
+        super().__init__(scraper_id, flush_every, flush_interval)
+        self.docs: list[dict] = []
+        self.seen_codes: set[str] = set()
+
+    def add(self, media: dict, cluster_id: str = None) -> bool:
+        ''' queue a reel for saving, False if it was already queued in this session '''
+        # build the document now, the media dict can change or be dropped later
+        doc = build_content_doc(self.scraper_id, media)
+        if cluster_id is not None:
+            doc["cluster_id"] = cluster_id # near-duplicate captions share it
+
+        code = doc.get("code", "")
+        if code and code in self.seen_codes:
+            return False
+        self.seen_codes.add(code)
+
+        self.docs.append(doc)
+        self._item_added()
+        return True
+
+    async def _write(self) -> bool:
+        docs, self.docs = self.docs, []
+        if not docs:
+            return True
+        try:
+            await insert_content_docs(docs)
+        except Exception as e:
+            self.docs.extend(docs)
+            print(f"Failed to flush scraped content for {self.scraper_id}: {e}")
+            return False
+        return True
+
+class LabelBuffer(WriteBehindBuffer):
+    ''' collects LLM caption verdicts for the labeling log '''
+
+    def __init__(self, scraper_id: str, flush_every: int = 50, flush_interval: float = 60):
+        super().__init__(scraper_id, flush_every, flush_interval)
+        self.docs: list[dict] = []
+
+    def add(self, campaign_key: str, caption: str, verdict: bool):
+        self.docs.append(build_label_doc(self.scraper_id, campaign_key, caption, verdict))
+        self._item_added()
+
+    async def _write(self) -> bool:
+        docs, self.docs = self.docs, []
+        if not docs:
+            return True
+        try:
+            await insert_relevancy_labels(docs)
+        except Exception as e:
+            self.docs.extend(docs)
+            print(f"Failed to flush relevancy labels for {self.scraper_id}: {e}")
+            return False
+        return True
+
+class SignatureBuffer(WriteBehindBuffer):
+    ''' collects new / re-judged caption signatures, one upsert per signature '''
+
+    def __init__(self, scraper_id: str, flush_every: int = 50, flush_interval: float = 60):
+        super().__init__(scraper_id, flush_every, flush_interval)
+        self.docs: dict[str, dict[int, dict]] = dict() # campaign key -> signature -> latest doc
+
+    def add(self, campaign_key: str, doc: dict):
+        self.docs.setdefault(campaign_key, dict())[doc["signature"]] = doc
+        self._item_added()
+
+    async def _write(self) -> bool:
+        docs, self.docs = self.docs, dict()
+        campaign_key_failed = None
+        for campaign_key, signatures in docs.items():
+            try:
+                await upsert_caption_signatures(campaign_key, list(signatures.values()))
+            except Exception as e:
+                # newer docs recorded meanwhile win over the failed ones
+                self.docs[campaign_key] = {**signatures, **self.docs.get(campaign_key, dict())}
+                campaign_key_failed = campaign_key
+                print(f"Failed to flush caption signatures for {self.scraper_id}: {e}")
+        return campaign_key_failed is None
+
+class ProfileBuffer(WriteBehindBuffer):
+    ''' collects the usernames of found profiles and adds them with one bulk upsert '''
+
+    def __init__(self, scraper_id: str, flush_every: int = 10, flush_interval: float = 60):
+        super().__init__(scraper_id, flush_every, flush_interval)
+        self.usernames: list[str] = []
+
+    def add(self, username: str):
+        if not username:
+            return
+        self.usernames.append(username)
+        self._item_added()
+
+    async def _write(self) -> bool:
+        usernames, self.usernames = self.usernames, []
+        if not usernames:
+            return True
+        try:
+            await add_profiles(self.scraper_id, usernames)
+        except Exception as e:
+            self.usernames.extend(usernames)
+            print(f"Failed to flush profiles for {self.scraper_id}: {e}")
+            return False
+        return True
@@ -0,0 +1,108 @@
+import os
+import json
+import asyncio
+from typing import Protocol
+from google import generativeai as genai
+from caption_prefilter import CaptionPrefilter
+from llm_cache import normalize_caption
+from llm_governor import GovernedModel, PRIORITY_CAPTION
+import llm_instructions
+
+# LLM BACKENDS
+# everything that asks an LLM goes through a backend, picked by the LLM_BACKEND env variable:
+#   gemini - the Gemini API (through the node-wide rate governor)
+#   stub   - deterministic local answers (fixtures / rules) with configurable latency,
+#            for benchmarks and soak tests without network or API spend
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0.5"))    # seconds per call
+LLM_STUB_FIXTURES = os.getenv("LLM_STUB_FIXTURES", "")    # json file {caption: true / false}
+
+STUB_RELEVANT_SCORE = 2 # prefilter score the stub calls relevant (one promo pattern or two keywords)
+
+class LLMBackend(Protocol):
+    async def relevancy_check(self, caption: str, text_prompt: str, keywords: list[str]) -> bool: ...
+
+    async def relevancy_check_batch(self, captions: list[str], text_prompt: str, keywords: list[str]) -> list: ...
+
+    async def website_relevancy_check(self, html_content: str, scraper_text: str) -> bool: ...
+
+    async def title_keywords_hashtags(self, user_text: str) -> dict: ...
+
+    def stats(self) -> dict: ...
+
+class GeminiBackend:
+    def __init__(self, model_name: str, priority: int = PRIORITY_CAPTION):
+        genai.configure(api_key=os.getenv("GENAI_API_KEY"))
+        self.llm_model = GovernedModel(genai.GenerativeModel(model_name=model_name), priority=priority) # rate limited node-wide
+
+    async def relevancy_check(self, caption: str, text_prompt: str, keywords: list[str]) -> bool:
+        return await llm_instructions.relevancy_check(self.llm_model, caption, text_prompt, keywords)
+
+    async def relevancy_check_batch(self, captions: list[str], text_prompt: str, keywords: list[str]) -> list:
+        return await llm_instructions.relevancy_check_batch(self.llm_model, captions, text_prompt, keywords)
+
+    async def website_relevancy_check(self, html_content: str, scraper_text: str) -> bool:
+        return await llm_instructions.website_relevancy_check(self.llm_model, html_content, scraper_text)
+
+    async def title_keywords_hashtags(self, user_text: str) -> dict:
+        return await llm_instructions.title_keywords_hashtags_instruction(self.llm_model, user_text)
+
+    def stats(self) -> dict:
+        return self.llm_model.stats()
+
+class StubBackend:
+    def __init__(self, latency: float = LLM_STUB_LATENCY, fixtures_path: str = LLM_STUB_FIXTURES):
+        self.latency = latency
+        self.fixtures: dict[str, bool] = dict()  # normalized caption -> verdict
+        if fixtures_path:
+            with open(fixtures_path, "r", encoding="utf-8") as f:
+                self.fixtures = {normalize_caption(caption): bool(verdict) for caption, verdict in json.load(f).items()}
+
+        self.prefilters: dict[tuple, CaptionPrefilter] = dict()
+        self.calls = 0
+
+    async def _wait(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    def _verdict(self, text: str, keywords: list[str]) -> bool:
+        fixture = self.fixtures.get(normalize_caption(text))
+        if fixture is not None:
+            return fixture
+        key = tuple(keywords)
+        if key not in self.prefilters:
+            self.prefilters[key] = CaptionPrefilter(keywords)
+        return self.prefilters[key].score(text) >= STUB_RELEVANT_SCORE
+
+    async def relevancy_check(self, caption: str, text_prompt: str, keywords: list[str]) -> bool:
+        await self._wait()
+        return self._verdict(caption, keywords)
+
+    async def relevancy_check_batch(self, captions: list[str], text_prompt: str, keywords: list[str]) -> list:
+        await self._wait()
+        return [self._verdict(caption, keywords) for caption in captions]
+
+    async def website_relevancy_check(self, html_content: str, scraper_text: str) -> bool:
+        await self._wait()
+        return self._verdict(html_content, [word for word in scraper_text.split() if len(word) > 3])
+
+    async def title_keywords_hashtags(self, user_text: str) -> dict:
+        await self._wait()
+        keywords = list(dict.fromkeys(word.strip(".,!?").lower() for word in user_text.split() if len(word.strip(".,!?")) > 3))[:8]
+        return {
+            "title": user_text.strip().title()[:60],
+            "keywords": keywords,
+            "hashtags": [f"#{keyword}" for keyword in keywords],
+        }
+
+    def stats(self) -> dict:
+        return {"calls": self.calls}
+
+def get_llm_backend(model_name: str, priority: int = PRIORITY_CAPTION) -> LLMBackend:
+    ''' backend selected by LLM_BACKEND (model_name / priority only matter for gemini) '''
+    if LLM_BACKEND == "stub":
+        return StubBackend()
+    if LLM_BACKEND == "gemini":
+        return GeminiBackend(model_name, priority)
+    raise ValueError(f"unknown LLM_BACKEND: {LLM_BACKEND}")
@@ -0,0 +1,178 @@
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+from typing import Optional
+from text_normalize import normalize_text
+
+# CROSS-PROCESS CACHE OF LLM CAPTION VERDICTS
+# promo captions get reposted constantly, a verdict is reused for the same
+# (normalized caption, campaign prompt, keywords) by every scraper process on the node.
+# the cache is a sqlite file in WAL mode so many processes can read while one writes.
+# lookups run on the scraper's event loop: sqlite waits at most LLM_CACHE_BUSY_TIMEOUT for another
+# process' write lock, a lookup that doesn't get it counts as a miss and a verdict that can't be
+# written is simply not cached.
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "llm_relevancy_cache.sqlite3"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7*24*60*60)))   # 7 days
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "200000"))
+LLM_CACHE_BUSY_TIMEOUT = float(os.getenv("LLM_CACHE_BUSY_TIMEOUT", "0.05"))   # seconds
+
+EVICT_EVERY_PUTS = 500
+LAST_HIT_RESOLUTION = 60*60 # don't rewrite last_hit on every hit
+
+def is_locked(e: sqlite3.Error) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and "locked" in str(e)
+
+def normalize_caption(caption: str) -> str:
+    # "DEPOS!T" / "𝐃𝐞𝐩𝐨𝐬𝐢𝐭" / "deposit" are one cache entry
+    return normalize_text(caption)
+
+def relevancy_cache_key(caption: str, text_prompt: str, keywords: list[str]) -> str:
+    key_text = "\x00".join([
+        normalize_caption(caption),
+        text_prompt.strip(),
+        ",".join(sorted(keyword.casefold() for keyword in keywords)),
+    ])
+    return hashlib.sha256(key_text.encode("utf-8")).hexdigest()
+
+class RelevancyCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # counters of this process, flush_counters() adds them to the node-wide totals
+        self.hits = 0
+        self.misses = 0
+        self._unflushed_hits = 0
+        self._unflushed_misses = 0
+        self.lock_misses = 0    # reads / writes skipped because another process held the lock
+
+        self._conn: sqlite3.Connection = None
+        self._puts_since_evict = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=LLM_CACHE_BUSY_TIMEOUT, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS relevancy_cache (
+                        key TEXT PRIMARY KEY,
+                        verdict INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_hit REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS relevancy_cache_last_hit ON relevancy_cache (last_hit)")
+                conn.execute("CREATE TABLE IF NOT EXISTS cache_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            except sqlite3.Error:
+                conn.close()    # set up again on the next call
+                raise
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[bool]:
+        ''' cached verdict, None on a miss (or if the cache is unusable) '''
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT verdict, created_at, last_hit FROM relevancy_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] >= now - self.ttl:
+                if now - row[2] > LAST_HIT_RESOLUTION:
+                    try:
+                        conn.execute("UPDATE relevancy_cache SET last_hit = ? WHERE key = ?", (now, key))
+                    except sqlite3.Error as e:
+                        if not is_locked(e):
+                            raise
+                        self.lock_misses += 1 # still a hit, last_hit is refreshed on a later one
+                self.hits += 1
+                self._unflushed_hits += 1
+                return bool(row[0])
+        except sqlite3.Error as e:
+            if is_locked(e):
+                self.lock_misses += 1
+            else:
+                print(f"relevancy cache read failed: {e}")
+
+        self.misses += 1
+        self._unflushed_misses += 1
+        return None
+
+    def put(self, key: str, verdict: bool):
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO relevancy_cache (key, verdict, created_at, last_hit) VALUES (?, ?, ?, ?)",
+                (key, int(verdict), now, now)
+            )
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= EVICT_EVERY_PUTS:
+                self.evict()
+        except sqlite3.Error as e:
+            if is_locked(e):
+                self.lock_misses += 1
+            else:
+                print(f"relevancy cache write failed: {e}")
+
+    def evict(self):
+        ''' drop expired entries, then the least recently hit ones above max_entries '''
+        self._puts_since_evict = 0
+        conn = self._connection()
+        conn.execute("DELETE FROM relevancy_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        entries = conn.execute("SELECT COUNT(*) FROM relevancy_cache").fetchone()[0]
+        if entries > self.max_entries:
+            conn.execute(
+                "DELETE FROM relevancy_cache WHERE key IN (SELECT key FROM relevancy_cache ORDER BY last_hit LIMIT ?)",
+                (entries - self.max_entries,)
+            )
+
+    def flush_counters(self):
+        ''' add this process' hits / misses to the node-wide counters '''
+        hits, misses = self._unflushed_hits, self._unflushed_misses
+        if not hits and not misses:
+            return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE") # both counters or neither, a lock miss must not count hits twice
+            try:
+                for name, value in (("hits", hits), ("misses", misses)):
+                    conn.execute(
+                        "INSERT INTO cache_counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                        (name, value)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._unflushed_hits -= hits
+            self._unflushed_misses -= misses
+        except sqlite3.Error as e:
+            if not is_locked(e): # otherwise they are added on the next flush
+                print(f"relevancy cache counters write failed: {e}")
+
+    def stats(self) -> dict:
+        ''' counters of this process '''
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "lock_misses": self.lock_misses,
+        }
+
+    def node_stats(self) -> dict:
+        ''' counters of all processes on the node (as far as they were flushed) and the cache size '''
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM cache_counters").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": conn.execute("SELECT COUNT(*) FROM relevancy_cache").fetchone()[0],
+        }
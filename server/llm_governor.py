@@ -0,0 +1,197 @@
+import os
+import time
+import json
+import random
+import sqlite3
+import asyncio
+import hashlib
+import tempfile
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import GenerativeModel
+
+# NODE-WIDE LLM RATE GOVERNOR
+# every scraper process on the machine takes its LLM calls from one token bucket (a sqlite file),
+# so many campaigns together stay under the quota instead of failing in bursts.
+#   - priority classes: lower priority calls leave a reserve of tokens for the higher ones
+#   - a 429 / quota error pauses the whole node with exponential backoff (+ jitter) and the call is retried
+#   - identical prompts in flight in this process are sent once
+# the bucket is read / updated on the event loop: sqlite waits at most LLM_GOVERNOR_BUSY_TIMEOUT for
+# the lock, a process that doesn't get it sleeps a moment and tries again instead of blocking the loop.
+
+LLM_GOVERNOR_PATH = os.getenv("LLM_GOVERNOR_PATH", os.path.join(tempfile.gettempdir(), "llm_rate_governor.sqlite3"))
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+LLM_BURST = float(os.getenv("LLM_BURST", "10"))
+LLM_PRIORITY_RESERVE = float(os.getenv("LLM_PRIORITY_RESERVE", "3"))   # tokens each lower priority class leaves untouched
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "2"))   # seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+LLM_GOVERNOR_BUSY_TIMEOUT = float(os.getenv("LLM_GOVERNOR_BUSY_TIMEOUT", "0.02"))   # seconds
+LOCK_RETRY_WAIT = 0.05 # seconds
+
+# priority classes, lower goes first
+PRIORITY_CAPTION = 0
+PRIORITY_WEBSITE = 1
+PRIORITY_BACKGROUND = 2 # batch jobs, only run on what the scrapers leave
+
+BUCKET_NAME = "llm"
+
+class TokenBucket:
+    def __init__(self, path: str = LLM_GOVERNOR_PATH, rate_per_minute: float = LLM_RATE_PER_MINUTE, burst: float = LLM_BURST, reserve: float = LLM_PRIORITY_RESERVE):
+        self.path = path
+        self.rate = rate_per_minute / 60    # tokens per second
+        self.burst = burst
+        self.reserve = reserve
+        self._conn: sqlite3.Connection = None
+        self._blocked_until = 0.0   # a pause that could not be written yet, the next acquire writes it
+        self.lock_waits = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=LLM_GOVERNOR_BUSY_TIMEOUT, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS token_bucket (
+                        name TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        updated_at REAL NOT NULL,
+                        blocked_until REAL NOT NULL
+                    )
+                """)
+            except sqlite3.Error:
+                conn.close()    # set up again on the next call
+                raise
+            self._conn = conn
+        return self._conn
+
+    def try_acquire(self, priority: int = PRIORITY_CAPTION) -> float:
+        ''' take a token, returns 0 on success or the seconds to wait before trying again '''
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE") # one process at a time reads and updates the bucket
+            try:
+                row = conn.execute("SELECT tokens, updated_at, blocked_until FROM token_bucket WHERE name = ?", (BUCKET_NAME,)).fetchone()
+                tokens, updated_at, blocked_until = row if row is not None else (self.burst, now, 0.0)
+                blocked_until = max(blocked_until, self._blocked_until)
+                tokens = min(self.burst, tokens + max(0.0, now - updated_at) * self.rate)
+
+                floor = self.reserve * priority
+                if now < blocked_until:
+                    wait = blocked_until - now
+                elif tokens - 1 >= floor:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = (floor + 1 - tokens) / self.rate
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO token_bucket (name, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)",
+                    (BUCKET_NAME, tokens, now, blocked_until)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return wait
+        except sqlite3.Error as e:
+            if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+                # another process is at the bucket, try again in a moment
+                self.lock_waits += 1
+                return max(LOCK_RETRY_WAIT, self._blocked_until - now)
+            # an unusable bucket must not stop the scrapers, the backoff on 429s still applies
+            print(f"llm rate governor unavailable: {e}")
+            return 0.0
+
+    def block(self, seconds: float):
+        ''' pause every process of the node (after a quota error) '''
+        until = time.time() + seconds
+        self._blocked_until = max(self._blocked_until, until) # this process waits even if the write fails
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO token_bucket (name, tokens, updated_at, blocked_until) VALUES (?, 0, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = 0, updated_at = excluded.updated_at, blocked_until = MAX(blocked_until, excluded.blocked_until)",
+                (BUCKET_NAME, time.time(), until)
+            )
+        except sqlite3.Error as e:
+            if not (isinstance(e, sqlite3.OperationalError) and "locked" in str(e)):
+                print(f"llm rate governor unavailable: {e}")
+
+    async def acquire(self, priority: int = PRIORITY_CAPTION):
+        while True:
+            wait = self.try_acquire(priority)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait * random.uniform(1.0, 1.2)) # jitter, so waiting processes don't retry in lockstep
+
+def is_rate_limit_error(e: Exception) -> bool:
+    if isinstance(e, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return True
+    message = str(e).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+def prompt_key(model_name: str, contents, generation_config) -> str:
+    ''' key of a text-only prompt, None if it can't be coalesced (images, other parts) '''
+    if not isinstance(contents, list) or not all(isinstance(part, str) for part in contents):
+        return None
+    try:
+        key_text = json.dumps([model_name, contents, generation_config], sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(key_text.encode("utf-8")).hexdigest()
+
+class GovernedModel:
+    ''' drop-in for GenerativeModel.generate_content_async that goes through the node's token bucket '''
+    def __init__(self, llm_model: GenerativeModel, priority: int = PRIORITY_CAPTION, bucket: TokenBucket = None, inflight: dict = None):
+        self.llm_model = llm_model
+        self.priority = priority
+        self.bucket = bucket if bucket is not None else TokenBucket()
+        self.inflight: dict[str, asyncio.Task] = inflight if inflight is not None else dict() # prompt key -> call
+
+        self.calls = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+
+    def with_priority(self, priority: int) -> "GovernedModel":
+        ''' same model, bucket and in-flight prompts, other priority class '''
+        return GovernedModel(self.llm_model, priority, self.bucket, self.inflight)
+
+    async def generate_content_async(self, contents, generation_config=None, **kwargs):
+        key = prompt_key(getattr(self.llm_model, "model_name", ""), contents, generation_config) if not kwargs else None
+        if key is None:
+            return await self._call(contents, generation_config, **kwargs)
+
+        if key in self.inflight:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._call(contents, generation_config))
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self.inflight.pop(key, None))
+        # shield: one caller giving up must not cancel the call the others wait for
+        return await asyncio.shield(self.inflight[key])
+
+    async def _call(self, contents, generation_config=None, **kwargs):
+        if generation_config is not None:
+            kwargs["generation_config"] = generation_config
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self.bucket.acquire(self.priority)
+            self.calls += 1
+            try:
+                return await self.llm_model.generate_content_async(contents=contents, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == LLM_MAX_RETRIES:
+                    raise
+                self.rate_limited += 1
+                delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1.5)
+                print(f"LLM rate limited, backing off {delay:.1f}s (attempt {attempt+1}/{LLM_MAX_RETRIES})")
+                self.bucket.block(delay)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "lock_waits": self.bucket.lock_waits,
+        }
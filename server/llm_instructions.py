@@ -1,5 +1,19 @@
 from google.generativeai import GenerativeModel
 import json
+import asyncio
+
+# examples shared by the single and the batched caption relevancy prompts
+RELEVANCY_EXAMPLES = """
+example:
+keywords: betting, fantasy sports, casino, poker, gambling
+text prompt: Fantasy sports betting and gambling strategies, tips, and trends. How to place bets on fantasy leagues, popular fantasy sports platforms, fantasy football betting odds, player prop bets in fantasy sports, and legal aspects of gambling in fantasy sports. Recent developments in fantasy sports betting regulations and expert insights.
+Captions examples for yes:
+1. Play on India's Most Trusted Site
+2. ✅ Play on FUN88 this IPL - Instant Deposits & Withdrawals, Safe & Secure Platform! 🥳
+3. JOIN AND GET FREE !D NO DEPOS!T 
+4. RP EXCH 🆔 in Just 2 Minutes. Msg Now. GET Your Online Satta !D.
+5. 🎁 100% Bonus on 1st Deposit!🔄 Get 5% Refill Bonus – Every Time!🛡️ Safe & Secure
+"""
 
 async def relevancy_check(llm_model: GenerativeModel, video_caption: str, text_prompt: str, keywords: list[str]) -> bool:
     instruction = f"""
@@ -14,15 +28,7 @@ async def relevancy_check(llm_model: GenerativeModel, video_caption: str, text_p
     Caption is the caption of the video which is being checked for relevancy to the topic. 
     The captions for videos can be tricky and may try to avoid the topic or be misleading.
 
-    example:
-    keywords: betting, fantasy sports, casino, poker, gambling
-    text prompt: Fantasy sports betting and gambling strategies, tips, and trends. How to place bets on fantasy leagues, popular fantasy sports platforms, fantasy football betting odds, player prop bets in fantasy sports, and legal aspects of gambling in fantasy sports. Recent developments in fantasy sports betting regulations and expert insights.
-    Captions examples for yes:
-    1. Play on India's Most Trusted Site
-    2. ✅ Play on FUN88 this IPL - Instant Deposits & Withdrawals, Safe & Secure Platform! 🥳
-    3. JOIN AND GET FREE !D NO DEPOS!T 
-    4. RP EXCH 🆔 in Just 2 Minutes. Msg Now. GET Your Online Satta !D.
-    5. 🎁 100% Bonus on 1st Deposit!🔄 Get 5% Refill Bonus – Every Time!🛡️ Safe & Secure
+{RELEVANCY_EXAMPLES}
 
     Do not include any introductory text, explanations, markdown formatting, or any other text outside of the 1 word "yes" or "no". 
     JUST GIVE ME THE 1 WORD RESPONSE STRING WITH NO QUOTES OR ANYTHING.
@@ -55,6 +61,61 @@ async def relevancy_check(llm_model: GenerativeModel, video_caption: str, text_p
         print(f"Error calling Generative AI API: {e}")
         return {"error": f"Failed to generate content: {e}"}
     
+async def relevancy_check_batch(llm_model: GenerativeModel, video_captions: list[str], text_prompt: str, keywords: list[str]) -> list:
+    ''' relevancy_check for many captions in one prompt, one verdict per caption (same order) '''
+    numbered_captions = "\n".join(f"{i+1}. {json.dumps(caption, ensure_ascii=False)}" for i, caption in enumerate(video_captions))
+    instruction = f"""
+    Analyze each of the given captions for short videos and decide for every caption if it is relavant to the topic and keywords of the searched topic.
+    given :-
+    Text prompt: {text_prompt}
+    Keywords: {" ,".join(keywords)}
+    Captions ({len(video_captions)}):
+    {numbered_captions}
+
+    Here Text prompt is the text by user on the topic he is looking for. 
+    Keywords are the keywords relevant to the topic find through the processing.
+    Captions are the captions of the videos which are being checked for relevancy to the topic, one verdict per caption. 
+    The captions for videos can be tricky and may try to avoid the topic or be misleading.
+
+{RELEVANCY_EXAMPLES}
+
+    Your response MUST be a valid JSON array with exactly {len(video_captions)} strings, each "yes" or "no", in the same order as the captions.
+    Do not include any introductory text, explanations, markdown formatting, or any other text outside of the JSON array.
+    """
+
+    contents = [instruction] # Gemini API expects a list of contents
+
+    try:
+        response = await llm_model.generate_content_async(
+            contents=contents,
+            generation_config={"response_mime_type": "application/json"}
+        )
+    except Exception as e:
+        # API failure (the governor already retried rate limits): every caption failed,
+        # asking again one by one would only be a bigger burst against a throttling API
+        print(f"Error calling Generative AI API: {e}")
+        return [{"error": f"Failed to generate content: {e}"} for _ in video_captions]
+
+    try:
+        llm_output_text: str = response.text.strip()
+        if llm_output_text.startswith("```json"):
+            llm_output_text = llm_output_text[7:]
+        if llm_output_text.endswith("```"):
+            llm_output_text = llm_output_text[:-3]
+
+        verdicts = json.loads(llm_output_text)
+        if not isinstance(verdicts, list) or len(verdicts) != len(video_captions):
+            raise ValueError(f"expected {len(video_captions)} verdicts")
+
+        return ["yes" in str(verdict).lower() or verdict is True for verdict in verdicts]
+
+    except ValueError as e: # json.JSONDecodeError is a ValueError, so is a blocked / empty response.text
+        # bad or short output -> one call per caption, like before batching
+        print(f"Error: batched relevancy check failed ({e}), checking {len(video_captions)} captions one by one")
+        return await asyncio.gather(*[
+            relevancy_check(llm_model, caption, text_prompt, keywords) for caption in video_captions
+        ])
+    
 async def title_keywords_hashtags_instruction (llm_model: GenerativeModel ,user_text: str) -> str:
 
     instruction = f"""
@@ -0,0 +1,93 @@
+import asyncio
+import numpy as np
+from datetime import datetime
+from caption_prefilter import CaptionPrefilter, KEYWORD_WEIGHT, PROMO_WEIGHT
+from llm_backends import LLMBackend, get_llm_backend
+from llm_governor import PRIORITY_BACKGROUND
+from server.database.scrapers import get_scraper_data_by_id
+from server.database.content import get_captions_chunk, set_reels_relevancy
+from server.database.profiles import get_bios_chunk, set_bios_relevancy
+
+# BULK RE-CLASSIFICATION OF A CAMPAIGN
+# after a campaign's text / topic_attributes change, the stored captions and bios are
+# re-scored against the new keywords chunk by chunk: the hits are counted text by text with the
+# prefilter's own regexes (so both decide the same way, the LLM calls dominate the job anyway), the
+# thresholds are applied to the whole chunk at once with numpy, only the ambiguous ones go to the LLM in
+# batches, and the verdicts are written back with one bulk_write per chunk.
+
+CHUNK_SIZE = 1000
+LLM_BATCH_SIZE = 12
+LLM_CONCURRENT_BATCHES = 4
+
+def prefilter_hits(texts: list[str], prefilter: CaptionPrefilter) -> tuple[np.ndarray, np.ndarray]:
+    ''' (keyword hits, promo hits) of each text, CaptionPrefilter.hits per text (a python loop, not vectorized) '''
+    hits = np.array([prefilter.hits(text) for text in texts], dtype=np.int64).reshape(len(texts), 2)
+    return hits[:, 0], hits[:, 1]
+
+async def ask_llm(llm_backend: LLMBackend, texts: list[str], text_prompt: str, keywords: list[str]) -> list:
+    ''' batched LLM verdicts, None where the check failed '''
+    semaphore = asyncio.Semaphore(LLM_CONCURRENT_BATCHES)
+
+    async def ask_batch(batch: list[str]) -> list:
+        async with semaphore:
+            verdicts = await llm_backend.relevancy_check_batch(batch, text_prompt, keywords)
+        return [verdict if isinstance(verdict, bool) else None for verdict in verdicts]
+
+    batches = await asyncio.gather(*[
+        ask_batch(texts[i:i + LLM_BATCH_SIZE]) for i in range(0, len(texts), LLM_BATCH_SIZE)
+    ])
+    return [verdict for batch in batches for verdict in batch]
+
+async def classify_texts(texts: list[str], prefilter: CaptionPrefilter, llm_backend: LLMBackend, text_prompt: str, keywords: list[str], stats: dict) -> list:
+    keyword_hits, promo_hits = prefilter_hits(texts, prefilter)
+    scores = KEYWORD_WEIGHT * keyword_hits + PROMO_WEIGHT * promo_hits
+
+    verdicts = np.full(len(texts), None, dtype=object)
+    accepted = (scores >= prefilter.accept_at) & (keyword_hits > 0) # same rule as CaptionPrefilter.decide
+    rejected = (scores <= prefilter.reject_at) & ~accepted
+    verdicts[accepted] = True
+    verdicts[rejected] = False
+
+    ambiguous = np.flatnonzero(~accepted & ~rejected)
+    if len(ambiguous):
+        verdicts[ambiguous] = await ask_llm(llm_backend, [texts[i] for i in ambiguous], text_prompt, keywords)
+
+    stats["decided_locally"] += int(accepted.sum() + rejected.sum())
+    stats["sent_to_llm"] += len(ambiguous)
+    return verdicts.tolist()
+
+async def reclassify_campaign(scraper_id: str, stats: dict = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    ''' re-score the stored reels and bios of a campaign, stats is updated as the job goes '''
+    stats = stats if stats is not None else dict()
+    stats.update({"state": "running", "started_on": datetime.utcnow(), "reels": 0, "bios": 0, "decided_locally": 0, "sent_to_llm": 0, "updated": 0})
+
+    scraper_data = await get_scraper_data_by_id(scraper_id)
+    if scraper_data is None:
+        raise ValueError(f"no scraper with id {scraper_id}")
+
+    text_prompt = scraper_data.get("text", "")
+    keywords = scraper_data.get("topic_attributes", []) + scraper_data.get("hashtags", [])
+    prefilter = CaptionPrefilter(keywords)
+    llm_backend = get_llm_backend('gemini-2.0-flash', priority=PRIORITY_BACKGROUND)
+
+    for kind, get_chunk, text_field, write_verdicts in [
+        ("reels", get_captions_chunk, "caption", set_reels_relevancy),
+        ("bios", get_bios_chunk, "bio", set_bios_relevancy),
+    ]:
+        after = None
+        while True:
+            docs = await get_chunk(scraper_id, after, chunk_size)
+            if not docs:
+                break
+            after = docs[-1]["_id"]
+
+            texts = [doc.get(text_field) or "" for doc in docs]
+            verdicts = await classify_texts(texts, prefilter, llm_backend, text_prompt, keywords, stats)
+            stats["updated"] += await write_verdicts({
+                doc["_id"]: verdict for doc, verdict in zip(docs, verdicts) if verdict is not None
+            })
+            stats[kind] += len(docs)
+
+    stats["state"] = "done"
+    stats["finished_on"] = datetime.utcnow()
+    return stats
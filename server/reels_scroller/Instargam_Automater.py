@@ -2,23 +2,34 @@ import asyncio
 import json
 import os
 import time
+from functools import partial
 from pathlib import Path
 from playwright.async_api import Page, Browser, Response
 from typing import Optional
 from playwright.async_api import async_playwright, Page, Locator, ElementHandle
-from google import generativeai as genai
 
-from server.database.scrapers import update_scraper_data, update_freq_stats
+from server.database.scrapers import update_scraper_data
+from server.database.write_buffers import FreqStatsBuffer, ContentBuffer, LabelBuffer, SignatureBuffer, ProfileBuffer
 from server.database.accounts import get_account_by_scraper_id, save_new_auth
-from server.database.content import save_scraped_content
 from server.database.profiles import add_profile, update_profile, get_unscraped_profiles
 from server.database.targeted_apps import get_targeted_app_profiles, get_targeted_apps
 from server.database.ads import insert_ads_data
 
 from reels_scroller.utils import save_profile_data
-from llm_instructions import relevancy_check
+from reels_scroller.preclassifier import ReelPreclassifier
+from reels_scroller.network_router import NetworkRouter, CLIPS_HOME, CLIPS_USER, USER_INFO, FEED_TIMELINE
+from reels_scroller.records import ReelRecord, ClipsConnection, UserInfo, CommentsPage
+from reels_scroller.reel_buffer import ReelBuffer
+from reels_scroller.latency import LatencyStats
+from llm_cache import RelevancyCache, relevancy_cache_key
+from relevancy_batcher import RelevancyBatcher
+from caption_prefilter import CaptionPrefilter
+from text_normalize import normalize_text
+from llm_governor import PRIORITY_CAPTION
+from llm_backends import get_llm_backend
+from relevance_classifier import CampaignClassifier, campaign_key
+from caption_signatures import CampaignSignatures
 
-llm_api_key = os.getenv("GENAI_API_KEY")
 
 class Instagram_Automator:
     def __init__(self, page: Page, scraper_data: dict):
@@ -41,13 +52,43 @@ class Instagram_Automator:
                 self.topics.add(topic_element)
 
         self.topics_list : list[str] = list(self.topics)
+        # (stats key, normalized topic) so spelling tricks in captions still count
+        self.normalized_topics : list[tuple[str, str]] = [(topic.lower(), normalize_text(topic)) for topic in self.topics_list if normalize_text(topic)]
         
         self.topic_to_freq : dict = scraper_data.get("topic_stats", dict()).get("freq",  dict())
+        self.freq_buffer = FreqStatsBuffer(self.id) # freq deltas, written to the db in batches
+        self.content_buffer = ContentBuffer(self.id) # relevant reels, written to the db in batches
+        self.profile_buffer = ProfileBuffer(self.id) # found profiles, added to the db in batches
+        self.persisted_ad_codes = set() # ads already written to the db in this session
 
         self.hashtags : list[str] = scraper_data.get("hashtags", [])
 
-        genai.configure(api_key=llm_api_key)
-        self.llm_model = genai.GenerativeModel(model_name='gemini-2.0-flash')
+        self.llm_backend = get_llm_backend('gemini-2.0-flash', priority=PRIORITY_CAPTION) # gemini, or the offline stub (LLM_BACKEND)
+        self.relevancy_cache = RelevancyCache() # verdicts shared by all scrapers on this machine
+
+        # what captions are checked against (the targeted app phase switches this to the app)
+        self.relevancy_prompt: str = scraper_data.get("text", "")
+        self.relevancy_keywords: list[str] = self.topics_list
+        self.relevancy_batchers: dict[tuple, RelevancyBatcher] = dict()
+        self.relevancy_inflight: dict[str, asyncio.Future] = dict() # cache key -> verdict being asked for
+        self.relevancy_waiters: dict[asyncio.Future, int] = dict()  # in-flight verdict -> callers waiting on it
+        # clear cases are decided by rules, only the rest goes to the LLM
+        self.caption_prefilter = CaptionPrefilter(scraper_data.get("topic_attributes", []) + self.hashtags)
+        self.preclassifier = ReelPreclassifier(self.check_caption_relevancy) # reels checked ahead of the scroller
+        # LLM verdicts are logged as labels, the classifier trained on them takes over the confident cases
+        self.label_buffer = LabelBuffer(self.id)
+        self.campaign_classifiers: dict[str, CampaignClassifier] = dict() # campaign key -> classifier
+        self.background_tasks: set[asyncio.Task] = set() # loads running in the background
+        # near-duplicates of judged captions reuse the verdict, saved reels get the cluster of their caption
+        self.signature_buffer = SignatureBuffer(self.id)
+        self.campaign_signatures: dict[str, CampaignSignatures] = dict() # campaign key -> signature index
+        # one response listener for the page, each phase registers the handlers it needs
+        self.network_router = NetworkRouter(self.page)
+        # the network handlers resolve these, the phases wait on them (with a deadline) instead of polling
+        self.bio_data = dict()
+        self.bio_futures: dict[str, asyncio.Future] = dict() # username -> bio data
+        self.profile_latency = LatencyStats() # waiting for the bio / reels of a profile
+        self.reel_latency = LatencyStats()    # waiting for the caption / verdict of a reel
 
 # login based on username, password in env or the auth cookies in the json file
     async def signIn(self) -> bool:
@@ -168,9 +209,119 @@ class Instagram_Automator:
             print(f"Login failed: {str(e)}")
             return False
     
+# count topics of the caption (flushed to the db by the freq buffer)
+    def count_topic_freq(self, caption: str):
+        matched_topics = []
+        if caption != "":
+            caption_normalized = normalize_text(caption)
+            for topic, topic_normalized in self.normalized_topics:
+                if topic_normalized in caption_normalized:
+                    matched_topics.append(topic)
+                    self.topic_to_freq[topic] = self.topic_to_freq.get(topic, 0) + 1 # freq updates
+
+        self.freq_buffer.record(matched_topics)
+
 # confirm relevancy via LLM
-    async def check_caption_relevancy(self, caption: str) -> bool:
-        return await relevancy_check(self.llm_model, caption, self.scraper_data.get("text", ""), self.topics_list)
+    async def check_caption_relevancy(self, caption: str, text_prompt: str = None, keywords: list[str] = None) -> bool:
+        future = self.start_relevancy_check(caption, text_prompt, keywords)
+        self.relevancy_waiters[future] = self.relevancy_waiters.get(future, 0) + 1
+        try:
+            # shield: a caller giving up must not cancel a check others still wait for
+            verdict = await asyncio.shield(future)
+        finally:
+            self.relevancy_waiters[future] -= 1
+            if self.relevancy_waiters[future] == 0:
+                del self.relevancy_waiters[future]
+                if not future.done():
+                    future.cancel() # the last one gave up (reel scrolled away): the batcher drops the caption
+        return verdict is True # a failed check comes back as an error dict, that is not "relevant"
+
+    def start_relevancy_check(self, caption: str, text_prompt: str = None, keywords: list[str] = None) -> asyncio.Future:
+        ''' future of the verdict: from the prefilter, a check already running, the cache, a judged near-duplicate,
+            the local classifier or a new batched LLM call '''
+        if text_prompt is None and keywords is None: # the prefilter is built for the current prompt only
+            verdict = self.caption_prefilter.verdict(caption)
+            if verdict is not None:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(verdict)
+                return future
+
+        if text_prompt is None:
+            text_prompt = self.relevancy_prompt
+        if keywords is None:
+            keywords = self.relevancy_keywords
+
+        cache_key = relevancy_cache_key(caption, text_prompt, keywords)
+        if cache_key in self.relevancy_inflight:
+            return self.relevancy_inflight[cache_key]
+
+        verdict = self.relevancy_cache.get(cache_key)
+        if verdict is None:
+            verdict = self.caption_signatures(text_prompt, keywords).judged_verdict(caption)
+        if verdict is None:
+            verdict = self.campaign_classifier(text_prompt, keywords).verdict(caption)
+        if verdict is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(verdict)
+            return future
+
+        batcher_key = (text_prompt, tuple(keywords))
+        if batcher_key not in self.relevancy_batchers:
+            self.relevancy_batchers[batcher_key] = RelevancyBatcher(self.llm_backend, text_prompt, keywords)
+
+        future = self.relevancy_batchers[batcher_key].submit(caption)
+        self.relevancy_inflight[cache_key] = future
+        future.add_done_callback(lambda done: self.relevancy_check_done(cache_key, caption, text_prompt, keywords, done))
+        return future
+
+    def relevancy_check_done(self, cache_key: str, caption: str, text_prompt: str, keywords: list[str], future: asyncio.Future):
+        self.relevancy_inflight.pop(cache_key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        if isinstance(future.result(), bool): # errors come back as a dict, never cache / learn from those
+            self.relevancy_cache.put(cache_key, future.result())
+
+            classifier = self.campaign_classifier(text_prompt, keywords)
+            classifier.add_label(caption, future.result())
+            self.label_buffer.add(classifier.campaign_key, caption, future.result())
+
+            signature_doc = self.caption_signatures(text_prompt, keywords).record(caption, future.result())
+            if signature_doc is not None:
+                self.signature_buffer.add(classifier.campaign_key, signature_doc)
+
+    def run_in_background(self, coro):
+        ''' start a task and keep a reference to it until it is done (the loop only keeps weak ones) '''
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def campaign_classifier(self, text_prompt: str, keywords: list[str]) -> CampaignClassifier:
+        key = campaign_key(text_prompt, keywords)
+        if key not in self.campaign_classifiers:
+            self.campaign_classifiers[key] = CampaignClassifier(key)
+            self.run_in_background(self.campaign_classifiers[key].load()) # trains on the labeling log in the background
+        return self.campaign_classifiers[key]
+
+    def caption_signatures(self, text_prompt: str, keywords: list[str]) -> CampaignSignatures:
+        key = campaign_key(text_prompt, keywords)
+        if key not in self.campaign_signatures:
+            self.campaign_signatures[key] = CampaignSignatures(key)
+            self.run_in_background(self.campaign_signatures[key].load()) # judged signatures of earlier runs
+        return self.campaign_signatures[key]
+
+    def caption_cluster(self, caption: str) -> Optional[str]:
+        ''' near-duplicate cluster of the caption under the current prompt, None for captions too short to sign '''
+        signatures = self.caption_signatures(self.relevancy_prompt, self.relevancy_keywords)
+        signature_doc = signatures.record(caption)
+        if signature_doc is None:
+            return None
+        self.signature_buffer.add(signatures.campaign_key, signature_doc)
+        return signature_doc["cluster_id"]
+
+    def preclassify_reels(self, reels: list[ReelRecord]):
+        ''' start checking a page of reels now, before the scroller gets to them (they go out as one batch) '''
+        for reel in reels:
+            self.preclassifier.schedule(reel.code, reel.caption_text)
 
 # ----------- search --------------
 # go throught each post/reel on the search page and find relevant content
@@ -209,7 +360,7 @@ class Instagram_Automator:
                     username = profile_link.strip("/").split("/")[-1]
                     # print(username)
                     self.usernames.add(username)
-                    await add_profile(self.id, username)  # Add to the database
+                    self.profile_buffer.add(username)
 
                 posts_seen+=1
                 if posts_seen >= 6:
@@ -221,10 +372,12 @@ class Instagram_Automator:
 
                 # Wait for the page to load
                 await self.page.wait_for_timeout(2000)
+
+        await self.profile_buffer.flush() # the profile_reels phase reads them back from the db
             
 # ----------- reels ---------------
 # watching reels based on the current algorithm, manipulate based on the topics [list of txt] in caption 
-    async def reels_scroller(self, reels_data, watch_time = 2*60*60, max_usernames_count = 50):
+    async def reels_scroller(self, reels_data: ReelBuffer, watch_time = 2*60*60, max_usernames_count = 50):
         # Code to scroll through Instagram reels
         
         start_time = time.time()
@@ -235,20 +388,18 @@ class Instagram_Automator:
                 reel_code = self.page.url.split('/')[-1] if self.page.url.split('/')[-1] != "" else self.page.url.split('/')[-2]
                 print(f"{seen_count}. code = {reel_code} |", end=" ")
                 try:
-                    media_data = reels_data[reel_code]
-                    caption: str = media_data["caption"]["text"]
+                    media_data: ReelRecord = reels_data[reel_code]
+                    caption: str = media_data.caption_text
+                    wait_start = time.perf_counter()
 
                     self.reels_seen += 1
                     reel_on_topic = False
 
                     # check caption for freq incrementation
-                    if caption != "":
-                        for topic in self.topics_list:
-                            if topic.lower() in caption.lower():
-                                # reel_on_topic = True
-                                self.topic_to_freq[topic.lower()] += 1 # freq updates
+                    self.count_topic_freq(caption)
                     
-                    reel_on_topic = await self.check_caption_relevancy(caption)
+                    reel_on_topic = await self.preclassifier.verdict(reel_code, caption)
+                    self.reel_latency.add(time.perf_counter() - wait_start)
                     
                     if not reel_on_topic:
                         print("skipping")
@@ -256,15 +407,15 @@ class Instagram_Automator:
                         pass
                     else:
                         self.relevant_reels_seen += 1
-                        await save_scraped_content(self.id, media_data) # save the scraped content to the database
+                        self.content_buffer.add(media_data, cluster_id=self.caption_cluster(caption)) # save the scraped content to the database (buffered)
                         await self.page.wait_for_timeout(10*1000)   # Watch for 10 secs       
                         # res = await click_icon(page, "Like")
                         await self.click_like_button(page_type="reels")
 
-                        profile_username = media_data["owner"]["username"]
+                        profile_username = media_data.username
                         self.usernames.add(profile_username)
 
-                        await add_profile(self.id, profile_username) # add to the database
+                        self.profile_buffer.add(profile_username) # add to the database in batches
                         # self.add_username_to_potential_list(profile_username)
 
                         await self.page.wait_for_timeout(20*1000)  # Watch for 20 more secs
@@ -273,43 +424,52 @@ class Instagram_Automator:
                     print(f"Error: {e}")
                     print("reel not in data going to next")
 
-                await update_freq_stats(self.id, self.topic_to_freq)
-
                 await self.page.keyboard.press('ArrowDown')
                 await self.page.wait_for_timeout(2*1000) # some breathing space for the url and stuff to update 
                 seen_count+=1
 
-            except Exception() as e:
+            except Exception as e:
                 print(f"Error while scrolling: {e}")
             
             # stop if we have enough usernames
             if len(self.usernames) > max_usernames_count: 
-                return
+                break
+
+        await self.profile_buffer.flush() # the profile_bio phase reads them back from the db
 
 # start reels_scroller and store reels info
     async def watch_reels(self):
         # Create a shared data object to store network responses
-        reels_data = {}
+        reels_data = ReelBuffer()
+        self.preclassifier.clear()
 
         # Setup network listener
-        self.page.on("response", lambda response: self.handle_reels_network(response, reels_data))
+        self.network_router.start_phase({CLIPS_HOME: partial(self.handle_home_reels, reels_data)})
 
         INSTAGRAM_REELS_URL = "https://www.instagram.com/reels"
         await self.page.goto(INSTAGRAM_REELS_URL)
 
         try:
-            while len(reels_data.keys()) == 0:
-                await asyncio.sleep(1)
+            if not await reels_data.wait_until_loaded(timeout=60):
+                print("no reels loaded on the reels page")
+                return
 
             await self.reels_scroller(reels_data)
         except:
             input("stopped reels scrolling (waiting for a key to exit)")
+        finally:
+            self.network_router.end_phase()
+            print("reel buffer:", reels_data.stats())
 
     async def profiles_reels_watcher(self, profiles, timer_to_stop: int = 15*60):
         """Watch reels from a specific profile"""
         print("----PROFILE REELS WATCHER----")
-        reels_data = dict()
-        self.page.on("response", lambda response: self.handle_profile_reel_watcher_network(response, reels_data))
+        reels_data = ReelBuffer()
+        self.preclassifier.clear() # checks from the last phase were against a different prompt / feed
+        self.network_router.start_phase(
+            {CLIPS_USER: partial(self.handle_user_reels, reels_data), USER_INFO: self.handle_user_info},
+            {"comments": partial(self.handle_comments, reels_data)}
+        )
         seen_count = 1
 
         self.bio_data = dict()
@@ -327,15 +487,16 @@ class Instagram_Automator:
                 await self.page.goto(PROFILE_URL)
                 await self.page.wait_for_timeout(3*1000) # wait 3 secs for page to load
 
-                # wait for the profile data to be saved
-                start_time = time.time()
-                while (not self.bio_data.get(username, False)) or (time.time()-start_time > 24) : # max wait for 24 secs (in case profile doesn't exist anymore / its private)
-                    await self.page.wait_for_timeout(1000) # wait 1 sec before rechecking
-                print("saved bio data")
+                # wait for the profile data to be saved (max 24 secs, in case profile doesn't exist anymore / its private)
+                wait_start = time.perf_counter()
+                bio = await self.wait_for_bio(username, timeout=24)
+                print("saved bio data" if bio is not None else "no bio data")
 
                 # wait for reels_data to be loaded
-                while len(reels_data.keys()) == 0:
-                    await self.page.wait_for_timeout(1000) # wait 1 sec before rechecking
+                reels_loaded = await reels_data.wait_until_loaded(timeout=30)
+                self.profile_latency.add(time.perf_counter() - wait_start, timed_out=bio is None or not reels_loaded)
+                if not reels_loaded:
+                    raise Exception("no reels loaded")
 
                 await self.page.wait_for_selector('a[href*="/reel/"]', timeout=30*1000)  # Wait for the reels to load
                 # get ready to start watching
@@ -354,28 +515,21 @@ class Instagram_Automator:
                     reel_code = self.page.url.split('/')[-1] if self.page.url.split('/')[-1] != "" else self.page.url.split('/')[-2]
                     print(f"{seen_count}. code = {reel_code} |", end=" ")
                     try:
-                        media_data: dict = reels_data[reel_code]
+                        media_data: ReelRecord = reels_data[reel_code]
+                        wait_start = time.perf_counter()
 
-                        # wait for caption to be there in the data
-                        if media_data.get("caption", False):
-                            caption: str = media_data["caption"]["text"]
-                        else:
-                            start_wait_for_caption = time.time()
-                            while not media_data.get("caption", False) and (time.time() - start_wait_for_caption < 20):
-                                await asyncio.sleep(1)
-                            caption:str = media_data.get("caption", dict()).get("text", "")
+                        # wait (max 20 secs) for the caption, the comments request of the reel brings it
+                        caption: str = await reels_data.wait_for_caption(reel_code, timeout=20)
+                        caption_timed_out = media_data.caption is None
 
                         self.reels_seen += 1
                         reel_on_topic = False
 
                         # check caption for freq incrementation
-                        if caption != "":
-                            for topic in self.topics_list:
-                                if topic.lower() in caption.lower():
-                                    # reel_on_topic = True
-                                    self.topic_to_freq[topic.lower()] += 1 # freq updates
+                        self.count_topic_freq(caption)
                         
-                        reel_on_topic = await self.check_caption_relevancy(caption)
+                        reel_on_topic = await self.preclassifier.verdict(reel_code, caption)
+                        self.reel_latency.add(time.perf_counter() - wait_start, timed_out=caption_timed_out)
 
                         if not reel_on_topic:
                             print("skipping")
@@ -385,7 +539,7 @@ class Instagram_Automator:
                             print("taken")
                             relevant_user_reels_seen += 1
                             self.relevant_reels_seen += 1
-                            await save_scraped_content(self.id, media_data) # save the scraped content to the database
+                            self.content_buffer.add(media_data, cluster_id=self.caption_cluster(caption)) # save the scraped content to the database (buffered)
                             await self.page.wait_for_timeout(10*1000)   # Watch for 10 secs       
                             # like reel
                             await self.click_like_button(page_type="profile_reels")
@@ -398,8 +552,6 @@ class Instagram_Automator:
                         await self.page.wait_for_timeout(2*1000) # some delay to not be too fast
 
                     seen_count+=1
-                    await update_freq_stats(self.id, self.topic_to_freq)
-
                     # evaluate watching:
                     #       consider we have seen minimum 12 reels and less than 2 reels were on topic. (2/12 = 0.166)
                     if user_reels_seen >= 12 and (relevant_user_reels_seen/user_reels_seen < 0.166):
@@ -419,6 +571,9 @@ class Instagram_Automator:
                     # "state": "profile_bio"
                 })
 
+        self.network_router.end_phase()
+        print("reel buffer:", reels_data.stats())
+
 # ---------- profiles --------------
 # extract links and text from profile bios
     async def extract_links_from_bios(self):
@@ -428,18 +583,19 @@ class Instagram_Automator:
         
         self.bio_data = dict()
 
-        self.page.on("response", lambda response: self.handle_profile_network(response))
+        self.network_router.start_phase({USER_INFO: self.handle_user_info})
 
         for username in unique_usernames:
             PROFILE_URL = f"https://www.instagram.com/{username}"
             await self.page.goto(PROFILE_URL)
             await self.page.wait_for_timeout(3*1000) # wait 3 secs for page to load
-            start_time = time.time()
-            while (not self.bio_data.get(username, False)) or (time.time()-start_time > 24) : # max wait for 24 secs (in case profile doesn't exist anymore / its private)
-                await self.page.wait_for_timeout(1000) # wait 1 sec before rechecking
+            wait_start = time.perf_counter()
+            bio = await self.wait_for_bio(username, timeout=24) # max wait for 24 secs (in case profile doesn't exist anymore / its private)
+            self.profile_latency.add(time.perf_counter() - wait_start, timed_out=bio is None)
 
             await self.page.wait_for_timeout(3*1000) # avoid sudden shifts to different profiles (min 6 secs on a profile)
 
+        self.network_router.end_phase()
         save_profile_data(self.bio_data)
 
 #------------ TARGET APP --------------
@@ -452,6 +608,13 @@ class Instagram_Automator:
         # get the target app data
         target_app_data = targeted_apps[0]
         print(target_app_data)
+
+        # captions of this phase are checked against the app (also the prefetched ones),
+        # the phases after it check against the campaign again
+        campaign_relevancy = (self.relevancy_prompt, self.relevancy_keywords, self.caption_prefilter)
+        self.relevancy_prompt = target_app_data.get("app_name", "")
+        self.relevancy_keywords = target_app_data.get("keywords", [])
+        self.caption_prefilter = CaptionPrefilter(self.relevancy_keywords + [target_app_data.get("app_name", "")])
         # target_app_data = {
         #     "target_app_id": target_app_id,
         #     "keywords": ["govindia", "betting", "govinda365"],
@@ -463,7 +626,7 @@ class Instagram_Automator:
         #----------------
         # posts_data = dict()
         # # network request tracking
-        # self.page.on("response", lambda response: self.handle_search_network(response, posts_data))
+        # self.network_router.start_phase(url_routes={"api/v1/fbsearch/web/top_serp/": partial(self.handle_search_results, posts_data)})
         # seen_count = 1
 
         # # visit the searhc page
@@ -501,7 +664,7 @@ class Instagram_Automator:
         #                     # reel_on_topic = True
         #                     self.topic_to_freq[topic.lower()] += 1 # freq updates
                 
-        #         post_on_topic = await relevancy_check(self.llm_model, caption, target_app_data.get("app_name", ""), target_app_data.get("keywords", []))
+        #         post_on_topic = await self.llm_backend.relevancy_check(caption, target_app_data.get("app_name", ""), target_app_data.get("keywords", []))
 
         #         if not post_on_topic:
         #             print("skipping")
@@ -510,7 +673,7 @@ class Instagram_Automator:
         #         else:
         #             print("taken")
         #             media_data["target_app_id"] = target_app_id
-        #             await save_scraped_content(self.id, media_data) # save the scraped content to the database
+        #             self.content_buffer.add(media_data, cluster_id=self.caption_cluster(caption)) # save the scraped content to the database (buffered)
 
         #             # mark profile to check                    
         #             profile_username = media_data["username"]
@@ -537,6 +700,14 @@ class Instagram_Automator:
 
         # print("SEARCH POSTS FOR TARGET APP COMPLETE")
 
+        try:
+            await self.target_app_profiles_watcher(target_app_id)
+        finally:
+            self.relevancy_prompt, self.relevancy_keywords, self.caption_prefilter = campaign_relevancy
+
+    async def target_app_profiles_watcher(self, target_app_id: Optional[int] = 0):
+        """Watch the reels of the profiles found for the target app"""
+
         # ---> crawl through the profiles content for more similar info  
         profiles_data = await get_targeted_app_profiles(target_app_id)
 
@@ -544,8 +715,12 @@ class Instagram_Automator:
 
         # go through profiles
         print("----PROFILE REELS WATCHER----")
-        reels_data = dict()
-        self.page.on("response", lambda response: self.handle_profile_reel_watcher_network(response, reels_data))
+        reels_data = ReelBuffer()
+        self.preclassifier.clear() # checks from the last phase were against a different prompt / feed
+        self.network_router.start_phase(
+            {CLIPS_USER: partial(self.handle_user_reels, reels_data), USER_INFO: self.handle_user_info},
+            {"comments": partial(self.handle_comments, reels_data)}
+        )
         seen_count = 1
 
         self.bio_data = dict()
@@ -563,15 +738,16 @@ class Instagram_Automator:
                 await self.page.goto(PROFILE_URL)
                 await self.page.wait_for_timeout(3*1000) # wait 3 secs for page to load
 
-                # wait for the profile data to be saved
-                start_time = time.time()
-                while (not self.bio_data.get(username, False)) or (time.time()-start_time > 24) : # max wait for 24 secs (in case profile doesn't exist anymore / its private)
-                    await self.page.wait_for_timeout(1000) # wait 1 sec before rechecking
-                print("saved bio data")
+                # wait for the profile data to be saved (max 24 secs, in case profile doesn't exist anymore / its private)
+                wait_start = time.perf_counter()
+                bio = await self.wait_for_bio(username, timeout=24)
+                print("saved bio data" if bio is not None else "no bio data")
 
                 # wait for reels_data to be loaded
-                while len(reels_data.keys()) == 0:
-                    await self.page.wait_for_timeout(1000) # wait 1 sec before rechecking
+                reels_loaded = await reels_data.wait_until_loaded(timeout=30)
+                self.profile_latency.add(time.perf_counter() - wait_start, timed_out=bio is None or not reels_loaded)
+                if not reels_loaded:
+                    raise Exception("no reels loaded")
 
                 await self.page.wait_for_selector('a[href*="/reel/"]', timeout=30*1000)  # Wait for the reels to load
                 # get ready to start watching
@@ -590,28 +766,21 @@ class Instagram_Automator:
                     reel_code = self.page.url.split('/')[-1] if self.page.url.split('/')[-1] != "" else self.page.url.split('/')[-2]
                     print(f"{seen_count}. code = {reel_code} |", end=" ")
                     try:
-                        media_data: dict = reels_data[reel_code]
+                        media_data: ReelRecord = reels_data[reel_code]
+                        wait_start = time.perf_counter()
 
-                        # wait for caption to be there in the data
-                        if media_data.get("caption", False):
-                            caption: str = media_data["caption"]["text"]
-                        else:
-                            start_wait_for_caption = time.time()
-                            while not media_data.get("caption", False) and (time.time() - start_wait_for_caption < 20):
-                                await asyncio.sleep(1)
-                            caption:str = media_data.get("caption", dict()).get("text", "")
+                        # wait (max 20 secs) for the caption, the comments request of the reel brings it
+                        caption: str = await reels_data.wait_for_caption(reel_code, timeout=20)
+                        caption_timed_out = media_data.caption is None
 
                         self.reels_seen += 1
                         reel_on_topic = False
 
                         # check caption for freq incrementation
-                        if caption != "":
-                            for topic in self.topics_list:
-                                if topic.lower() in caption.lower():
-                                    # reel_on_topic = True
-                                    self.topic_to_freq[topic.lower()] += 1 # freq updates
+                        self.count_topic_freq(caption)
 
-                        reel_on_topic = await relevancy_check(self.llm_model, caption, target_app_data.get("app_name", ""), target_app_data.get("keywords", []))
+                        reel_on_topic = await self.preclassifier.verdict(reel_code, caption)
+                        self.reel_latency.add(time.perf_counter() - wait_start, timed_out=caption_timed_out)
 
                         if not reel_on_topic:
                             print("skipping")
@@ -621,7 +790,7 @@ class Instagram_Automator:
                             print("taken")
                             relevant_user_reels_seen += 1
                             self.relevant_reels_seen += 1
-                            await save_scraped_content(self.id, media_data) # save the scraped content to the database
+                            self.content_buffer.add(media_data, cluster_id=self.caption_cluster(caption)) # save the scraped content to the database (buffered)
                             await self.page.wait_for_timeout(10*1000)   # Watch for 10 secs       
                             # like reel
                             await self.click_like_button(page_type="profile_reels")
@@ -634,8 +803,6 @@ class Instagram_Automator:
                         await self.page.wait_for_timeout(2*1000) # some delay to not be too fast
 
                     seen_count+=1
-                    await update_freq_stats(self.id, self.topic_to_freq)
-
                     # evaluate watching:
                     #       consider we have seen minimum 12 reels and less than 2 reels were on topic. (2/12 = 0.166)
                     if user_reels_seen >= 12 and (relevant_user_reels_seen/user_reels_seen < 0.166):
@@ -654,6 +821,9 @@ class Instagram_Automator:
                     "relevant_reels_seen": self.relevant_reels_seen,
                     # "state": "profile_bio"
                 })
+
+        self.network_router.end_phase()
+        print("reel buffer:", reels_data.stats())
         
 
 # ----------- Feed ADS SCROLLER -----------
@@ -662,19 +832,25 @@ class Instagram_Automator:
         print("----FEED ADS WATCHER----")
         # posts_data = dict()
         ads_data = dict()
-        self.page.on("response", lambda response: self.handle_feed_data(response, ads_data))
+        ads_loaded = asyncio.Event()
+        self.network_router.start_phase({FEED_TIMELINE: partial(self.handle_feed_timeline, ads_data, ads_loaded)})
         seen_count = 1
 
         # scroll past stories
         await self.slow_scroll( 125 )
 
-        wait = 6
-        while len(ads_data.keys()) == 0:
-            print(".", end="")
-            await self.page.wait_for_timeout(1000) # wait 1 sec before rechecking
-            wait = wait - 1
-            if wait <= 0:
+        # wait 6 secs for the first ads, then keep scrolling to load more posts (max 2 mins)
+        wait_start = time.time()
+        try:
+            await asyncio.wait_for(ads_loaded.wait(), 6)
+        except asyncio.TimeoutError:
+            while not ads_loaded.is_set() and time.time() - wait_start < 2*60:
+                print(".", end="")
                 await self.slow_scroll( 750 )
+                try:
+                    await asyncio.wait_for(ads_loaded.wait(), 1)
+                except asyncio.TimeoutError:
+                    pass
         
         start_time = time.time()
         while time.time()-start_time < watch_time:
@@ -762,185 +938,114 @@ class Instagram_Automator:
             await self.page.wait_for_timeout(4*1000) # some delay to not be too fast in skipping
             # await asyncio.sleep(4)
 
+        self.network_router.end_phase()
+
 
         
 # ------- network handlers ---------
-# network handlers
-    async def handle_feed_data(self, response, ads_data: dict):
-        url = response.url
-        target_url = "https://www.instagram.com/graphql/query"
-
-        if target_url in url:
-            try:
-                response_data = await response.json()
-
-                new_ads = []
-                #reels data
-                if response_data["data"].get("xdt_api__v1__feed__timeline__connection", False):
-                    # new_posts_data = {}
-                    for edge in response_data["data"]["xdt_api__v1__feed__timeline__connection"]["edges"]:
-                        # ADS
-                        if edge["node"].get("ad", False):
-                            ad = edge["node"]["ad"]
-                            ads_data[ ad["items"][0]["link"] ] = ad["items"][0]
-                            new_ads.append(ad["items"][0])
-                        # POSTS
-                        # else:
-                        #     media = edge["node"]["media"]
-                        #     posts_data[ media["code"] ] = media
-
-                    await insert_ads_data(self.id, new_ads)
-
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                print(f"Failed to process response from {url}: {str(e)}")
-
-    async def handle_profile_reel_watcher_network(self, response, reels_data: dict):
-        url = response.url
-        target_url = "https://www.instagram.com/graphql/query"
-
-        if target_url in url:
-            try:
-                response_data = await response.json()
-
-                #reels data
-                if response_data["data"].get("xdt_api__v1__clips__user__connection_v2", False):
-                    new_reels_data = {}
-                    for edge in response_data["data"]["xdt_api__v1__clips__user__connection_v2"]["edges"]:
-                        media = edge["node"]["media"]
-                        new_reels_data[ media["code"] ] = media
-
-                    reels_data.update(new_reels_data)
-
-                # user info response
-                if response_data["data"].get("user", False):
-                    # it is confirmed that this is a user profile data
-                    new_bio_data = dict()
-                    username = response_data["data"]["user"]["username"]
-                    bio_txt = response_data["data"]["user"]["biography"]
-                    bio_links = []
-
-                    for link_obj in response_data["data"]["user"]["bio_links"]: 
-                        bio_links.append( link_obj["url"] )
-                    
-                    new_bio_data[username] = {"username": username, "links": bio_links, "text": bio_txt}
+# network handlers, called by the network router with the decoded response (see start_phase in each phase)
+    async def handle_feed_timeline(self, ads_data: dict, ads_loaded: asyncio.Event, timeline: dict):
+        new_ads = []
+        for edge in timeline["edges"]:
+            # ADS
+            if edge["node"].get("ad", False):
+                ad = edge["node"]["ad"]
+                ads_data[ ad["items"][0]["link"] ] = ad["items"][0]
+                new_ads.append(ad["items"][0])
+            # POSTS
+            # else:
+            #     media = edge["node"]["media"]
+            #     posts_data[ media["code"] ] = media
+
+        if ads_data:
+            ads_loaded.set()
+
+        # only write ads that were not persisted earlier in this session
+        unsaved_ads = [ad for ad in new_ads if ad["code"] not in self.persisted_ad_codes]
+        if unsaved_ads:
+            await insert_ads_data(self.id, unsaved_ads)
+            self.persisted_ad_codes.update(ad["code"] for ad in unsaved_ads)
+
+    async def handle_user_reels(self, reels_data: ReelBuffer, connection: ClipsConnection):
+        self.preclassify_reels(reels_data.add(connection.reels()))
+
+    async def handle_user_info(self, user: UserInfo):
+        # it is confirmed that this is a user profile data
+        new_bio_data = dict()
+        bio_links = [link.url for link in user.bio_links]
+        
+        new_bio_data[user.username] = {"username": user.username, "links": bio_links, "text": user.biography}
+
+        self.bio_data.update(new_bio_data)
+        future = self.bio_futures.pop(user.username, None)
+        if future is not None and not future.done():
+            future.set_result(new_bio_data[user.username])
+        await update_profile(self.id, user.username, new_bio_data[user.username])
+
+    async def wait_for_bio(self, username: str, timeout: float) -> Optional[dict]:
+        ''' bio data of the profile, None if it didn't come within timeout '''
+        if username in self.bio_data:
+            return self.bio_data[username]
+        if username not in self.bio_futures:
+            self.bio_futures[username] = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.bio_futures[username]), timeout)
+        except asyncio.TimeoutError:
+            self.bio_futures.pop(username, None)
+            return None
 
-                    self.bio_data.update(new_bio_data)
-                    await update_profile(self.id, username, new_bio_data[username])
+    async def handle_comments(self, reels_data: ReelBuffer, comments: CommentsPage):
+        if comments.caption is None:
+            return
+        reel = reels_data.set_caption_by_pk(comments.caption.media_id, comments.caption.text)
+        if reel is not None:
+            self.preclassifier.schedule(reel.code, comments.caption.text)
 
-            except Exception as e:
-                print(f"Failed to process response from {url}: {str(e)}")
-    
-        if "comments" in url:
-            response_data: dict = await response.json()
-            text = response_data.get("caption", dict()).get("text", "")
-            media_id = response_data.get("caption", dict()).get("media_id", 0)
+    async def handle_home_reels(self, reels_data: ReelBuffer, connection: ClipsConnection):
+        """Store the reels of a /reels feed page"""
+        print(f"Found new reels update request")
 
-            for reel in reels_data.values():
-                if media_id == reel["pk"]:
-                    reel["caption"] = dict()
-                    reel["caption"]["text"] = text
+        new_reels = reels_data.add(connection.reels())
+        self.preclassify_reels(new_reels)
+        # await save_many_scraped_content(self.id, new_reels)
 
-    async def handle_profile_network(self, response):
-        url = response.url
-        target_url = "https://www.instagram.com/graphql/query"
+        # Save to all reels content as json
+        # import os
+        # os.makedirs("network", exist_ok=True)
+        # with open(f"network/reels_feed_data.json", 'w') as f:
+        #     json.dump(reels_data , f)
 
-        if target_url in url:
-            try:
-                response_data = await response.json()
+    async def handle_search_results(self, posts_data: dict, response_data: dict):
+        """Store the posts of a search results page"""
+        new_posts = {}
 
-                if response_data["data"].get("user", False):
-                    # it is confirmed that this is a user profile data
-                    new_bio_data = dict()
-                    username = response_data["data"]["user"]["username"]
-                    bio_txt = response_data["data"]["user"]["biography"]
-                    bio_links = []
+        if response_data["media_grid"].get("sections", False):
 
-                    for link_obj in response_data["data"]["user"]["bio_links"]: 
-                        bio_links.append( link_obj["url"] )
+            for section in response_data["media_grid"]["sections"]:
+                for media_wrapper in section["layout_content"]["medias"]:
                     
-                    new_bio_data[username] = {"username": username, "links": bio_links, "text": bio_txt}
-
-                    self.bio_data.update(new_bio_data)
-                    await update_profile(self.id, username, new_bio_data[username])
-
-            except Exception as e:
-                print(f"Failed to process response from {url}: {str(e)}")
-
-    async def handle_reels_network(self, response, reels_data: dict):
-        """Process network responses and store reels data"""
-        url = response.url
-        
-        target_url = "https://www.instagram.com/graphql/query"
-
-        # Check if this is the URL we're interested in
-        if target_url in url:
-            try:
-                response_data = await response.json()
-        
-                if response_data["data"].get("xdt_api__v1__clips__home__connection_v2", False) :
-                    print(f"Found new reels update request")
-
-                    new_reels_data = {}
-                    for edge in response_data["data"]["xdt_api__v1__clips__home__connection_v2"]["edges"]:
-                        media = edge["node"]["media"]
-                        new_reels_data[ media["code"] ] = media
-
-                    reels_data.update(new_reels_data)
-                    # await save_many_scraped_content(self.id, list(new_reels_data.values()))
-
-                    # Save to all reels content as json
-                    # import os
-                    # os.makedirs("network", exist_ok=True)
-                    # with open(f"network/reels_feed_data.json", 'w') as f:
-                    #     json.dump(reels_data , f)
-            except Exception as e:
-                print(f"Failed to process response from {url}: {str(e)}")
-
-    async def handle_search_network(self, response, posts_data: dict):
-        """Process network responses and store posts data"""
-        url = response.url
-        
-        target_url = "https://www.instagram.com/api/v1/fbsearch/web/top_serp/"
+                    media = media_wrapper["media"]
+                    
+                    media_data = dict({
+                        "code": media["code"],
+                        "caption": {
+                            "text": media.get("caption", "").get("text", "")
+                        },
+                        "likes": media.get("likes_count", 0),
+                        "comments": media.get("comments_count", 0),
+                        "username": media.get("user", False).get("username", False),
+                        "taken_at": media["taken_at"],
+                    })
+                    # media_data["code"] = media["code"]
+                    # media_data["caption"]["text"] = media.get("caption", "").get("text", "")
+                    # media_data["likes"] = media.get("likes_count", 0)
+                    # media_data["comments"] = media.get("comments_count", 0)
+                    # media_data["username"] = media.get("user", False).get("username", False)
+                    # media_data["taken_at"] = media["taken_at"]
+                    # save the post data to the new_posts dict
+                    new_posts[media["code"]] = media_data
 
-        # Check if this is the URL we're interested in
-        if target_url in url:
-            try:
-                response_data = await response.json()
-                new_posts = {}
-
-                if response_data["media_grid"].get("sections", False):
-
-                    for section in response_data["media_grid"]["sections"]:
-                        for media_wrapper in section["layout_content"]["medias"]:
-                            
-                            media = media_wrapper["media"]
-                            
-                            media_data = dict({
-                                "code": media["code"],
-                                "caption": {
-                                    "text": media.get("caption", "").get("text", "")
-                                },
-                                "likes": media.get("likes_count", 0),
-                                "comments": media.get("comments_count", 0),
-                                "username": media.get("user", False).get("username", False),
-                                "taken_at": media["taken_at"],
-                            })
-                            # media_data["code"] = media["code"]
-                            # media_data["caption"]["text"] = media.get("caption", "").get("text", "")
-                            # media_data["likes"] = media.get("likes_count", 0)
-                            # media_data["comments"] = media.get("comments_count", 0)
-                            # media_data["username"] = media.get("user", False).get("username", False)
-                            # media_data["taken_at"] = media["taken_at"]
-                            # save the post data to the new_posts dict
-                            new_posts[media["code"]] = media_data
-
-                    posts_data.update(new_posts)
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                print(f"Failed to process response from {url}: {str(e)}")
+            posts_data.update(new_posts)
 
 # utils to save and click stuff
     def add_username_to_potential_list(self, username):
@@ -984,6 +1089,19 @@ class Instagram_Automator:
 
     async def update_scraper(self, state, data=None):
         self.state = state
+
+        self.relevancy_cache.flush_counters()
+        print("relevancy cache:", self.relevancy_cache.stats())
+        print("preclassifier:", self.preclassifier.stats())
+        print("caption prefilter:", self.caption_prefilter.stats())
+        print("llm calls:", self.llm_backend.stats())
+        for classifier in self.campaign_classifiers.values():
+            print("local classifier:", classifier.stats())
+        for signatures in self.campaign_signatures.values():
+            print("caption signatures:", signatures.stats())
+        print("network router:", self.network_router.stats())
+        print("profile wait latency:", self.profile_latency.stats())
+        print("reel wait latency:", self.reel_latency.stats())
         new_time = time.time() - self.start_time
         self.total_time += new_time
 
@@ -1139,6 +1257,14 @@ class Instagram_Automator:
             self.start_time = time.time()
             raise
         finally:
+            self.network_router.end_phase()
+            # write the buffered keyword deltas and reels (also when the task got cancelled)
+            await self.freq_buffer.close()
+            await self.content_buffer.close()
+            await self.profile_buffer.close()
+            await self.label_buffer.close()
+            await self.signature_buffer.close()
+
             new_time = time.time() - self.start_time
             self.total_time += new_time
             await update_scraper_data(self.id, 
@@ -0,0 +1,30 @@
+from collections import deque
+import numpy as np
+
+# WAIT LATENCY OF THE AUTOMATOR
+# how long a profile / reel kept the scraper waiting for its network data (bio, reels, caption),
+# over the most recent samples, to see what the event driven waits cost compared to the old 1 sec polling.
+
+MAX_SAMPLES = 1000
+
+class LatencyStats:
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.samples: deque[float] = deque(maxlen=max_samples)  # seconds
+        self.timeouts = 0
+
+    def add(self, seconds: float, timed_out: bool = False):
+        self.samples.append(seconds)
+        if timed_out:
+            self.timeouts += 1
+
+    def stats(self) -> dict:
+        if not self.samples:
+            return {"count": 0, "timeouts": self.timeouts}
+        p50, p95 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 95])
+        return {
+            "count": len(self.samples),
+            "timeouts": self.timeouts,
+            "p50_ms": round(float(p50) * 1e3, 1),
+            "p95_ms": round(float(p95) * 1e3, 1),
+            "max_ms": round(max(self.samples) * 1e3, 1),
+        }
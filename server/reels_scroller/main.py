@@ -1,4 +1,5 @@
 import asyncio
+import signal
 from playwright.async_api import async_playwright, Page, Locator
 from dotenv import load_dotenv
 from reels_scroller.Instargam_Automater import Instagram_Automator
@@ -7,21 +8,25 @@ from server.database.scrapers import get_scraper_data_by_id, set_scraper_activit
 from server.database.links import get_links_data, update_link_data, get_links_to_check
 from server.database.profiles import  profiles_with_links, update_profile_data
 from server.database.ads import update_ad_data, get_all_non_filtered_ads
+from server.database.indexes import ensure_indexes
+from server.database.screenshots import save_screenshot
 
 import os 
-from google import generativeai as genai
-from google.generativeai import GenerativeModel
-from llm_instructions import website_relevancy_check
+from llm_backends import LLMBackend, get_llm_backend
+from llm_governor import PRIORITY_WEBSITE
 import base64
 from io import BytesIO
 
-
-llm_api_key = os.getenv("GENAI_API_KEY")
-
 load_dotenv()
 
 async def main(scraper_id: str):
     status = False
+
+    # stop_scraper sends SIGTERM, turn it into a cancellation so the automator can flush its buffers
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+    if not await ensure_indexes():
+        print("Warning: some indexes are missing, queries on those collections will scan")
     # print("starting new scraper with id:", scraper_id)
     scraper_data = await get_scraper_data_by_id(scraper_id)
 
@@ -63,8 +68,7 @@ async def main(scraper_id: str):
                 ]
             )
 
-            # genai.configure(api_key=llm_api_key)
-            # llm_model = genai.GenerativeModel(model_name='gemini-2.0-flash')
+            # llm_backend = get_llm_backend('gemini-2.0-flash', priority=PRIORITY_WEBSITE)
             
             #--------------------------------------------------------------
             # # GO THROUGH PROFILES WEBSITES
@@ -75,10 +79,10 @@ async def main(scraper_id: str):
             # # links_data = await get_links_data(scraper_id)
 
             # for link_data in links_data:
-            #     resp = await check_if_suspicious_link(page2, link_data["link"], scraper_data, llm_model)
+            #     resp = await check_if_suspicious_link(page2, link_data["link"], scraper_data, llm_backend)
             #     update_data = dict({
             #         "suspicious": resp["is_relevant"],
-            #         "screenshot": resp["screenshot_base64"]
+            #         "screenshot_id": resp["screenshot_id"]
             #     })
             #     print("link_data = ", link_data)
             #     await update_link_data(link_data["id"], update_data)
@@ -89,10 +93,10 @@ async def main(scraper_id: str):
             # ads = await get_all_non_filtered_ads(scraper_id)
 
             # for ad in ads:
-            #     resp = await check_sus_filter_links(page3, ad["link"], scraper_data, llm_model)
+            #     resp = await check_sus_filter_links(page3, ad["link"], scraper_data, llm_backend)
             #     await update_ad_data(ad["id"], {
             #         "filtered_link": resp["filtered_link"],
-            #         "screenshot": resp["screenshot_base64"],
+            #         "screenshot_id": resp["screenshot_id"],
             #         "suspicious": resp["is_relevant"]
             #     })
             #--------------------------------------------------------------
@@ -107,6 +111,12 @@ async def main(scraper_id: str):
             
             print("Closing browser...")
             await browser.close()
+        except asyncio.CancelledError:
+            # stopped (SIGTERM): the automator flushed its buffers, the scraper is not active anymore
+            print("Scraper stopped")
+            if status:
+                await set_scraper_activity(scraper_id, False)
+            raise
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -118,12 +128,12 @@ async def main(scraper_id: str):
         await set_scraper_activity(scraper_id, False)
         status = False
 
-async def check_sus_filter_links(page: Page, link: str, scraper_data: dict, llm_model: GenerativeModel) -> dict:
+async def check_sus_filter_links(page: Page, link: str, scraper_data: dict, llm_backend: LLMBackend) -> dict:
     try:
         # Validate the link format
         if not link.startswith("http://") and not link.startswith("https://"):
             print(f"Invalid URL format: {link}")
-            return {"is_relevant": False, "screenshot_base64": None, "filtered_link": False}
+            return {"is_relevant": False, "screenshot_id": None, "filtered_link": False}
 
         # Navigate with a timeout but handle it explicitly
         try:
@@ -140,7 +150,7 @@ async def check_sus_filter_links(page: Page, link: str, scraper_data: dict, llm_
         
         if not body_present:
             print(f"No body element found on {link}")
-            return {"is_relevant": False, "screenshot_base64": None}
+            return {"is_relevant": False, "screenshot_id": None}
 
         # Extract Content from the page for llm
         title = await page.title()
@@ -177,26 +187,26 @@ async def check_sus_filter_links(page: Page, link: str, scraper_data: dict, llm_
                 Body Preview: {body_preview}
                 """
 
-        # Take a screenshot and encode it in base64
+        # Take a screenshot and keep it in the screenshot store, the documents only reference it
         screenshot_bytes = await page.screenshot(type="jpeg")
-        screenshot_base64 = base64.b64encode(screenshot_bytes).decode("utf-8")
+        screenshot_id = await save_screenshot(screenshot_bytes)
 
         # Perform relevancy check using LLM
-        response = await website_relevancy_check(llm_model, content, scraper_data["text"])
+        response = await llm_backend.website_relevancy_check(content, scraper_data["text"])
 
-        return {"is_relevant": response, "screenshot_base64": screenshot_base64, "filtered_link": url}
+        return {"is_relevant": response is True, "screenshot_id": screenshot_id, "filtered_link": url} # error dicts are not "relevant"
 
         
     except Exception as e:
         print(f"Error checking link {link}: {str(e)}")
-        return {"is_relevant": False, "screenshot_base64": None, "filtered_link": url}
+        return {"is_relevant": False, "screenshot_id": None, "filtered_link": url}
 
-async def check_if_suspicious_link(page: Page, link: str, scraper_data: dict, llm_model: GenerativeModel) -> dict:
+async def check_if_suspicious_link(page: Page, link: str, scraper_data: dict, llm_backend: LLMBackend) -> dict:
     try:
         # Validate the link format
         if not link.startswith("http://") and not link.startswith("https://"):
             print(f"Invalid URL format: {link}")
-            return {"is_relevant": False, "screenshot_base64": None}
+            return {"is_relevant": False, "screenshot_id": None}
 
         # Navigate with a timeout but handle it explicitly
         try:
@@ -213,7 +223,7 @@ async def check_if_suspicious_link(page: Page, link: str, scraper_data: dict, ll
         
         if not body_present:
             print(f"No body element found on {link}")
-            return {"is_relevant": False, "screenshot_base64": None}
+            return {"is_relevant": False, "screenshot_id": None}
 
         # Extract Content from the page for llm
         title = await page.title()
@@ -250,18 +260,18 @@ async def check_if_suspicious_link(page: Page, link: str, scraper_data: dict, ll
                 Body Preview: {body_preview}
                 """
 
-        # Take a screenshot and encode it in base64
+        # Take a screenshot and keep it in the screenshot store, the documents only reference it
         screenshot_bytes = await page.screenshot(type="jpeg")
-        screenshot_base64 = base64.b64encode(screenshot_bytes).decode("utf-8")
+        screenshot_id = await save_screenshot(screenshot_bytes)
 
         # Perform relevancy check using LLM
-        response = await website_relevancy_check(llm_model, content, scraper_data["text"])
+        response = await llm_backend.website_relevancy_check(content, scraper_data["text"])
 
-        return {"is_relevant": response, "screenshot_base64": screenshot_base64}
+        return {"is_relevant": response is True, "screenshot_id": screenshot_id} # error dicts are not "relevant"
 
     except Exception as e:
         print(f"Error checking link {link}: {str(e)}")
-        return {"is_relevant": False, "screenshot_base64": None}
+        return {"is_relevant": False, "screenshot_id": None}
     
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
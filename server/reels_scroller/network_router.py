@@ -0,0 +1,224 @@
+import re
+import time
+from typing import Any, Awaitable, Callable, Optional
+import msgspec
+from playwright.async_api import Page, Response
+from reels_scroller.records import ClipsConnection, UserInfo, CommentsPage
+
+# GRAPHQL RESPONSE ROUTER
+# one "response" listener per page: a graphql/query body is read and decoded once and every root key
+# under "data" (xdt_api__v1__clips__home__connection_v2, user, ...) goes to the handlers registered for it.
+# phases register their handlers when they start and unregister them when they end, so handlers of
+# earlier phases don't keep reading every response.
+# a few non-graphql endpoints (comments, search) are routed by url fragment, with the decoded body.
+# only the root keys that have a handler are decoded, the ones listed in ROOT_TYPES / URL_TYPES into
+# typed records (reels_scroller.records), the rest into plain dicts.
+# most graphql queries of a page are ones nobody reads: before fetching a body, the router looks up the
+# operation (x-fb-friendly-name header, fb_api_req_friendly_name / doc_id of the post data) in what
+# it has learned from earlier bodies, and skips the body if none of the operation's root keys has a handler.
+
+GRAPHQL_URL = "https://www.instagram.com/graphql/query"
+
+# root keys of the graphql responses the scraper reads
+CLIPS_HOME = "xdt_api__v1__clips__home__connection_v2"
+CLIPS_USER = "xdt_api__v1__clips__user__connection_v2"
+USER_INFO = "user"
+FEED_TIMELINE = "xdt_api__v1__feed__timeline__connection"
+
+OPERATION_PATTERN = re.compile(r"(?:^|[?&])(fb_api_req_friendly_name|doc_id)=([^&]+)")
+RECHECK_EVERY = 50  # a skipped operation is still decoded once in a while, in case its root keys change
+API_RESOURCE_TYPES = ("xhr", "fetch")
+
+ROOT_TYPES = {
+    CLIPS_HOME: ClipsConnection,
+    CLIPS_USER: ClipsConnection,
+    USER_INFO: UserInfo,
+}
+URL_TYPES = {
+    "comments": CommentsPage,
+}
+
+class GraphQLBody(msgspec.Struct, gc=False):
+    # values stay raw json until a handler wants them
+    data: Optional[dict[str, msgspec.Raw]] = None
+
+BODY_DECODER = msgspec.json.Decoder(GraphQLBody)
+ROOT_DECODERS = {root_key: msgspec.json.Decoder(Optional[record_type]) for root_key, record_type in ROOT_TYPES.items()}
+URL_DECODERS = {url_fragment: msgspec.json.Decoder(record_type) for url_fragment, record_type in URL_TYPES.items()}
+ANY_DECODER = msgspec.json.Decoder()
+
+# a handler gets the value under its root key (or the whole body for url routes), a record or a dict
+ResponseHandler = Callable[[Any], Awaitable[None]]
+
+def operation_name(response: Response) -> Optional[str]:
+    ''' graphql operation of the response, from the request headers / post data (no body read) '''
+    request = response.request
+    name = request.headers.get("x-fb-friendly-name")
+    if name:
+        return name
+    found = dict(OPERATION_PATTERN.findall((request.post_data or "") + "&" + response.url.partition("?")[2]))
+    if found.get("fb_api_req_friendly_name"):
+        return found["fb_api_req_friendly_name"]
+    if found.get("doc_id"):
+        return "doc_id:" + found["doc_id"]
+    return None
+
+class NetworkRouter:
+    def __init__(self, page: Page):
+        self.root_handlers: dict[str, list[ResponseHandler]] = dict()  # root key -> handlers
+        self.url_handlers: dict[str, list[ResponseHandler]] = dict()   # url fragment -> handlers
+        self.phase_routes: tuple[dict, dict] = (dict(), dict())          # (root routes, url routes) of the running phase
+        self.operation_roots: dict[str, frozenset[str]] = dict()        # operation -> root keys its bodies had
+        self.operation_skips: dict[str, int] = dict()                   # operation -> times wanted_operation said no
+        self.skipped_by_route: dict[str, int] = dict()                  # operation / url fragment -> bodies not read
+
+        self.responses = 0
+        self.decoded = 0
+        self.dispatched = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes_decoded = 0
+        self.decode_cpu = 0.0   # seconds
+        self.handler_time = 0.0 # seconds
+
+        page.on("response", self.on_response)
+
+    # REGISTER
+    def register(self, root_key: str, handler: ResponseHandler):
+        self.root_handlers.setdefault(root_key, []).append(handler)
+
+    def register_url(self, url_fragment: str, handler: ResponseHandler):
+        self.url_handlers.setdefault(url_fragment, []).append(handler)
+
+    def unregister(self, root_key: str, handler: ResponseHandler):
+        self._remove(self.root_handlers, root_key, handler)
+
+    def unregister_url(self, url_fragment: str, handler: ResponseHandler):
+        self._remove(self.url_handlers, url_fragment, handler)
+
+    def _remove(self, handlers: dict[str, list[ResponseHandler]], key: str, handler: ResponseHandler):
+        if handler in handlers.get(key, []):
+            handlers[key].remove(handler)
+            if not handlers[key]:
+                del handlers[key]
+
+    def start_phase(self, root_routes: dict[str, ResponseHandler] = None, url_routes: dict[str, ResponseHandler] = None):
+        ''' register the handlers of a phase, the ones of the previous phase are dropped '''
+        self.end_phase()
+        self.phase_routes = (root_routes or dict(), url_routes or dict())
+        for root_key, handler in self.phase_routes[0].items():
+            self.register(root_key, handler)
+        for url_fragment, handler in self.phase_routes[1].items():
+            self.register_url(url_fragment, handler)
+
+    def end_phase(self):
+        root_routes, url_routes = self.phase_routes
+        for root_key, handler in root_routes.items():
+            self.unregister(root_key, handler)
+        for url_fragment, handler in url_routes.items():
+            self.unregister_url(url_fragment, handler)
+        self.phase_routes = (dict(), dict())
+
+    # DISPATCH
+    def _skip(self, route: str):
+        # skipped bodies are never read, so they are counted, not measured
+        self.skipped += 1
+        self.skipped_by_route[route] = self.skipped_by_route.get(route, 0) + 1
+
+    def wanted_operation(self, operation: Optional[str]) -> bool:
+        ''' False if the operation is known to only return root keys nobody handles right now '''
+        roots = self.operation_roots.get(operation) if operation is not None else None
+        if roots is None or not roots.isdisjoint(self.root_handlers):
+            return True
+        self.operation_skips[operation] = self.operation_skips.get(operation, 0) + 1
+        return self.operation_skips[operation] % RECHECK_EVERY == 0
+
+    async def on_response(self, response: Response):
+        url = response.url
+        operation = None
+        if GRAPHQL_URL in url:
+            if not self.root_handlers:
+                return
+            operation = operation_name(response)
+            if not self.wanted_operation(operation) or not response.ok:
+                self._skip(operation or "unknown operation")
+                return
+        else:
+            url_routes = [(fragment, list(handlers)) for fragment, handlers in self.url_handlers.items() if fragment in url]
+            if not url_routes:
+                return
+            if response.request.resource_type not in API_RESOURCE_TYPES or not response.ok: # images, scripts, error pages
+                self._skip(url_routes[0][0])
+                return
+
+        self.responses += 1
+        try:
+            body = await response.body()
+            self.bytes_decoded += len(body)
+        except Exception as e:
+            self.failed += 1
+            print(f"Failed to read response from {url}: {str(e)}")
+            return
+
+        if GRAPHQL_URL not in url:
+            for fragment, handlers in url_routes:
+                value = self._decode(URL_DECODERS.get(fragment, ANY_DECODER), body, url)
+                if value is not None:
+                    for handler in handlers:
+                        await self._dispatch(handler, value, url)
+            return
+
+        graphql_body = self._decode(BODY_DECODER, body, url)
+        if graphql_body is None or graphql_body.data is None:
+            return
+        if operation is not None:
+            self.operation_roots[operation] = self.operation_roots.get(operation, frozenset()) | frozenset(graphql_body.data)
+        for root_key, raw_value in graphql_body.data.items():
+            # copy: a handler may end its phase (and unregister) while this response is dispatched
+            handlers = list(self.root_handlers.get(root_key, ()))
+            if not handlers:
+                continue
+            value = self._decode(ROOT_DECODERS.get(root_key, ANY_DECODER), raw_value, url)
+            if not value:
+                continue
+            for handler in handlers:
+                await self._dispatch(handler, value, url)
+
+    def _decode(self, decoder: msgspec.json.Decoder, raw, url: str):
+        ''' decoded value, None if it doesn't decode / doesn't match the record type '''
+        start = time.thread_time()
+        try:
+            value = decoder.decode(raw)
+            self.decoded += 1
+            return value
+        except msgspec.DecodeError as e:
+            self.failed += 1
+            print(f"Failed to decode response from {url}: {str(e)}")
+            return None
+        finally:
+            self.decode_cpu += time.thread_time() - start
+
+    async def _dispatch(self, handler: ResponseHandler, value: Any, url: str):
+        self.dispatched += 1
+        start = time.perf_counter()
+        try:
+            await handler(value)
+        except Exception as e:
+            self.failed += 1
+            print(f"Failed to process response from {url}: {str(e)}")
+        finally:
+            self.handler_time += time.perf_counter() - start
+
+    def stats(self) -> dict:
+        return {
+            "responses": self.responses,
+            "decoded": self.decoded,
+            "dispatched": self.dispatched,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "bytes_decoded": self.bytes_decoded,
+            "skipped_by_route": dict(sorted(self.skipped_by_route.items(), key=lambda item: -item[1])[:10]),
+            "operations_known": len(self.operation_roots),
+            "decode_cpu_us_per_response": self.decode_cpu / self.responses * 1e6 if self.responses else 0.0,
+            "handler_ms_per_dispatch": self.handler_time / self.dispatched * 1e3 if self.dispatched else 0.0,
+        }
@@ -0,0 +1,70 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+# SPECULATIVE PRE-CLASSIFICATION OF REELS
+# the network handlers schedule a relevancy check as soon as a reel's caption shows up,
+# so the skip / watch decision is usually ready when the scroller reaches the reel.
+# reels the scroller went past without stopping get their pending checks cancelled.
+
+class ReelPreclassifier:
+    def __init__(self, classify: Callable[[str], Awaitable], max_concurrency: int = 24):
+        self.classify = classify    # caption -> verdict
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.tasks: OrderedDict[str, asyncio.Task] = OrderedDict() # reel code -> check, in feed order
+
+        self.scheduled = 0
+        self.ready_on_arrival = 0   # verdicts that were done when the scroller got to the reel
+        self.cancelled = 0
+
+    def schedule(self, code: str, caption: str):
+        ''' start checking a reel in the background (no-op without a caption or if already running) '''
+        if not caption or code in self.tasks:
+            return
+        task = asyncio.create_task(self._run(caption))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception()) # errors surface in verdict(), if it is ever asked
+        self.tasks[code] = task
+        self.scheduled += 1
+
+    async def _run(self, caption: str):
+        async with self.semaphore:
+            return await self.classify(caption)
+
+    async def verdict(self, code: str, caption: str):
+        ''' verdict for the reel on screen, from its running check if there is one '''
+        self.reached(code)
+
+        task = self.tasks.pop(code, None)
+        if task is None or task.cancelled():
+            return await self.classify(caption)
+        if task.done():
+            self.ready_on_arrival += 1
+        return await task
+
+    def reached(self, code: str):
+        ''' the scroller is at this reel: the ones before it in the feed scrolled out of range '''
+        if code not in self.tasks:
+            return
+        while self.tasks:
+            earlier_code, task = next(iter(self.tasks.items()))
+            if earlier_code == code:
+                break
+            self.tasks.popitem(last=False)
+            if not task.done():
+                task.cancel()
+                self.cancelled += 1
+
+    def clear(self):
+        ''' cancel everything (end of a watching phase) '''
+        for task in self.tasks.values():
+            if not task.done():
+                task.cancel()
+                self.cancelled += 1
+        self.tasks.clear()
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": self.scheduled,
+            "ready_on_arrival": self.ready_on_arrival,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,79 @@
+from typing import Optional, Union
+import msgspec
+
+# TYPED RECORDS OF THE INSTAGRAM PAYLOADS THE SCRAPER READS
+# a clips media node has hundreds of fields, the scraper uses a dozen. the structs below list only those:
+# msgspec decodes them straight from the response bytes and skips everything else without building it,
+# and the records are slotted objects instead of nested dicts (a fraction of the memory per reel).
+# the field names are the json keys, the defaults cover keys instagram leaves out.
+
+class Caption(msgspec.Struct, gc=False):
+    text: str = ""
+
+class Owner(msgspec.Struct, gc=False):
+    username: str = ""
+
+class ReelRecord(msgspec.Struct):
+    code: str
+    pk: Union[int, str] = 0
+    caption: Optional[Caption] = None   # None until it is known (profile reels get it from the comments request)
+    user: Optional[Owner] = None
+    owner: Optional[Owner] = None
+    like_count: Optional[int] = 0   # null when the owner hides likes
+    comment_count: Optional[int] = 0
+    view_count: Optional[int] = 0
+    taken_at: Optional[int] = None
+    location: Optional[dict] = None
+    target_app_id: Optional[int] = None
+
+    @property
+    def caption_text(self) -> str:
+        return self.caption.text if self.caption is not None else ""
+
+    @property
+    def username(self) -> str:
+        owner = self.owner or self.user
+        return owner.username if owner is not None else ""
+
+    def content_doc(self) -> dict:
+        ''' the stored fields, same document as content.create_doc builds from a media dict '''
+        return {
+            "code": self.code,
+            "like_count": self.like_count,
+            "comment_count": self.comment_count,
+            "view_count": self.view_count,
+            "taken_at": self.taken_at,
+            "location": self.location,
+            "caption": self.caption_text,
+            "username": self.user.username if self.user is not None else "",
+        }
+
+class ReelNode(msgspec.Struct, gc=False):
+    media: Optional[ReelRecord] = None
+
+class ReelEdge(msgspec.Struct, gc=False):
+    node: ReelNode
+
+class ClipsConnection(msgspec.Struct, gc=False):
+    ''' xdt_api__v1__clips__home__connection_v2 / xdt_api__v1__clips__user__connection_v2 '''
+    edges: list[ReelEdge] = []
+
+    def reels(self) -> list[ReelRecord]:
+        return [edge.node.media for edge in self.edges if edge.node.media is not None]
+
+class BioLink(msgspec.Struct, gc=False):
+    url: str = ""
+
+class UserInfo(msgspec.Struct, gc=False):
+    ''' the "user" root key of a profile page '''
+    username: str
+    biography: Optional[str] = ""
+    bio_links: list[BioLink] = []
+
+class CommentsCaption(msgspec.Struct, gc=False):
+    text: str = ""
+    media_id: Union[int, str] = 0
+
+class CommentsPage(msgspec.Struct, gc=False):
+    ''' the comments request of a reel, it carries the caption profile reels are missing '''
+    caption: Optional[CommentsCaption] = None
@@ -0,0 +1,113 @@
+import os
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Union
+from reels_scroller.records import ReelRecord, Caption
+
+# BOUNDED REEL BUFFER
+# the reels of a phase, by code, for the scroller to look up the reel on screen. feed pages keep coming
+# for hours, so only the most recently added / looked up reels are kept (LRU).
+# profile reels come without their caption, the comments request of the reel brings it by media id:
+# a pk index finds the reel directly, and a per-reel future wakes whoever waits for the caption.
+
+REEL_BUFFER_SIZE = int(os.getenv("REEL_BUFFER_SIZE", "500"))
+
+class ReelBuffer:
+    def __init__(self, max_reels: int = REEL_BUFFER_SIZE):
+        self.max_reels = max_reels
+        self.reels: OrderedDict[str, ReelRecord] = OrderedDict()   # code -> reel, least recently used first
+        self.codes_by_pk: dict[str, str] = dict()
+        self.caption_futures: dict[str, asyncio.Future] = dict()   # code -> caption text
+        self.loaded = asyncio.Event()   # set once the first reels are in
+
+        self.evicted = 0
+        self.captions_backfilled = 0
+
+    def __len__(self) -> int:
+        return len(self.reels)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.reels
+
+    def __getitem__(self, code: str) -> ReelRecord:
+        ''' the reel (KeyError if it isn't buffered), it becomes the most recently used '''
+        reel = self.reels[code]
+        self.reels.move_to_end(code)
+        return reel
+
+    def add(self, reels: list[ReelRecord]) -> list[ReelRecord]:
+        ''' buffer a page of reels, returns the ones that were not buffered yet '''
+        new_reels = []
+        for reel in reels:
+            known = self.reels.get(reel.code)
+            if known is not None:
+                self.reels.move_to_end(reel.code)
+                if known.caption is None and reel.caption is not None:
+                    self._set_caption(known, reel.caption)
+                continue
+
+            self.reels[reel.code] = reel
+            self.codes_by_pk[str(reel.pk)] = reel.code
+            new_reels.append(reel)
+        if new_reels:
+            self.loaded.set()
+
+        while len(self.reels) > self.max_reels:
+            self._evict()
+        return new_reels
+
+    def _evict(self):
+        code, reel = self.reels.popitem(last=False)
+        self.codes_by_pk.pop(str(reel.pk), None)
+        future = self.caption_futures.pop(code, None)
+        if future is not None and not future.done():
+            future.set_result("") # whoever waits gets no caption, same as a timeout
+        self.evicted += 1
+
+    def _set_caption(self, reel: ReelRecord, caption: Caption):
+        reel.caption = caption
+        future = self.caption_futures.pop(reel.code, None)
+        if future is not None and not future.done():
+            future.set_result(caption.text)
+
+    def set_caption_by_pk(self, pk: Union[int, str], text: str) -> Optional[ReelRecord]:
+        ''' backfill the caption of a buffered reel, None if the reel isn't buffered '''
+        code = self.codes_by_pk.get(str(pk))
+        if code is None:
+            return None
+        reel = self.reels[code]
+        self._set_caption(reel, Caption(text=text))
+        self.captions_backfilled += 1
+        return reel
+
+    async def wait_until_loaded(self, timeout: float) -> bool:
+        ''' False if no reels came in within timeout '''
+        try:
+            await asyncio.wait_for(self.loaded.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait_for_caption(self, code: str, timeout: float) -> str:
+        ''' caption text of the reel, "" if it doesn't arrive within timeout (or the reel isn't buffered) '''
+        reel = self.reels.get(code)
+        if reel is None:
+            return ""
+        if reel.caption is not None:
+            return reel.caption.text
+
+        if code not in self.caption_futures:
+            self.caption_futures[code] = asyncio.get_running_loop().create_future()
+        try:
+            # shield: a timeout here must not cancel the future other waiters (or a later wait) use
+            return await asyncio.wait_for(asyncio.shield(self.caption_futures[code]), timeout)
+        except asyncio.TimeoutError:
+            return ""
+
+    def stats(self) -> dict:
+        return {
+            "reels": len(self.reels),
+            "evicted": self.evicted,
+            "captions_backfilled": self.captions_backfilled,
+            "waiting_for_caption": len(self.caption_futures),
+        }
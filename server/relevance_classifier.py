@@ -0,0 +1,139 @@
+import os
+import re
+import zlib
+import asyncio
+import hashlib
+from collections import deque
+from typing import Optional
+import numpy as np
+from llm_cache import normalize_caption
+from server.database.relevancy_labels import get_relevancy_labels
+
+# LOCAL RELEVANCE CLASSIFIER PER CAMPAIGN
+# logistic regression over hashed word uni/bi-grams, trained on the LLM verdicts of the labeling log.
+# confident predictions are used as the verdict, the rest goes to the LLM
+# and its verdict becomes a new label for the next retraining.
+
+N_FEATURES = 2**18
+CLASSIFIER_CONFIDENCE = float(os.getenv("CLASSIFIER_CONFIDENCE", "0.95"))  # probability needed to skip the LLM
+CLASSIFIER_MIN_LABELS = int(os.getenv("CLASSIFIER_MIN_LABELS", "200"))
+CLASSIFIER_RETRAIN_EVERY = int(os.getenv("CLASSIFIER_RETRAIN_EVERY", "200"))  # new labels
+CLASSIFIER_MAX_LABELS = int(os.getenv("CLASSIFIER_MAX_LABELS", "20000"))
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")   # words, and symbols on their own (!, 🆔, ...)
+
+def campaign_key(text_prompt: str, keywords: list[str]) -> str:
+    ''' labels / classifiers are per (prompt, keywords), the same thing a caption is checked against '''
+    key_text = "\x00".join([text_prompt.strip(), ",".join(sorted(keyword.casefold() for keyword in keywords))])
+    return hashlib.sha256(key_text.encode("utf-8")).hexdigest()
+
+def caption_features(caption: str, n_features: int = N_FEATURES) -> np.ndarray:
+    ''' sorted unique feature indices of the caption's hashed uni/bi-grams '''
+    tokens = TOKEN_PATTERN.findall(normalize_caption(caption))
+    grams = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    # crc32, not hash(): features must be the same in every process
+    return np.unique(np.fromiter((zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams), dtype=np.int64, count=len(grams)))
+
+class RelevanceClassifier:
+    def __init__(self, n_features: int = N_FEATURES):
+        self.n_features = n_features
+        self.weights = np.zeros(n_features)
+        self.bias = 0.0
+
+    def fit(self, captions: list[str], verdicts: list[bool], epochs: int = 200, learning_rate: float = 2.0, l2: float = 1e-5):
+        ''' full batch gradient descent, classes weighted so the rare one is not drowned out '''
+        features = [caption_features(caption, self.n_features) for caption in captions]
+        rows = np.repeat(np.arange(len(features)), [len(f) for f in features])
+        cols = np.concatenate(features) if features else np.zeros(0, dtype=np.int64)
+        labels = np.asarray(verdicts, dtype=np.float64)
+
+        positives = labels.sum()
+        negatives = len(labels) - positives
+        sample_weights = np.where(labels == 1, len(labels) / (2 * max(positives, 1)), len(labels) / (2 * max(negatives, 1)))
+
+        weights = np.zeros(self.n_features)
+        bias = 0.0
+        for _ in range(epochs):
+            logits = np.bincount(rows, weights=weights[cols], minlength=len(labels)) + bias
+            errors = (1 / (1 + np.exp(-logits)) - labels) * sample_weights
+            gradient = np.bincount(cols, weights=errors[rows], minlength=self.n_features) / len(labels) + l2 * weights
+            weights -= learning_rate * gradient
+            bias -= learning_rate * errors.mean()
+
+        self.weights = weights
+        self.bias = bias
+
+    def predict_proba(self, caption: str) -> float:
+        logit = self.weights[caption_features(caption, self.n_features)].sum() + self.bias
+        return float(1 / (1 + np.exp(-logit)))
+
+class CampaignClassifier:
+    ''' classifier of one campaign, (re)trained in the background as LLM labels come in '''
+
+    def __init__(self, campaign_key: str, confidence: float = CLASSIFIER_CONFIDENCE):
+        self.campaign_key = campaign_key
+        self.confidence = confidence
+        self.classifier: RelevanceClassifier = None
+
+        self.captions: deque[str] = deque(maxlen=CLASSIFIER_MAX_LABELS)
+        self.verdicts: deque[bool] = deque(maxlen=CLASSIFIER_MAX_LABELS)
+        self.labels_since_fit = 0
+        self._fit_task: asyncio.Task = None
+
+        self.decided = 0
+        self.uncertain = 0
+
+    async def load(self):
+        ''' train on the labeling log of the campaign '''
+        try:
+            labels = await get_relevancy_labels(self.campaign_key, limit=CLASSIFIER_MAX_LABELS)
+        except Exception as e:
+            print(f"Failed to load relevancy labels: {e}")
+            return
+        # labels come newest first: each goes to the left of the older ones, so the oldest ends up leftmost
+        # and is dropped first. labels added in this session meanwhile stay on the right, and only the
+        # room they leave is filled (appendleft on a full deque would drop them instead)
+        room = CLASSIFIER_MAX_LABELS - len(self.captions)
+        for label in labels[:max(room, 0)]:
+            self.captions.appendleft(label["caption"])
+            self.verdicts.appendleft(label["verdict"])
+        await self.fit()
+
+    def add_label(self, caption: str, verdict: bool):
+        self.captions.append(caption)
+        self.verdicts.append(verdict)
+        self.labels_since_fit += 1
+        if self.labels_since_fit >= CLASSIFIER_RETRAIN_EVERY and (self._fit_task is None or self._fit_task.done()):
+            self._fit_task = asyncio.create_task(self.fit())
+
+    async def fit(self):
+        verdicts = list(self.verdicts)
+        # needs enough labels of both classes
+        if len(verdicts) < CLASSIFIER_MIN_LABELS or all(verdicts) or not any(verdicts):
+            return
+        self.labels_since_fit = 0
+        classifier = RelevanceClassifier()
+        await asyncio.to_thread(classifier.fit, list(self.captions), verdicts) # keep the event loop free while training
+        self.classifier = classifier
+
+    def verdict(self, caption: str) -> Optional[bool]:
+        ''' True / False when the classifier is confident, None if the LLM has to decide '''
+        if self.classifier is None or not caption:
+            return None
+        probability = self.classifier.predict_proba(caption)
+        if probability >= self.confidence:
+            self.decided += 1
+            return True
+        if probability <= 1 - self.confidence:
+            self.decided += 1
+            return False
+        self.uncertain += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "labels": len(self.verdicts),
+            "trained": self.classifier is not None,
+            "decided_locally": self.decided,
+            "sent_to_llm": self.uncertain,
+        }
@@ -0,0 +1,78 @@
+import asyncio
+from llm_backends import LLMBackend
+from text_normalize import normalize_text
+
+# MICRO-BATCHING OF CAPTION RELEVANCY CHECKS
+# captions submitted within max_wait seconds of each other (or until batch_size is reached)
+# are classified by one LLM call instead of one call each.
+# a caption whose future was cancelled before its batch is sent (nobody waits for it anymore) is left out.
+
+class RelevancyBatcher:
+    def __init__(self, llm_backend: LLMBackend, text_prompt: str, keywords: list[str], batch_size: int = 12, max_wait: float = 0.3):
+        self.llm_backend = llm_backend
+        self.text_prompt = text_prompt
+        self.keywords = keywords
+        self.batch_size = batch_size
+        self.max_wait = max_wait    # seconds the first caption of a batch waits for company
+
+        self.pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle = None
+        self._running: set[asyncio.Task] = set()   # the loop only keeps weak references to tasks
+
+        self.batches_sent = 0
+        self.captions_sent = 0
+        self.captions_dropped = 0
+
+    def submit(self, caption: str) -> asyncio.Future:
+        ''' future of the verdict (True / False, or the error dict of the LLM call) '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((caption, future))
+
+        if len(self.pending) >= self.batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return future
+
+    async def check(self, caption: str):
+        return await self.submit(caption)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self.pending:
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]):
+        wanted = [(caption, future) for caption, future in batch if not future.done()]
+        self.captions_dropped += len(batch) - len(wanted)
+        if not wanted:
+            return
+        batch = wanted
+
+        # the same caption twice in a batch is asked once (also when it only differs in spelling tricks)
+        first_of: dict[str, str] = dict()   # normalized caption -> the caption sent for it
+        for caption, _ in batch:
+            first_of.setdefault(normalize_text(caption), caption)
+        captions = list(first_of.values())
+        self.batches_sent += 1
+        self.captions_sent += len(captions)
+
+        try:
+            verdicts = await self.llm_backend.relevancy_check_batch(captions, self.text_prompt, self.keywords)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        verdict_of = dict(zip(first_of.keys(), verdicts))
+        for caption, future in batch:
+            if not future.done():
+                future.set_result(verdict_of[normalize_text(caption)])
@@ -1,24 +1,32 @@
 # server_main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, BackgroundTasks
 import os
 import json
 import uvicorn
 from dotenv import load_dotenv
 from pydantic import BaseModel
+from typing import Optional
 import asyncio
 from multiprocessing import Process
 # import multiprocessing
-from google import generativeai as genai
 import base64
-from llm_instructions import title_keywords_hashtags_instruction
+from llm_cache import RelevancyCache
+from llm_governor import PRIORITY_CAPTION
+from llm_backends import get_llm_backend
+from reclassify import reclassify_campaign
 
-from server.database.scrapers import get_scraper_name, get_scraper_name, new_scraper, scraper_check_suspended, get_scraper_state, get_all_scrapers, get_all_scraper_ids, get_scraper_data_by_id, update_activity
+from server.database.scrapers import get_scraper_name, get_scraper_name, new_scraper, scraper_check_suspended, get_scraper_state, get_scrapers_page, get_all_scraper_ids, get_scraper_data_by_id, update_activity
 from server.database.accounts import get_all_accounts, insert_account, get_unassigned_account, assign_scraper_to_account
-from server.database.profiles import get_profiles_data, get_profile_data
-from server.database.links import get_links_data, get_all_links_data, get_link_data, update_link_state
-from server.database.content import get_reels_data
-from server.database.ads import get_ads_data
+from server.database.profiles import get_profiles_page, get_profile_data
+from server.database.links import get_links_page, get_all_links_with_campaign_page, get_link_data, update_link_state
+from server.database.content import get_reels_page
+from server.database.ads import get_ads_page
+from server.database.pagination import DEFAULT_PAGE_SIZE
+from server.database.loaders import RequestLoaders
+from server.database.screenshots import get_screenshot, is_screenshot_id
 from server.database.targeted_apps import get_targeted_app, get_targeted_apps, insert_targeted_app
+from server.database.connection import close_client
+from server.database.indexes import ensure_indexes
 
 from fastapi.middleware.cors import CORSMiddleware
 import psutil 
@@ -64,10 +72,16 @@ app.add_middleware(
 
 running_processes: dict[str, int] = load_process_info()
 
-llm_api_key = os.getenv("GENAI_API_KEY")
+llm_backend = get_llm_backend('gemini-1.5-flash', priority=PRIORITY_CAPTION)
 
-genai.configure(api_key=llm_api_key)
-llm_model = genai.GenerativeModel(model_name='gemini-1.5-flash')
+@app.on_event("startup")
+async def bootstrap_indexes():
+    if not await ensure_indexes():
+        print("Warning: some indexes are missing, queries on those collections will scan")
+
+@app.on_event("shutdown")
+async def shutdown_db_client():
+    close_client()
 
 @app.get("/")
 async def read_root():
@@ -75,16 +89,19 @@ async def read_root():
 
 # ------- SCRAPER ENDPOINTS --------
 @app.get("/all_scrapers")
-async def all_scrapers():
-    '''Get all scrapers from the database'''
+async def all_scrapers(after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, fields: Optional[str] = None, sort: str = "_id", order: str = "asc"):
+    '''Get a page of scrapers from the database (pass next_after as after for the next page)'''
     try:
-        all_scrapers = await get_all_scrapers()
+        page = await get_scrapers_page(after, limit, fields, sort, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch scrapers: {str(e)}")
     
     return {
         "status": "success",
-        "scrapers": all_scrapers
+        "scrapers": page["items"],
+        "next_after": page["next_after"]
     }
 
 @app.get("/scraper_data/{scraper_id}")
@@ -150,101 +167,103 @@ async def get_targeted_apps_data(scraper_id: str):
 
 
 @app.get("/reels_data/{scraper_id}")
-async def reels_scraper(scraper_id: str):
-    '''Get a specific scraper from the database'''
+async def reels_scraper(scraper_id: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, fields: Optional[str] = None, sort: str = "_id", order: str = "asc"):
+    '''Get a page of reels of a scraper (pass next_after as after for the next page)'''
     try:
-        reels = await get_reels_data(scraper_id)
+        page = await get_reels_page(scraper_id, after, limit, fields, sort, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch scraper: {str(e)}")
     
     return {
         "status": "success",
-        "reels": reels
+        "reels": page["items"],
+        "next_after": page["next_after"]
     }
 
 @app.get("/profiles_data/{scraper_id}")
-async def profiles_scraper(scraper_id: str):
-    '''Get a specific scraper from the database'''
+async def profiles_scraper(scraper_id: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, fields: Optional[str] = None, sort: str = "_id", order: str = "asc"):
+    '''Get a page of profiles of a scraper (pass next_after as after for the next page)'''
     try:
-        profiles = await get_profiles_data(scraper_id)
+        page = await get_profiles_page(scraper_id, after, limit, fields, sort, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch scraper: {str(e)}")
     
     return {
         "status": "success",
-        "profiles": profiles
+        "profiles": page["items"],
+        "next_after": page["next_after"]
     }
 
 # --------------ADS----------------
 
 @app.get("/ads_data/{scraper_id}")
-async def ads_scraper(scraper_id: str):
-    '''Get a specific scraper from the database'''
+async def ads_scraper(scraper_id: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, fields: Optional[str] = None, sort: str = "_id", order: str = "asc"):
+    '''Get a page of ads of a scraper (pass next_after as after for the next page)'''
     try:
-        ads = await get_ads_data(scraper_id)
+        page = await get_ads_page(scraper_id, after, limit, fields, sort, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch scraper: {str(e)}")
     
     return {
         "status": "success",
-        "ads": ads
+        "ads": page["items"],
+        "next_after": page["next_after"]
     }
 
 # -------------------------------
 @app.get("/links/{scraper_id}")
-async def links_scraper(scraper_id: str):
-    '''Get a specific scraper from the database'''
+async def links_scraper(scraper_id: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, fields: Optional[str] = None, sort: str = "_id", order: str = "asc"):
+    '''Get a page of links of a scraper (pass next_after as after for the next page)'''
     try:
-        links = await get_links_data(scraper_id)
+        page = await get_links_page(scraper_id, after, limit, fields, sort, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch scraper: {str(e)}")
     
     return {
         "status": "success",
-        "links": links
+        "links": page["items"],
+        "next_after": page["next_after"]
     }
 
 @app.get("/links/")
-async def links_scraper():
-    '''Get a specific scraper from the database'''
+async def all_links(after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    '''Get a page of the links of all scrapers with their campaign names (pass next_after as after for the next page)'''
     try:
-        links = await get_all_links_data()
-        scrapers_data = await get_all_scrapers()
-        
-        scraper_name = dict()
-        for scraper in scrapers_data:
-            scraper_name[ scraper["id"] ] = scraper["title"]
-        
-        formated_links =[] 
-
-        for link in links:
-            formated_links.append({
-                "link_id": link["id"],
-                "link": link["link"],
-                "profiles": link["profiles"],
-                "suspicious": link["suspicious"],
-                "campaign_id": link["scraper_id"],
-                "campaign_name": scraper_name.get(link["scraper_id"], ""),
-                "manual_check_result": link["manual_check_result"],
-                "state": link["state"],
-            })
+        page = await get_all_links_with_campaign_page(after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch scraper: {str(e)}")
     
     return {
         "status": "success",
-        "links": formated_links
+        "links": page["items"],
+        "next_after": page["next_after"]
     }
 
+def get_request_loaders() -> RequestLoaders:
+    '''fresh batch loaders for every request'''
+    return RequestLoaders()
+
 @app.get("/data-of-link/{link_id}")
-async def data_of_link(link_id: str):
+async def data_of_link(link_id: str, loaders: RequestLoaders = Depends(get_request_loaders)):
     try:
         link = await get_link_data(link_id)
-        scraper_name = await get_scraper_name(link["scraper_id"])
 
-        profiles_data = dict()
-        for profile in link["profiles"]:
-            profiles_data[profile] = await get_profile_data(profile)
+        # both lookups are batched: one $in on scrape_profiles and one on scrapers
+        scraper_name, profiles = await asyncio.gather(
+            loaders.scraper_names.load(link["scraper_id"]),
+            loaders.profiles.load_many(link["profiles"]),
+        )
+        profiles_data = dict(zip(link["profiles"], profiles))
 
         formated_link = {
             "link_id": link_id,
@@ -255,7 +274,9 @@ async def data_of_link(link_id: str):
             "campaign_name": scraper_name,
             "manual_check_result": link["manual_check_result"],
             "state": link["state"],
-            "preview_image": link["screenshot"],
+            # documents from before the screenshot store still carry the base64 image inline
+            "preview_image": link.get("screenshot", None),
+            "preview_image_url": f"/screenshots/{link['screenshot_id']}" if link.get("screenshot_id") else None,
         }
 
         if link.get("review_notes", False):
@@ -270,6 +291,83 @@ async def data_of_link(link_id: str):
         "link": formated_link
     }
 
+@app.get("/screenshots/{screenshot_id}")
+async def screenshot_image(screenshot_id: str, request: Request):
+    '''Serve a stored screenshot, ids are content hashes so it can be cached forever'''
+    if not is_screenshot_id(screenshot_id):
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+
+    etag = f'"{screenshot_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    # the content behind an id never changes, no need to touch the database
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        screenshot = await get_screenshot(screenshot_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch screenshot: {str(e)}")
+    if screenshot is None:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+
+    data, content_type = screenshot
+    return Response(content=data, media_type=content_type, headers=headers)
+
+@app.get("/llm_cache_stats")
+async def llm_cache_stats():
+    '''Hit / miss counters of the caption relevancy cache shared by the scrapers on this machine'''
+    try:
+        stats = RelevancyCache().node_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read cache stats: {str(e)}")
+
+    return {
+        "status": "success",
+        "stats": stats
+    }
+
+# ------- RE-CLASSIFICATION JOBS --------
+reclassify_jobs: dict[str, dict] = dict() # scraper_id -> stats of its last job
+
+async def run_reclassify_job(scraper_id: str):
+    stats = reclassify_jobs[scraper_id]
+    try:
+        await reclassify_campaign(scraper_id, stats)
+    except Exception as e:
+        stats["state"] = "failed"
+        stats["error"] = str(e)
+        print(f"Re-classification of {scraper_id} failed: {e}")
+
+@app.post("/reclassify/{scraper_id}")
+async def start_reclassify(scraper_id: str, background_tasks: BackgroundTasks):
+    '''Re-score the stored reels and bios of a campaign against its current text / keywords'''
+    if reclassify_jobs.get(scraper_id, dict()).get("state") in ("queued", "running"):
+        return {
+            "status": "failure",
+            "message": "re-classification already running"
+        }
+
+    reclassify_jobs[scraper_id] = {"state": "queued"}
+    background_tasks.add_task(run_reclassify_job, scraper_id)
+    return {
+        "status": "success",
+        "message": "re-classification started"
+    }
+
+@app.get("/reclassify/{scraper_id}")
+async def reclassify_status(scraper_id: str):
+    '''Progress of the last re-classification job of a campaign'''
+    if scraper_id not in reclassify_jobs:
+        raise HTTPException(status_code=404, detail="No re-classification job for this scraper")
+
+    return {
+        "status": "success",
+        "job": reclassify_jobs[scraper_id]
+    }
+
 class StatusUpdate(BaseModel):
     status: str
     notes: str
@@ -407,7 +505,7 @@ async def generate_prompt(prompt: Prompt):
     print("usable_account = ", usable_account)
 
     user_text = prompt.text
-    response = await title_keywords_hashtags_instruction(llm_model, user_text)
+    response = await llm_backend.title_keywords_hashtags(user_text)
     print(response)
 
     document = await new_scraper(
@@ -428,6 +526,10 @@ async def generate_prompt(prompt: Prompt):
 def scraper_runner(scraper_id):
     import asyncio
     from reels_scroller.main import main as automation_controller
+    from server.database.connection import reset_client
+
+    # the forked child must not touch the parent's mongo pool, it builds its own on first use
+    reset_client()
     asyncio.run(automation_controller(scraper_id))
 
 async def start_scraper(scraper_id):
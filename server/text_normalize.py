@@ -0,0 +1,78 @@
+import re
+import unicodedata
+
+# CAPTION / BIO TEXT NORMALIZATION
+# promo captions dodge keyword checks with fullwidth / bold unicode letters, lookalike letters
+# from other scripts, leetspeak ("!D", "DEPOS!T"), emoji separators and glued hashtags.
+# normalize_text() folds all of that to plain lowercase words separated by single spaces,
+# so keyword matching, cache keys and dedupe see the same text for the same message.
+# the tables below are built once at import, normalizing is a handful of C-level passes.
+
+# lookalike letters of other scripts -> latin (NFKC already folds fullwidth / math bold / ligatures)
+CONFUSABLES = {
+    # cyrillic
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p", "с": "c",
+    "т": "t", "у": "y", "х": "x", "ѕ": "s", "і": "i", "ї": "i", "ј": "j", "ԁ": "d", "ԛ": "q", "ԝ": "w", "һ": "h",
+    "А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P", "С": "C", "Т": "T",
+    "У": "Y", "Х": "X", "Ѕ": "S", "І": "I", "Ј": "J",
+    # greek
+    "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t", "υ": "u",
+    "χ": "x", "Α": "A", "Β": "B", "Ε": "E", "Ζ": "Z", "Η": "H", "Ι": "I", "Κ": "K", "Μ": "M", "Ν": "N",
+    "Ο": "O", "Ρ": "P", "Τ": "T", "Υ": "Y", "Χ": "X",
+    # latin extensions / ipa
+    "ɑ": "a", "ɡ": "g", "ɩ": "i", "ı": "i", "ȷ": "j", "ʀ": "r", "ꜱ": "s", "ᴅ": "d", "ᴇ": "e", "ɪ": "i",
+    "ᴏ": "o", "ᴛ": "t", "ᴜ": "u", "ʙ": "b", "ᴄ": "c", "ɢ": "g", "ʜ": "h", "ᴋ": "k", "ʟ": "l", "ᴍ": "m",
+    "ɴ": "n", "ᴘ": "p", "ᴡ": "w", "ʏ": "y", "ᴢ": "z",
+    # emoji that stand for words in promo captions
+    "🆔": " ID ", "🅰": "A", "🅱": "B", "🅾": "O", "🅿": "P",
+}
+CONFUSABLES_TABLE = str.maketrans(CONFUSABLES)
+
+# leetspeak inside words (after casefold)
+LEET_TABLE = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s", "!": "i", "|": "i"})
+LEET_CHARS = frozenset("0134579@$!|")
+
+# emoji, pictographs, dingbats, arrows, variation selectors, zero width joiners / spaces, tags
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F000-\U0001FAFF"
+    "\U00002190-\U000021FF\U00002300-\U000023FF\U000025A0-\U000027BF\U00002900-\U0000297F\U00002B00-\U00002BFF"
+    "\U0000FE00-\U0000FE0F\U0000200B-\U0000200F\U00002060-\U00002064\U0000FEFF\U000020E3"
+    "\U000E0020-\U000E007F"
+    "]+"
+)
+HASHTAG_PATTERN = re.compile(r"#(\w+)")
+# digits stay glued to their word, they are usually part of a name ("dream11", "IPL2025")
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])|_")
+# a word with leetspeak in it: letters / leet characters, ending in a letter or digit ("now!" -> "now", "!")
+LEET_WORD_PATTERN = re.compile(r"[a-z0-9!@$|]*[a-z0-9]")
+# numbers with a unit / ordinal, also "24x7"
+ORDINAL_PATTERN = re.compile(r"\d+(?:st|nd|rd|th|x|k|m|cr|l|lakh|am|pm)\d*")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def split_hashtag(tag: str) -> str:
+    ''' "OnlineCricketBetting" -> "Online Cricket Betting" (case has to be intact) '''
+    return CAMEL_BOUNDARY.sub(" ", tag).strip()
+
+def _unleet_word(match: re.Match) -> str:
+    word = match.group(0)
+    if LEET_CHARS.isdisjoint(word) or not any(char.isalpha() for char in word) or ORDINAL_PATTERN.fullmatch(word):
+        return word
+    # trailing digits are part of names ("fun88", "bet365"), a run of symbols in front is punctuation ("!!!win")
+    core = word.rstrip("0123456789")
+    prefix = ""
+    if len(core) - len(core.lstrip("!@$|")) > 1:
+        prefix = core[:len(core) - len(core.lstrip("!@$|"))]
+        core = core[len(prefix):]
+    return prefix + core.translate(LEET_TABLE) + word[len(prefix) + len(core):]
+
+def normalize_text(text: str) -> str:
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.translate(CONFUSABLES_TABLE)
+    text = EMOJI_PATTERN.sub(" ", text)
+    text = HASHTAG_PATTERN.sub(lambda match: " " + split_hashtag(match.group(1)) + " ", text)
+    text = text.casefold()
+    text = LEET_WORD_PATTERN.sub(_unleet_word, text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
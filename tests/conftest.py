@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# the scraper modules import each other from server/ (and the database package as server.database)
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "server"))
+
+# no API calls and no shared sqlite files of a real node (read at import by the modules)
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("LLM_STUB_LATENCY", "0")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "llm_relevancy_cache.sqlite3"))
+os.environ.setdefault("LLM_GOVERNOR_PATH", os.path.join(tempfile.mkdtemp(), "llm_rate_governor.sqlite3"))
+
+class FakePage:
+    ''' the bits of a playwright page the router touches '''
+    def __init__(self):
+        self.listeners: dict[str, list] = dict()
+
+    def on(self, event: str, listener):
+        self.listeners.setdefault(event, []).append(listener)
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    ''' the shared client replaced by an in-memory mongomock one, returns the database '''
+    from mongomock_motor import AsyncMongoMockClient
+    from server.database import connection
+
+    from mongomock.collection import BulkOperationBuilder
+
+    # pymongo >= 4.11 passes sort= to the bulk builder, mongomock doesn't know it yet
+    for name in ("add_update", "add_replace"):
+        method = getattr(BulkOperationBuilder, name)
+        def without_sort(self, *args, _method=method, sort=None, **kwargs):
+            return _method(self, *args, **kwargs)
+        monkeypatch.setattr(BulkOperationBuilder, name, without_sort)
+
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(connection, "_client", client)
+    monkeypatch.setattr(connection, "_client_pid", os.getpid())
+    monkeypatch.setattr(connection, "DB_NAME", "test")
+    return client["test"]
+
+@pytest.fixture
+def automator(mock_db, tmp_path, monkeypatch):
+    ''' an automator without a browser: stub LLM, its own cache file, nothing loaded from earlier runs '''
+    from reels_scroller.Instargam_Automater import Instagram_Automator
+    from relevance_classifier import CampaignClassifier
+    from caption_signatures import CampaignSignatures
+    from llm_backends import StubBackend
+    from llm_cache import RelevancyCache
+
+    async def nothing_to_load(self):
+        return None
+    monkeypatch.setattr(CampaignClassifier, "load", nothing_to_load)
+    monkeypatch.setattr(CampaignSignatures, "load", nothing_to_load)
+
+    automator = Instagram_Automator(FakePage(), {
+        "id": "s1",
+        "text": "online betting ids and cricket betting apps",
+        "topic_attributes": ["betting", "satta"],
+        "hashtags": ["#onlinebetting"],
+    })
+    automator.llm_backend = StubBackend(latency=0.01)
+    automator.relevancy_cache = RelevancyCache(str(tmp_path / "cache.sqlite3"))
+    return automator
@@ -0,0 +1,35 @@
+import asyncio
+from server.database.ads import insert_ads_data, get_ads_data
+
+def feed_ad(code: str, like_count: int = 0, caption: str = "bet now") -> dict:
+    return {
+        "code": code, "link": f"https://example.com/{code}", "user": {"username": f"user_{code}"},
+        "caption": caption, "link_text": "Sign up", "like_count": like_count, "comment_count": 0,
+    }
+
+def test_ads_are_stored_once_per_scraper_and_code(mock_db):
+    async def run():
+        await insert_ads_data("s1", [feed_ad("a"), feed_ad("a"), feed_ad("b")])   # "a" twice in one response
+        await insert_ads_data("s1", [feed_ad("a", like_count=9, caption="edited")])
+        await insert_ads_data("s2", [feed_ad("a")])
+        return await mock_db["ads"].find({"scraper_id": "s1"}, {"_id": 0}).sort("code", 1).to_list(None)
+    ad_a, ad_b = asyncio.run(run())
+    assert ad_a["times_seen"] == 2
+    assert ad_b["times_seen"] == 1
+    assert ad_a["like_count"] == 9              # counters follow the latest sighting
+    assert ad_a["caption"] == "bet now"         # the first sighting's content is kept
+    assert ad_a["first_seen"] <= ad_a["last_seen"]
+
+def test_empty_response_writes_nothing(mock_db):
+    async def run():
+        result = await insert_ads_data("s1", [])
+        return result, await mock_db["ads"].count_documents({})
+    assert asyncio.run(run()) == (True, 0)
+
+def test_listing_reports_times_seen(mock_db):
+    async def run():
+        await insert_ads_data("s1", [feed_ad("a")])
+        await insert_ads_data("s1", [feed_ad("a")])
+        return await get_ads_data("s1")
+    ads = asyncio.run(run())
+    assert [(ad["code"], ad["times_seen"]) for ad in ads] == [("a", 2)]
@@ -0,0 +1,39 @@
+from caption_prefilter import CaptionPrefilter
+
+KEYWORDS = ["fantasy sports", "betting", "dream11"]
+
+def test_campaign_terms_and_promo_accept():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    assert prefilter.verdict("Online BETTING id, instant deposit and 100% bonus, msg now") is True
+
+def test_promo_alone_is_not_accepted():
+    # a competitor's "deposit bonus" reel has no campaign term, the LLM decides
+    prefilter = CaptionPrefilter(KEYWORDS)
+    caption = "100% bonus on 1st deposit, instant withdrawal, msg now"
+    assert prefilter.score(caption) >= prefilter.accept_at
+    assert prefilter.verdict(caption) is None
+
+def test_no_literal_match_goes_to_llm_by_default():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    assert prefilter.verdict("my cat sleeping in the sun") is None
+    assert prefilter.stats()["rejected"] == 0
+
+def test_rejecting_can_be_turned_on():
+    prefilter = CaptionPrefilter(KEYWORDS, reject_at=0)
+    assert prefilter.verdict("my cat sleeping in the sun") is False
+
+def test_spelling_tricks_still_match():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    assert prefilter.hits("𝐁𝐞𝐭𝐭𝐢𝐧𝐠 tips, JOIN AND GET FREE !D NO DEPOS!T") == (1, 2)
+
+def test_phrase_keyword_counts_once_and_needs_whole_phrase():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    assert prefilter.hits("fantasy sports and more fantasy sports")[0] == 1
+    assert prefilter.hits("watching sports tonight")[0] == 0
+
+def test_stats_count_every_verdict():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    for caption in ["betting id deposit bonus", "hello world", "dream11 team"]:
+        prefilter.verdict(caption)
+    stats = prefilter.stats()
+    assert stats["accepted"] + stats["rejected"] + stats["sent_to_llm"] == 3
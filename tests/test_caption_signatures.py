@@ -0,0 +1,66 @@
+import asyncio
+import caption_signatures
+from caption_signatures import MinHashIndex, CampaignSignatures, minhash, equal_values, NUM_HASHES
+
+PROMO = "JOIN AND GET FREE ID NO DEPOSIT bonus on your first deposit, message now for your online satta id"
+
+def test_signature_is_stable_and_ignores_spelling_tricks():
+    assert minhash(PROMO) == minhash(PROMO)
+    assert minhash("JOIN AND GET FREE !D NO DEPOS!T bonus on your first deposit, message now for your online satta id") == minhash(PROMO)
+
+def test_short_captions_are_not_signed():
+    assert minhash("bet now") is None
+
+def test_similar_captions_share_more_values_than_unrelated_ones():
+    similar = minhash(PROMO.replace("message now", "dm us"))
+    unrelated = minhash("Sunday morning run with the crew, 10k done, feeling great about the week")
+    assert equal_values(minhash(PROMO), minhash(PROMO)) == NUM_HASHES
+    assert equal_values(minhash(PROMO), similar) > equal_values(minhash(PROMO), unrelated)
+
+def test_index_finds_exact_and_respects_threshold():
+    index = MinHashIndex(min_equal=10)
+    signature = minhash(PROMO)
+    index.add(signature, "c1", True)
+    assert index.nearest(signature)[1] == "c1"
+    assert index.nearest(minhash("Made my grandma's biryani recipe today, turned out amazing")) is None
+    edited = minhash(PROMO.replace("satta", "cricket"))
+    equal = equal_values(signature, edited)
+    assert equal < NUM_HASHES
+    assert index.nearest(edited)[1] == "c1"
+    assert index.nearest(edited, min_equal=equal + 1) is None
+
+def test_judged_only_skips_unjudged_entries():
+    index = MinHashIndex()
+    signature = minhash(PROMO)
+    index.add(signature, "c1")
+    assert index.nearest(signature, judged_only=True) is None
+    index.add(signature, "c1", False)   # judging an entry later keeps its cluster
+    assert len(index) == 1
+    assert index.nearest(signature, judged_only=True)[2] is False
+
+def test_verdict_reuse_is_stricter_than_clustering():
+    signatures = CampaignSignatures("k")
+    signatures.record(PROMO, True)
+    edited = PROMO.replace("message now", "dm us")
+    equal = equal_values(minhash(PROMO), minhash(edited))
+    assert caption_signatures.MIN_EQUAL <= equal < caption_signatures.MIN_EQUAL_VERDICT
+    assert signatures.judged_verdict(edited) is None
+    assert signatures.record(edited)["cluster_id"] == signatures.record(PROMO)["cluster_id"]
+    assert signatures.judged_verdict(PROMO) is True
+
+def test_load_reads_in_chunks_up_to_the_cap(monkeypatch):
+    docs = [{"_id": i, "signature": i.to_bytes(4, "little") * NUM_HASHES, "cluster_id": f"c{i}", "verdict": None} for i in range(25, 0, -1)]
+    calls = []
+
+    async def fake_chunk(campaign_key, before, limit):
+        calls.append((before, limit))
+        older = [doc for doc in docs if before is None or doc["_id"] < before]
+        return older[:limit]
+
+    monkeypatch.setattr(caption_signatures, "get_caption_signatures_chunk", fake_chunk)
+    monkeypatch.setattr(caption_signatures, "LOAD_CHUNK_SIZE", 10)
+    monkeypatch.setattr(caption_signatures, "MAX_LOADED_SIGNATURES", 22)
+    signatures = CampaignSignatures("k")
+    asyncio.run(signatures.load())
+    assert calls == [(None, 10), (16, 10), (6, 2)]
+    assert len(signatures.index) == 22
@@ -0,0 +1,60 @@
+import os
+import pytest
+from server.database import connection
+
+class FakeClient:
+    ''' records how the pool was configured, no connection is made '''
+    def __init__(self, uri, **options):
+        self.uri = uri
+        self.options = options
+        self.closed = False
+
+    def __getitem__(self, name):
+        return (self, name)
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(connection, "AsyncIOMotorClient", FakeClient)
+    monkeypatch.setattr(connection, "_client", None)
+    monkeypatch.setattr(connection, "_client_pid", None)
+    monkeypatch.setattr(connection, "DB_NAME", "test")
+
+def test_one_pooled_client_per_process(fake_client):
+    client = connection.get_client()
+    assert connection.get_client() is client
+    assert connection.get_db() == (client, "test")
+    assert client.options["maxPoolSize"] == connection.MONGO_MAX_POOL_SIZE
+    assert client.options["serverSelectionTimeoutMS"] == connection.MONGO_SERVER_SELECTION_TIMEOUT_MS
+
+def test_client_inherited_through_fork_is_replaced(fake_client, monkeypatch):
+    parent_client = connection.get_client()
+    monkeypatch.setattr(connection, "_client_pid", os.getpid() + 1)  # created by the parent process
+    child_client = connection.get_client()
+    assert child_client is not parent_client
+    assert not parent_client.closed     # its sockets belong to the parent
+    assert connection._client_pid == os.getpid()
+
+def test_close_client_only_closes_a_pool_of_this_process(fake_client, monkeypatch):
+    inherited = connection.get_client()
+    monkeypatch.setattr(connection, "_client_pid", os.getpid() + 1)
+    connection.close_client()
+    assert not inherited.closed
+    assert connection._client is None
+
+    own = connection.get_client()
+    connection.close_client()
+    assert own.closed
+
+def test_reset_client_drops_the_reference(fake_client):
+    client = connection.get_client()
+    connection.reset_client()
+    assert connection.get_client() is not client
+    assert not client.closed
+
+@pytest.mark.parametrize("setting, expected", [("1", 1), ("0", 0), ("majority", "majority")])
+def test_write_concern_setting(monkeypatch, setting, expected):
+    monkeypatch.setattr(connection, "MONGO_WRITE_CONCERN_W", setting)
+    assert connection._write_concern_w() == expected
@@ -0,0 +1,32 @@
+import asyncio
+from bson.objectid import ObjectId
+from py_scripts.dedupe_unique_keys import dedupe_collection, UNIQUE_KEYS
+from server.database.scrapers import create_freq_stats, increment_freq_stats, get_freq_stats
+
+def test_keyword_stats_duplicates_are_merged(mock_db):
+    async def run():
+        older, newer = ObjectId(), ObjectId()
+        await mock_db["keywords_stats"].insert_many([
+            {"_id": older, "scraper_id": "s1", "freq": {"ids": 2, "satta": 1}, "priority": {"ids": 5}},
+            {"_id": newer, "scraper_id": "s1", "freq": {"ids": 3, "betting": 4}, "priority": {"ids": 1, "betting": 2}},
+            {"scraper_id": "s2", "freq": {"ids": 7}, "priority": dict()},
+        ])
+        removed = await dedupe_collection("keywords_stats", UNIQUE_KEYS["keywords_stats"])
+        return removed, older, await mock_db["keywords_stats"].find({"scraper_id": "s1"}).to_list(None)
+    removed, older, docs = asyncio.run(run())
+    assert removed == 1
+    assert [doc["_id"] for doc in docs] == [older]
+    assert docs[0]["freq"] == {"ids": 5, "satta": 1, "betting": 4}
+    assert docs[0]["priority"] == {"ids": 5, "betting": 2}
+
+def test_seeding_stats_keeps_counts_written_first(mock_db):
+    async def run():
+        # the scroller counted before main seeded the document
+        await increment_freq_stats("s1", {"ids": 3})
+        await create_freq_stats({"scraper_id": "s1", "freq": {"ids": 0, "satta": 0}, "priority": {"ids": 0, "satta": 0}})
+        await create_freq_stats({"scraper_id": "s1", "freq": {"ids": 0}, "priority": {"ids": 0}})
+        return await get_freq_stats("s1"), await mock_db["keywords_stats"].count_documents({})
+    stats, count = asyncio.run(run())
+    assert count == 1
+    assert stats["freq"] == {"ids": 3, "satta": 0}
+    assert stats["priority"] == {"ids": 0, "satta": 0}
@@ -0,0 +1,62 @@
+import asyncio
+import msgspec
+from reels_scroller.latency import LatencyStats
+from reels_scroller.records import UserInfo
+
+def user_info(username: str, biography: str = "ids on whatsapp") -> UserInfo:
+    return msgspec.convert({"username": username, "biography": biography, "bio_links": [{"url": "https://bet.example"}]}, type=UserInfo)
+
+def test_bio_waiter_is_woken_by_the_user_info_handler(automator):
+    async def run():
+        waiter = asyncio.ensure_future(automator.wait_for_bio("alice", timeout=5))
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await automator.handle_user_info(user_info("alice"))
+        return await waiter, loop.time() - start
+    bio, waited = asyncio.run(run())
+    assert bio == {"username": "alice", "links": ["https://bet.example"], "text": "ids on whatsapp"}
+    assert waited < 0.5   # no polling interval
+    assert automator.bio_futures == {}
+
+def test_bio_that_already_came_returns_at_once(automator):
+    async def run():
+        await automator.handle_user_info(user_info("alice"))    # nobody waiting yet
+        return await automator.wait_for_bio("alice", timeout=0)
+    assert asyncio.run(run())["username"] == "alice"
+
+def test_bio_wait_times_out_with_none(automator):
+    async def run():
+        missing = await automator.wait_for_bio("bob", timeout=0.05)
+        await automator.handle_user_info(user_info("bob"))      # late data is still kept
+        return missing
+    assert asyncio.run(run()) is None
+    assert automator.bio_futures == {}
+    assert automator.bio_data["bob"]["username"] == "bob"
+
+def test_feed_timeline_with_ads_sets_the_event(automator):
+    ad = {
+        "code": "A1", "link": "https://bet.example/ad", "user": {"username": "bookie"}, "caption": "bet now",
+        "link_text": "Sign up", "like_count": 1, "comment_count": 0,
+    }
+    async def run():
+        ads_data, ads_loaded = dict(), asyncio.Event()
+        await automator.handle_feed_timeline(ads_data, ads_loaded, {"edges": [{"node": {"media": {"code": "P1"}}}]})
+        without_ads = ads_loaded.is_set()
+        await automator.handle_feed_timeline(ads_data, ads_loaded, {"edges": [{"node": {"ad": {"items": [ad]}}}]})
+        return without_ads, ads_loaded.is_set(), ads_data
+    without_ads, with_ads, ads_data = asyncio.run(run())
+    assert (without_ads, with_ads) == (False, True)
+    assert ads_data == {"https://bet.example/ad": ad}
+    assert automator.persisted_ad_codes == {"A1"}
+
+def test_latency_stats():
+    stats = LatencyStats(max_samples=3)
+    assert stats.stats() == {"count": 0, "timeouts": 0}
+    for seconds in (5.0, 0.1, 0.2, 0.3):
+        stats.add(seconds)
+    stats.add(2.0, timed_out=True)
+    summary = stats.stats()
+    assert (summary["count"], summary["timeouts"]) == (3, 1)   # oldest samples dropped
+    assert summary["p50_ms"] == 300.0
+    assert summary["max_ms"] == 2000.0
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from mongomock.collection import Collection
+from server.database import accounts, ads, content, links, profiles, scrapers, targeted_apps, screenshots, relevancy_labels, caption_signatures
+from server.database.index_check import QUERY_SHAPES, SAMPLE_ID, SAMPLE_OBJECT_ID
+
+CAMPAIGN_KEY = "0" * 64
+
+# how index_check's sample query of every function is produced by the function itself
+CALLS = {
+    "accounts.get_account_by_scraper_id": lambda: accounts.get_account_by_scraper_id(SAMPLE_ID),
+    "accounts.get_unassigned_account": lambda: accounts.get_unassigned_account(),
+    "accounts.save_new_auth": lambda: accounts.save_new_auth({}, SAMPLE_ID),
+    "accounts.assign_scraper_to_account": lambda: accounts.assign_scraper_to_account(SAMPLE_ID, SAMPLE_ID),
+    "ads.insert_ads_data": lambda: ads.insert_ads_data(SAMPLE_ID, [{
+        "code": "sample", "link": "", "user": {"username": "sample"}, "caption": "", "link_text": "", "like_count": 0, "comment_count": 0,
+    }]),
+    "ads.update_ad_data": lambda: ads.update_ad_data(SAMPLE_ID, {"suspicious": True}),
+    "ads.get_ads_data": lambda: ads.get_ads_data(SAMPLE_ID),
+    "ads.get_ads_page": lambda: ads.get_ads_page(SAMPLE_ID, after=SAMPLE_ID),
+    "ads.get_all_non_filtered_ads": lambda: ads.get_all_non_filtered_ads(SAMPLE_ID),
+    "content.get_reels_data": lambda: content.get_reels_data(SAMPLE_ID),
+    "content.get_reels_page": lambda: content.get_reels_page(SAMPLE_ID, after=SAMPLE_ID),
+    "content.get_captions_chunk": lambda: content.get_captions_chunk(SAMPLE_ID, after=SAMPLE_OBJECT_ID),
+    "content.set_reels_relevancy": lambda: content.set_reels_relevancy({SAMPLE_OBJECT_ID: True}),
+    "links.get_links_data": lambda: links.get_links_data(SAMPLE_ID),
+    "links.get_links_page": lambda: links.get_links_page(SAMPLE_ID, after=SAMPLE_ID),
+    "links.get_link_data": lambda: links.get_link_data(SAMPLE_ID),
+    "links.get_all_links_with_campaign_page": lambda: links.get_all_links_with_campaign_page(after=SAMPLE_ID),
+    "links.get_links_to_check": lambda: links.get_links_to_check(SAMPLE_ID),
+    "links.update_link_state": lambda: links.update_link_state(SAMPLE_ID, {"state": ""}),
+    "links.update_link_data": lambda: links.update_link_data(SAMPLE_ID, {"state": ""}),
+    "profiles.add_profile": lambda: profiles.add_profile(SAMPLE_ID, "sample"),
+    "profiles.add_profiles": lambda: profiles.add_profiles(SAMPLE_ID, ["sample"]),
+    "profiles.get_profile_data": lambda: profiles.get_profile_data("sample"),
+    "profiles.get_profiles_data_by_usernames": lambda: profiles.get_profiles_data_by_usernames(["sample", "other"]),
+    "profiles.get_profiles_data": lambda: profiles.get_profiles_data(SAMPLE_ID),
+    "profiles.get_profiles_page": lambda: profiles.get_profiles_page(SAMPLE_ID, after=SAMPLE_ID),
+    "profiles.get_profiles_page(sort=username)": lambda: profiles.get_profiles_page(SAMPLE_ID, after=SAMPLE_ID, sort="username"),
+    "profiles.get_bios_chunk": lambda: profiles.get_bios_chunk(SAMPLE_ID, after=SAMPLE_OBJECT_ID),
+    "profiles.set_bios_relevancy": lambda: profiles.set_bios_relevancy({SAMPLE_OBJECT_ID: True}),
+    "profiles.get_unscraped_profiles": lambda: profiles.get_unscraped_profiles(SAMPLE_ID),
+    "profiles.profiles_with_links": lambda: profiles.profiles_with_links(SAMPLE_ID),
+    "profiles.update_profile": lambda: profiles.update_profile(SAMPLE_ID, "sample", {"text": "", "links": []}),
+    "profiles.update_profile_data": lambda: profiles.update_profile_data("sample", {"bio": ""}),
+    "scrapers.get_scraper_name": lambda: scrapers.get_scraper_name(SAMPLE_ID),
+    "scrapers.get_scraper_names": lambda: scrapers.get_scraper_names([SAMPLE_ID]),
+    "scrapers.get_scrapers_page": lambda: scrapers.get_scrapers_page(after=SAMPLE_ID),
+    "scrapers.get_scrapers_page(sort=scraper_name)": lambda: scrapers.get_scrapers_page(after=SAMPLE_ID, sort="scraper_name"),
+    "scrapers.get_scraper_data_by_id": lambda: scrapers.get_scraper_data_by_id(SAMPLE_ID),
+    "scrapers.get_scraper_state": lambda: scrapers.get_scraper_state(SAMPLE_ID),
+    "scrapers.scraper_check_suspended": lambda: scrapers.scraper_check_suspended(SAMPLE_ID),
+    "scrapers.set_scraper_activity": lambda: scrapers.set_scraper_activity(SAMPLE_ID, True),
+    "scrapers.update_scraper_data": lambda: scrapers.update_scraper_data(SAMPLE_ID, {"state": "running"}),
+    "scrapers.update_activity": lambda: scrapers.update_activity(SAMPLE_ID, True),
+    "scrapers.create_freq_stats": lambda: scrapers.create_freq_stats({"scraper_id": SAMPLE_ID, "freq": {"a": 0}, "priority": {"a": 0}}),
+    "scrapers.get_freq_stats": lambda: scrapers.get_freq_stats(SAMPLE_ID),
+    "scrapers.update_freq_stats": lambda: scrapers.update_freq_stats(SAMPLE_ID, {"a": 1}),
+    "scrapers.increment_freq_stats": lambda: scrapers.increment_freq_stats(SAMPLE_ID, {"a": 1}),
+    "targeted_apps.get_targeted_apps": lambda: targeted_apps.get_targeted_apps(SAMPLE_ID),
+    "targeted_apps.get_targeted_app": lambda: targeted_apps.get_targeted_app(SAMPLE_ID),
+    "targeted_apps.get_targeted_app_profiles": lambda: targeted_apps.get_targeted_app_profiles(SAMPLE_ID),
+    "screenshots.save_screenshot": lambda: screenshots.save_screenshot(b"sample"),
+    "screenshots.get_screenshot": lambda: screenshots.get_screenshot(CAMPAIGN_KEY),
+    "relevancy_labels.get_relevancy_labels": lambda: relevancy_labels.get_relevancy_labels(CAMPAIGN_KEY),
+    "caption_signatures.upsert_caption_signatures": lambda: caption_signatures.upsert_caption_signatures(
+        CAMPAIGN_KEY, [{"signature": b"\0" * 64, "cluster_id": "sample", "verdict": True}]
+    ),
+    "caption_signatures.get_caption_signatures_chunk": lambda: caption_signatures.get_caption_signatures_chunk(CAMPAIGN_KEY, before=SAMPLE_OBJECT_ID),
+}
+
+def shape(query):
+    ''' fields and operators of a filter, the values don't matter for the plan '''
+    if isinstance(query, dict):
+        return {key: shape(value) for key, value in query.items()}
+    if isinstance(query, list) and all(isinstance(item, dict) for item in query):
+        return [shape(item) for item in query]
+    return "?"
+
+@pytest.fixture
+def recorded_filters(mock_db, monkeypatch):
+    ''' (collection, filter) of every query the data-access functions send '''
+    recorded = []
+
+    def recording(name, filter_of):
+        method = getattr(Collection, name)
+        def wrapper(self, *args, **kwargs):
+            recorded.extend((self.name, query) for query in filter_of(*args, **kwargs))
+            return method(self, *args, **kwargs)
+        monkeypatch.setattr(Collection, name, wrapper)
+
+    def first_argument(query=None, *args, **kwargs):
+        return [query if query is not None else kwargs.get("filter", dict())]
+
+    for name in ("find", "find_one", "find_one_and_update", "update_one", "update_many"):
+        recording(name, first_argument)
+    recording("bulk_write", lambda operations, *args, **kwargs: [operation._filter for operation in operations if hasattr(operation, "_filter")])
+    recording("aggregate", lambda pipeline, *args, **kwargs: [stage["$match"] for stage in pipeline[:1] if "$match" in stage])
+
+    # anchors of the pages sorted by another field than _id
+    async def seed():
+        await mock_db["scrape_profiles"].insert_one({"_id": SAMPLE_OBJECT_ID, "scraper_id": SAMPLE_ID, "username": "sample", "scraped": True})
+        await mock_db["scrapers"].insert_one({"_id": SAMPLE_OBJECT_ID, "scraper_name": "sample"})
+    asyncio.run(seed())
+    recorded.clear()
+    return recorded
+
+def test_every_query_shape_has_a_call():
+    assert sorted(CALLS) == sorted(function_name for function_name, _, _ in QUERY_SHAPES)
+
+@pytest.mark.parametrize("function_name, collection_name, query", QUERY_SHAPES, ids=[shape_[0] for shape_ in QUERY_SHAPES])
+def test_query_shape_matches_the_function(recorded_filters, function_name, collection_name, query):
+    async def run():
+        try:
+            await CALLS[function_name]()
+        except Exception:
+            pass    # empty test database, only the query that was sent matters
+    asyncio.run(run())
+    sent = [shape(sent_query) for name, sent_query in recorded_filters if name == collection_name]
+    assert shape(query) in sent, f"{function_name} sends {sent} to {collection_name}"
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from mongomock.aggregate import _Parser
+from server.database.links import get_all_links_with_campaign_page
+
+@pytest.fixture
+def convert_to_object_id(monkeypatch):
+    ''' the {"$convert": {"to": "objectId"}} the links page uses, mongomock doesn't implement $convert '''
+    handle = _Parser._handle_type_convertion_operator
+
+    def with_convert(self, operator, values):
+        if operator != "$convert":
+            return handle(self, operator, values)
+        assert values["to"] == "objectId"
+        value = self.parse(values["input"])
+        if value is None:
+            return values.get("onNull")
+        try:
+            return ObjectId(value)
+        except (InvalidId, TypeError):
+            return values.get("onError")
+    monkeypatch.setattr(_Parser, "_handle_type_convertion_operator", with_convert)
+
+def link_doc(i: int, scraper_id: str) -> dict:
+    return {"link": f"https://example.com/{i}", "profiles": [f"user_{i}"], "suspicious": "", "state": "", "manual_check_result": "", "scraper_id": scraper_id}
+
+def test_links_page_joins_the_campaign_name(mock_db, convert_to_object_id):
+    async def run():
+        scraper_id, deleted_id = ObjectId(), ObjectId()
+        await mock_db["scrapers"].insert_one({"_id": scraper_id, "scraper_name": "IPL betting"})
+        await mock_db["links"].insert_many([link_doc(0, str(scraper_id)), link_doc(1, "not an id"), link_doc(2, str(deleted_id))])
+        return scraper_id, deleted_id, await get_all_links_with_campaign_page()
+    scraper_id, deleted_id, page = asyncio.run(run())
+    assert page["next_after"] is None
+    assert [(link["campaign_id"], link["campaign_name"]) for link in page["items"]] == [
+        (str(scraper_id), "IPL betting"),
+        ("not an id", ""),              # ids that don't convert don't fail the page
+        (str(deleted_id), ""),          # campaign deleted since
+    ]
+    assert "screenshot" not in page["items"][0]
+    assert page["items"][0]["profiles"] == ["user_0"]
+
+def test_links_page_walks_all_links_once(mock_db, convert_to_object_id):
+    async def run():
+        await mock_db["links"].insert_many([link_doc(i, "s1") for i in range(7)])
+        links, after = [], None
+        while True:
+            page = await get_all_links_with_campaign_page(after, limit=3)
+            links.extend(link["link"] for link in page["items"])
+            after = page["next_after"]
+            if after is None:
+                return links
+    assert asyncio.run(run()) == [f"https://example.com/{i}" for i in range(7)]
+
+def test_links_page_rejects_bad_arguments(mock_db):
+    with pytest.raises(ValueError):
+        asyncio.run(get_all_links_with_campaign_page(after="nope"))
+    with pytest.raises(ValueError):
+        asyncio.run(get_all_links_with_campaign_page(limit=0))
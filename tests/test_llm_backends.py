@@ -0,0 +1,49 @@
+import json
+import asyncio
+import pytest
+import llm_backends
+from llm_backends import StubBackend, get_llm_backend
+
+KEYWORDS = ["betting", "satta"]
+PROMO = "Instant deposit and withdrawal, get your betting id now"
+OFF_TOPIC = "sunday run with the crew, 10k done"
+
+def test_stub_is_deterministic_and_rule_based():
+    async def run():
+        backend = StubBackend(latency=0)
+        single = [await backend.relevancy_check(caption, "betting ads", KEYWORDS) for caption in (PROMO, OFF_TOPIC)]
+        batch = await backend.relevancy_check_batch([PROMO, OFF_TOPIC], "betting ads", KEYWORDS)
+        again = await StubBackend(latency=0).relevancy_check_batch([PROMO, OFF_TOPIC], "betting ads", KEYWORDS)
+        return backend, single, batch, again
+    backend, single, batch, again = asyncio.run(run())
+    assert single == batch == again == [True, False]
+    assert backend.stats() == {"calls": 3}  # a batch is one call
+
+def test_fixtures_override_the_rules(tmp_path):
+    fixtures = tmp_path / "fixtures.json"
+    fixtures.write_text(json.dumps({"SUNDAY RUN with the crew, 10k done": True}), encoding="utf-8")
+    async def run():
+        backend = StubBackend(latency=0, fixtures_path=str(fixtures))
+        return await backend.relevancy_check_batch([OFF_TOPIC, PROMO], "betting ads", KEYWORDS)
+    assert asyncio.run(run()) == [True, True]
+
+def test_stub_latency_is_per_call():
+    async def run():
+        backend = StubBackend(latency=0.05)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*[backend.relevancy_check(PROMO, "", KEYWORDS) for _ in range(5)])
+        return loop.time() - start
+    assert asyncio.run(run()) < 0.2  # concurrent calls wait side by side, like network calls
+
+def test_stub_campaign_suggestion():
+    suggestion = asyncio.run(StubBackend(latency=0).title_keywords_hashtags("Online cricket betting apps and satta ids."))
+    assert suggestion["keywords"] == ["online", "cricket", "betting", "apps", "satta"]
+    assert suggestion["hashtags"][0] == "#online"
+
+def test_backend_is_picked_by_env(monkeypatch):
+    monkeypatch.setattr(llm_backends, "LLM_BACKEND", "stub")
+    assert isinstance(get_llm_backend("gemini-2.0-flash"), StubBackend)
+    monkeypatch.setattr(llm_backends, "LLM_BACKEND", "nope")
+    with pytest.raises(ValueError):
+        get_llm_backend("gemini-2.0-flash")
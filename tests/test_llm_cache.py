@@ -0,0 +1,67 @@
+import time
+import sqlite3
+from llm_cache import RelevancyCache, relevancy_cache_key
+
+KEYWORDS = ["betting", "satta"]
+
+def test_key_ignores_caption_styling_and_keyword_order():
+    assert relevancy_cache_key("NO DEPOS!T", "betting ads", KEYWORDS) == relevancy_cache_key("no deposit", "betting ads ", ["Satta", "betting"])
+    assert relevancy_cache_key("no deposit", "betting ads", KEYWORDS) != relevancy_cache_key("no deposit", "fantasy apps", KEYWORDS)
+
+def test_verdicts_are_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    scraper_a, scraper_b = RelevancyCache(path), RelevancyCache(path)
+    key = relevancy_cache_key("instant withdrawal id", "betting ads", KEYWORDS)
+
+    assert scraper_b.get(key) is None
+    scraper_a.put(key, True)
+    assert scraper_b.get(key) is True
+    assert scraper_b.stats()["hits"] == 1 and scraper_b.stats()["misses"] == 1
+
+def test_expired_verdicts_are_misses(tmp_path):
+    cache = RelevancyCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.put("old", False)
+    cache._connection().execute("UPDATE relevancy_cache SET created_at = ?", (time.time() - 120,))
+    assert cache.get("old") is None
+
+def test_eviction_keeps_the_recently_hit_entries(tmp_path):
+    cache = RelevancyCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    for age, key in enumerate(["hit recently", "stale", "newest"]):
+        cache.put(key, True)
+        cache._connection().execute("UPDATE relevancy_cache SET last_hit = ? WHERE key = ?", (time.time() - 100 + age, key))
+    cache._connection().execute("UPDATE relevancy_cache SET last_hit = ? WHERE key = ?", (time.time(), "hit recently"))
+    cache.evict()
+    assert (cache.get("hit recently"), cache.get("stale"), cache.get("newest")) == (True, None, True)
+
+def test_counters_add_up_across_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    scraper_a, scraper_b = RelevancyCache(path), RelevancyCache(path)
+    scraper_a.put("k", True)
+    scraper_a.get("k")
+    scraper_b.get("k")
+    scraper_b.get("unknown")
+    scraper_a.flush_counters()
+    scraper_b.flush_counters()
+    scraper_b.flush_counters()  # nothing new, nothing counted twice
+    stats = RelevancyCache(path).node_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+
+def test_locked_cache_is_a_miss_not_an_error(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = RelevancyCache(path)
+    cache.put("k", True)
+    cache.get("unknown")
+
+    other_process = sqlite3.connect(path, isolation_level=None)
+    other_process.execute("BEGIN EXCLUSIVE")
+    try:
+        cache.put("k2", True)       # not cached, the scraper goes on
+        cache.flush_counters()      # the miss is kept for the next flush
+    finally:
+        other_process.execute("ROLLBACK")
+        other_process.close()
+    assert cache.lock_misses == 1
+    assert cache.node_stats()["misses"] == 0
+    cache.flush_counters()
+    assert cache.node_stats()["misses"] == 1
+    assert cache.get("k2") is None
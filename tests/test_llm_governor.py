@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+import llm_governor
+from llm_governor import TokenBucket, GovernedModel, PRIORITY_CAPTION, PRIORITY_BACKGROUND, is_rate_limit_error
+
+class FakeModel:
+    ''' generate_content_async that can fail with quota errors first '''
+    model_name = "fake-model"
+
+    def __init__(self, failures: list[Exception] = None, latency: float = 0.01):
+        self.failures = list(failures or [])
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            raise self.failures.pop(0)
+        return f"answer to {contents}"
+
+def test_bucket_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "governor.sqlite3")
+    scraper_a = TokenBucket(path, rate_per_minute=6, burst=2, reserve=0)
+    scraper_b = TokenBucket(path, rate_per_minute=6, burst=2, reserve=0)
+    assert scraper_a.try_acquire() == 0
+    assert scraper_b.try_acquire() == 0
+    wait = scraper_a.try_acquire()
+    assert 9 < wait <= 10  # one token per 10 seconds
+
+def test_lower_priority_leaves_a_reserve(tmp_path):
+    bucket = TokenBucket(str(tmp_path / "governor.sqlite3"), rate_per_minute=6, burst=5, reserve=2)
+    # background (priority 2) keeps 4 tokens for the scrapers
+    assert bucket.try_acquire(PRIORITY_BACKGROUND) == 0
+    assert bucket.try_acquire(PRIORITY_BACKGROUND) > 0
+    assert all(bucket.try_acquire(PRIORITY_CAPTION) == 0 for _ in range(4))
+
+def test_block_pauses_every_process(tmp_path):
+    path = str(tmp_path / "governor.sqlite3")
+    TokenBucket(path).block(30)
+    assert 29 < TokenBucket(path).try_acquire() <= 30
+
+def test_identical_prompts_in_flight_are_sent_once(tmp_path):
+    async def run():
+        model = FakeModel()
+        governed = GovernedModel(model, bucket=TokenBucket(str(tmp_path / "governor.sqlite3")))
+        background = governed.with_priority(PRIORITY_BACKGROUND)   # shares the in-flight prompts
+        answers = await asyncio.gather(
+            governed.generate_content_async(["is this betting?"]),
+            background.generate_content_async(["is this betting?"]),
+            governed.generate_content_async(["something else"]),
+        )
+        return model, governed, background, answers
+    model, governed, background, answers = asyncio.run(run())
+    assert answers[0] == answers[1]
+    assert model.calls == 2
+    assert (governed.coalesced, background.coalesced) == (0, 1)
+    assert governed.inflight == {}
+
+def test_rate_limited_call_backs_off_and_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_governor, "LLM_BACKOFF_BASE", 0.01)
+    async def run():
+        model = FakeModel(failures=[Exception("429 Resource has been exhausted (e.g. check quota).")])
+        # the backoff empties the bucket, a fast one refills right away
+        governed = GovernedModel(model, bucket=TokenBucket(str(tmp_path / "governor.sqlite3"), rate_per_minute=6000))
+        return model, governed, await governed.generate_content_async(["prompt"])
+    model, governed, answer = asyncio.run(run())
+    assert answer == "answer to ['prompt']"
+    assert model.calls == 2
+    assert governed.rate_limited == 1
+
+def test_other_errors_are_not_retried(tmp_path):
+    async def run():
+        model = FakeModel(failures=[ValueError("bad request")])
+        governed = GovernedModel(model, bucket=TokenBucket(str(tmp_path / "governor.sqlite3")))
+        with pytest.raises(ValueError):
+            await governed.generate_content_async(["prompt"])
+        return model
+    assert asyncio.run(run()).calls == 1
+
+def test_rate_limit_errors_are_recognized():
+    assert is_rate_limit_error(Exception("429 Too Many Requests"))
+    assert is_rate_limit_error(Exception("Quota exceeded for requests per minute"))
+    assert not is_rate_limit_error(Exception("500 internal error"))
@@ -0,0 +1,58 @@
+import asyncio
+from bson.objectid import ObjectId
+from server.database.loaders import BatchLoader, RequestLoaders
+
+class RecordingBatch:
+    ''' batch function that remembers the batches it was called with '''
+    def __init__(self, fail: bool = False):
+        self.batches: list[list] = []
+        self.fail = fail
+
+    async def __call__(self, keys: list) -> dict:
+        self.batches.append(list(keys))
+        if self.fail:
+            raise RuntimeError("database down")
+        return {key: key.upper() for key in keys if key != "missing"}
+
+def test_loads_of_one_tick_share_one_batch():
+    async def run():
+        batch = RecordingBatch()
+        loader = BatchLoader(batch)
+        values = await asyncio.gather(loader.load("a"), loader.load_many(["b", "a", "missing"]), loader.load("c"))
+        return values, batch.batches
+    values, batches = asyncio.run(run())
+    assert values == ["A", ["B", "A", None], "C"]
+    assert batches == [["a", "b", "missing", "c"]]
+
+def test_loaded_keys_are_cached_for_the_request():
+    async def run():
+        batch = RecordingBatch()
+        loader = BatchLoader(batch)
+        first = await loader.load("a")
+        again = await asyncio.gather(loader.load("a"), loader.load("b"))
+        return first, again, batch.batches
+    first, again, batches = asyncio.run(run())
+    assert (first, again) == ("A", ["A", "B"])
+    assert batches == [["a"], ["b"]]
+
+def test_batch_error_reaches_every_caller():
+    async def run():
+        loader = BatchLoader(RecordingBatch(fail=True))
+        return await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+    errors = asyncio.run(run())
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+def test_request_loaders_resolve_profiles_and_campaign_names(mock_db):
+    async def run():
+        scraper_id = ObjectId()
+        await mock_db["scrapers"].insert_one({"_id": scraper_id, "scraper_name": "IPL betting"})
+        await mock_db["scrape_profiles"].insert_many([{"scraper_id": str(scraper_id), "username": name, "bio": name} for name in ("alice", "bob")])
+        loaders = RequestLoaders()
+        name, profiles = await asyncio.gather(
+            loaders.scraper_names.load(str(scraper_id)),
+            loaders.profiles.load_many(["alice", "bob", "carol"]),
+        )
+        return name, profiles
+    name, profiles = asyncio.run(run())
+    assert name == "IPL betting"
+    assert [profile["bio"] if profile else None for profile in profiles] == ["alice", "bob", None]
@@ -0,0 +1,161 @@
+import json
+import asyncio
+from conftest import FakePage
+from reels_scroller.network_router import NetworkRouter, GRAPHQL_URL, CLIPS_HOME, USER_INFO, FEED_TIMELINE, RECHECK_EVERY
+from reels_scroller.records import ClipsConnection, UserInfo
+
+IGNORED_ROOT = "xdt_api__v1__discover__chaining"
+CLIPS_BODY = {"data": {CLIPS_HOME: {"edges": [{"node": {"media": {"code": "C1", "caption": {"text": "bet now"}, "user": {"username": "alice"}}}}]}}}
+
+class FakeRequest:
+    def __init__(self, operation: str = None, resource_type: str = "xhr"):
+        self.headers = {"x-fb-friendly-name": operation} if operation else dict()
+        self.post_data = ""
+        self.resource_type = resource_type
+
+class FakeResponse:
+    def __init__(self, body: dict, operation: str = None, url: str = GRAPHQL_URL, ok: bool = True, resource_type: str = "xhr"):
+        self.url = url
+        self.request = FakeRequest(operation, resource_type)
+        self.ok = ok
+        self._body = json.dumps(body).encode("utf-8")
+        self.reads = 0
+
+    async def body(self) -> bytes:
+        self.reads += 1
+        return self._body
+
+def ignored_response() -> FakeResponse:
+    return FakeResponse({"data": {IGNORED_ROOT: {"edges": []}}}, operation="Chaining")
+
+def test_bodies_of_unread_operations_are_skipped_and_counted():
+    async def run():
+        router = NetworkRouter(FakePage())
+        seen = []
+        async def on_clips(value):
+            seen.append(value)
+        router.start_phase({CLIPS_HOME: on_clips})
+
+        first = ignored_response()
+        await router.on_response(first)    # unknown operation: read once to learn its root keys
+        later = [ignored_response() for _ in range(RECHECK_EVERY - 2)]
+        for response in later:
+            await router.on_response(response)
+        return router, first, later, seen
+    router, first, later, seen = asyncio.run(run())
+    assert first.reads == 1
+    assert all(response.reads == 0 for response in later)
+    assert router.skipped == len(later)
+    assert router.stats()["skipped_by_route"] == {"Chaining": len(later)}
+    assert seen == []
+
+def test_skipped_operation_is_rechecked_now_and_then():
+    async def run():
+        router = NetworkRouter(FakePage())
+        async def on_clips(value):
+            pass
+        router.start_phase({CLIPS_HOME: on_clips})
+        responses = [ignored_response() for _ in range(RECHECK_EVERY + 1)]
+        for response in responses:
+            await router.on_response(response)
+        return router, responses
+    router, responses = asyncio.run(run())
+    assert sum(response.reads for response in responses) == 2
+    assert router.skipped == RECHECK_EVERY - 1
+
+def test_failed_and_non_api_responses_are_skipped_per_route():
+    async def run():
+        router = NetworkRouter(FakePage())
+        async def on_comments(value):
+            pass
+        router.start_phase(url_routes={"comments": on_comments})
+        image = FakeResponse({}, url="https://www.instagram.com/api/v1/media/1/comments/x.jpg", resource_type="image")
+        error = FakeResponse({}, url="https://www.instagram.com/api/v1/media/1/comments/", ok=False)
+        await router.on_response(image)
+        await router.on_response(error)
+        return router, image, error
+    router, image, error = asyncio.run(run())
+    assert image.reads == error.reads == 0
+    assert router.stats()["skipped_by_route"] == {"comments": 2}
+
+def test_one_listener_decodes_once_and_dispatches_by_root_key():
+    async def run():
+        page = FakePage()
+        router = NetworkRouter(page)
+        received = []
+        async def on_clips(value):
+            received.append(("clips", value))
+        async def on_clips_too(value):
+            received.append(("clips too", value))
+        async def on_feed(value):
+            received.append(("feed", value))
+        router.register(CLIPS_HOME, on_clips)
+        router.register(CLIPS_HOME, on_clips_too)
+        router.register(FEED_TIMELINE, on_feed)
+        response = FakeResponse({**CLIPS_BODY, "extensions": {"is_final": True}}, operation="ClipsHome")
+        await router.on_response(response)
+        return page, router, response, received
+    page, router, response, received = asyncio.run(run())
+    assert len(page.listeners["response"]) == 1
+    assert response.reads == 1
+    assert [name for name, _ in received] == ["clips", "clips too"]
+    assert isinstance(received[0][1], ClipsConnection)
+    assert received[0][1] is received[1][1]    # decoded once, shared by the handlers
+    assert router.stats()["dispatched"] == 2
+
+def test_phases_replace_each_others_handlers():
+    async def run():
+        router = NetworkRouter(FakePage())
+        received = []
+        async def on_clips(value):
+            received.append("clips")
+        async def on_user(value):
+            received.append("user")
+        router.start_phase({CLIPS_HOME: on_clips})
+        await router.on_response(FakeResponse(CLIPS_BODY, operation="ClipsHome"))
+        router.start_phase({USER_INFO: on_user})
+        await router.on_response(FakeResponse(CLIPS_BODY, operation="ClipsHome"))
+        await router.on_response(FakeResponse({"data": {USER_INFO: {"username": "alice", "biography": "ids here"}}}, operation="Profile"))
+        router.end_phase()
+        return router, received
+    router, received = asyncio.run(run())
+    assert received == ["clips", "user"]
+    assert router.root_handlers == {}
+
+def test_responses_are_ignored_without_handlers():
+    async def run():
+        router = NetworkRouter(FakePage())
+        response = FakeResponse(CLIPS_BODY, operation="ClipsHome")
+        await router.on_response(response)
+        return router, response
+    router, response = asyncio.run(run())
+    assert response.reads == 0
+    assert router.stats()["responses"] == 0
+
+def test_a_failing_handler_does_not_stop_the_others():
+    async def run():
+        router = NetworkRouter(FakePage())
+        received = []
+        async def broken(value):
+            raise KeyError("media")
+        async def on_user(value):
+            received.append(value)
+        router.register(USER_INFO, broken)
+        router.register(USER_INFO, on_user)
+        await router.on_response(FakeResponse({"data": {USER_INFO: {"username": "alice"}}}, operation="Profile"))
+        await router.on_response(FakeResponse({"data": {USER_INFO: {"username": 5}}}, operation="Profile"))   # not a UserInfo
+        return router, received
+    router, received = asyncio.run(run())
+    assert len(received) == 1 and isinstance(received[0], UserInfo)
+    assert router.stats()["failed"] == 2
+
+def test_url_routes_get_the_decoded_body():
+    async def run():
+        router = NetworkRouter(FakePage())
+        received = []
+        async def on_search(value):
+            received.append(value)
+        router.start_phase(url_routes={"topsearch": on_search})
+        await router.on_response(FakeResponse({"users": [{"user": {"username": "alice"}}]}, url="https://www.instagram.com/web/search/topsearch/?query=bet"))
+        return received
+    assert asyncio.run(run()) == [{"users": [{"user": {"username": "alice"}}]}]
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from bson.objectid import ObjectId
+from server.database.pagination import find_page
+
+# a minimal in-memory stand-in for a motor collection, enough for the filters find_page builds.
+# like mongodb, null / missing values sort before every other value and $gt / $lt never match null.
+
+def sort_key(value):
+    return (0, 0) if value is None else (1, value)
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            for operator, operand in condition.items():
+                if operator == "$ne":
+                    ok = value != operand
+                elif value is None or operand is None:
+                    ok = False
+                elif operator == "$gt":
+                    ok = value > operand
+                elif operator == "$lt":
+                    ok = value < operand
+                else:
+                    raise NotImplementedError(operator)
+                if not ok:
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+
+    def sort(self, sort_spec):
+        for field, direction in reversed(sort_spec):
+            self.documents.sort(key=lambda doc: sort_key(doc.get(field)), reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.documents = self.documents[:limit]
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+class FakeCollection:
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.documents if matches(doc, query)), None)
+
+    def find(self, query, projection=None):
+        return FakeCursor([
+            {field: doc[field] for field in ["_id", *(projection or {})] if field in doc}
+            for doc in self.documents if matches(doc, query)
+        ])
+
+def make_collection() -> FakeCollection:
+    names = ["b", None, "a", "c", "a", None, "b", "d"]
+    documents = []
+    for name in names:
+        doc = {"_id": ObjectId(), "scraper_id": "s1"}
+        if name is not None:
+            doc["username"] = name
+        documents.append(doc)
+    # a missing field and an explicit null sort the same
+    documents[5]["username"] = None
+    documents.append({"_id": ObjectId(), "scraper_id": "other", "username": "a"})
+    return FakeCollection(documents)
+
+def all_pages(collection: FakeCollection, sort: str, order: str, limit: int) -> list[str]:
+    ids, after = [], None
+    for _ in range(20):
+        page = asyncio.run(find_page(
+            collection, {"scraper_id": "s1"}, default_fields=["username"], allowed_fields=["username"],
+            sort_fields=["_id", "username"], after=after, limit=limit, sort=sort, order=order,
+        ))
+        ids.extend(item["id"] for item in page["items"])
+        after = page["next_after"]
+        if after is None:
+            return ids
+    raise AssertionError("paging did not finish")
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_pages_cover_every_document_once_in_order(order, limit):
+    collection = make_collection()
+    expected = FakeCursor([dict(doc) for doc in collection.documents if doc["scraper_id"] == "s1"]).sort(
+        [("username", 1 if order == "asc" else -1), ("_id", 1 if order == "asc" else -1)]
+    ).documents
+    assert all_pages(collection, "username", order, limit) == [str(doc["_id"]) for doc in expected]
+
+def test_null_anchor_does_not_stall_paging():
+    collection = make_collection()
+    # page size 1 puts a null value on the anchor of the first pages
+    ids = all_pages(collection, "username", "asc", 1)
+    assert len(ids) == 8
+    assert len(set(ids)) == 8
+
+def test_id_pages():
+    collection = make_collection()
+    ids = all_pages(collection, "_id", "asc", 3)
+    assert ids == sorted(str(doc["_id"]) for doc in collection.documents if doc["scraper_id"] == "s1")
+
+def test_rejects_bad_arguments():
+    collection = make_collection()
+    with pytest.raises(ValueError):
+        asyncio.run(find_page(collection, {}, ["username"], ["username"], ["_id"], sort="username"))
+    with pytest.raises(ValueError):
+        asyncio.run(find_page(collection, {}, ["username"], ["username"], ["_id"], after="not-an-id"))
@@ -0,0 +1,80 @@
+import asyncio
+from reels_scroller.preclassifier import ReelPreclassifier
+
+# captions the prefilter leaves undecided, so they need the (stub) LLM
+UNDECIDED = ["look at this view from the hills today", "sunday run with the crew, 10k done", "grandma's biryani recipe"]
+
+def test_checks_run_ahead_and_are_ready_on_arrival():
+    async def run():
+        asked = []
+
+        async def classify(caption):
+            asked.append(caption)
+            return caption == "yes"
+
+        preclassifier = ReelPreclassifier(classify)
+        preclassifier.schedule("a", "yes")
+        preclassifier.schedule("a", "yes")    # already running
+        preclassifier.schedule("b", "")       # no caption yet
+        await asyncio.sleep(0)
+        return await preclassifier.verdict("a", "yes"), await preclassifier.verdict("b", "no"), asked, preclassifier.stats()
+    verdict_a, verdict_b, asked, stats = asyncio.run(run())
+    assert (verdict_a, verdict_b) == (True, False)
+    assert asked == ["yes", "no"]
+    assert stats == {"scheduled": 1, "ready_on_arrival": 1, "cancelled": 0}
+
+def test_concurrency_is_limited():
+    async def run():
+        running, peak = 0, 0
+
+        async def classify(caption):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return False
+
+        preclassifier = ReelPreclassifier(classify, max_concurrency=2)
+        for i in range(6):
+            preclassifier.schedule(str(i), f"caption {i}")
+        await asyncio.sleep(0.05)
+        return peak
+    assert asyncio.run(run()) == 2
+
+def test_scrolled_past_reels_never_reach_the_backend(automator):
+    async def run():
+        preclassifier = automator.preclassifier
+        for code, caption in zip("abc", UNDECIDED):
+            preclassifier.schedule(code, caption)
+        await asyncio.sleep(0)  # the checks are submitted to the batcher
+        verdict = await preclassifier.verdict("c", UNDECIDED[2])   # a and b scrolled away
+        batcher = next(iter(automator.relevancy_batchers.values()))
+        return verdict, batcher
+    verdict, batcher = asyncio.run(run())
+    assert verdict is False
+    assert automator.preclassifier.cancelled == 2
+    assert automator.llm_backend.calls == 1
+    assert batcher.captions_sent == 1
+    assert batcher.captions_dropped == 2
+    assert automator.relevancy_waiters == {}
+
+def test_check_still_wanted_by_another_caller_is_kept(automator):
+    async def run():
+        first = asyncio.ensure_future(automator.check_caption_relevancy(UNDECIDED[0]))
+        second = asyncio.ensure_future(automator.check_caption_relevancy(UNDECIDED[0]))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+    assert asyncio.run(run()) is False
+    assert automator.llm_backend.calls == 1
+
+def test_clear_cancels_every_pending_check(automator):
+    async def run():
+        for code, caption in zip("abc", UNDECIDED):
+            automator.preclassifier.schedule(code, caption)
+        await asyncio.sleep(0)
+        automator.preclassifier.clear()
+        await asyncio.sleep(0.5)    # past the batcher's max_wait
+    asyncio.run(run())
+    assert automator.llm_backend.calls == 0
@@ -0,0 +1,66 @@
+import asyncio
+from server.database.profiles import add_profile, add_profiles
+from server.database.write_buffers import ProfileBuffer
+
+def test_add_profile_is_one_document_per_scraper_and_username(mock_db):
+    async def run():
+        first = await add_profile("s1", "alice")
+        again = await add_profile("s1", "alice")
+        other_scraper = await add_profile("s2", "alice")
+        return first, again, other_scraper, await mock_db["scrape_profiles"].find({}, {"_id": 0}).to_list(None)
+    first, again, other_scraper, docs = asyncio.run(run())
+    assert first == again
+    assert other_scraper != first
+    assert sorted(doc["scraper_id"] for doc in docs) == ["s1", "s2"]
+    assert all(doc["scraped"] is False for doc in docs)
+
+def test_add_profile_keeps_an_existing_profile_untouched(mock_db):
+    async def run():
+        await add_profile("s1", "alice")
+        await mock_db["scrape_profiles"].update_one({"username": "alice"}, {"$set": {"scraped": True, "bio": "hi"}})
+        await add_profile("s1", "alice", targeted_app_id="app")
+        return await mock_db["scrape_profiles"].find_one({"username": "alice"})
+    doc = asyncio.run(run())
+    assert doc["scraped"] is True
+    assert doc["bio"] == "hi"
+
+def test_add_profiles_upserts_a_batch(mock_db):
+    async def run():
+        await add_profile("s1", "alice")
+        result = await add_profiles("s1", ["alice", "bob", "bob", "", "carol"])
+        return result, await mock_db["scrape_profiles"].count_documents({"scraper_id": "s1"})
+    result, count = asyncio.run(run())
+    assert result == {"inserted": 2, "total": 3}
+    assert count == 3
+    assert asyncio.run(add_profiles("s1", [])) == {"inserted": 0, "total": 0}
+
+def test_profile_buffer_writes_in_batches_and_on_close(mock_db):
+    async def run():
+        buffer = ProfileBuffer("s1", flush_every=2, flush_interval=60)
+        buffer.add("alice")
+        buffer.add("")
+        buffer.add("bob")   # full: flushed in the background
+        await asyncio.sleep(0)
+        written = await mock_db["scrape_profiles"].count_documents({})
+        buffer.add("carol")
+        await buffer.close()    # what loop_runner does when the scraper is stopped
+        return written, await mock_db["scrape_profiles"].count_documents({})
+    assert asyncio.run(run()) == (2, 3)
+
+def test_cancelled_scraper_still_writes_found_profiles(mock_db):
+    async def run():
+        buffer = ProfileBuffer("s1", flush_every=10, flush_interval=60)
+
+        async def phase():
+            try:
+                buffer.add("alice")
+                await asyncio.sleep(60)
+            finally:
+                await buffer.close()
+
+        task = asyncio.ensure_future(phase())
+        await asyncio.sleep(0)
+        task.cancel()   # SIGTERM
+        await asyncio.gather(task, return_exceptions=True)
+        return await mock_db["scrape_profiles"].count_documents({"username": "alice"})
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,57 @@
+import asyncio
+from caption_prefilter import CaptionPrefilter
+from reclassify import classify_texts, prefilter_hits
+
+KEYWORDS = ["fantasy sports", "1xbet.com", "online cricket betting"]
+
+CAPTIONS = [
+    "watching sports tonight with friends.",
+    "I love online cricket betting",
+    "Fantasy Sports tips for the weekend 🏏",
+    "Play on 1xbet.com - instant deposit, 100% bonus, msg now",
+    "JOIN AND GET FREE !D NO DEPOS!T",
+    "new fantasy sports platform with instant withdrawal and deposit bonus",
+    "my cat sleeping in the sun",
+    "",
+]
+
+class RecordingBackend:
+    ''' answers every caption with "relevant", remembers what was asked '''
+    def __init__(self):
+        self.asked: list[str] = []
+
+    async def relevancy_check_batch(self, captions: list[str], text_prompt: str, keywords: list[str]) -> list:
+        self.asked.extend(captions)
+        return [True for _ in captions]
+
+def new_stats() -> dict:
+    return {"decided_locally": 0, "sent_to_llm": 0}
+
+def test_hits_match_prefilter_score():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    keyword_hits, promo_hits = prefilter_hits(CAPTIONS, prefilter)
+    for caption, keyword_hit, promo_hit in zip(CAPTIONS, keyword_hits, promo_hits):
+        assert (int(keyword_hit), int(promo_hit)) == prefilter.hits(caption), caption
+
+def test_phrase_keywords_count_once():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    keyword_hits, _ = prefilter_hits(["watching sports tonight with friends.", "I love online cricket betting"], prefilter)
+    assert keyword_hits.tolist() == [0, 1]
+
+def test_bulk_verdicts_agree_with_live_prefilter():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    backend = RecordingBackend()
+    verdicts = asyncio.run(classify_texts(CAPTIONS, prefilter, backend, "betting", KEYWORDS, new_stats()))
+
+    for caption, verdict in zip(CAPTIONS, verdicts):
+        live = CaptionPrefilter(KEYWORDS).verdict(caption)
+        if live is None:
+            assert caption in backend.asked, caption
+        else:
+            assert verdict is live and caption not in backend.asked, caption
+
+def test_stats_count_local_and_llm_decisions():
+    prefilter = CaptionPrefilter(KEYWORDS)
+    stats = new_stats()
+    asyncio.run(classify_texts(CAPTIONS, prefilter, RecordingBackend(), "betting", KEYWORDS, stats))
+    assert stats["decided_locally"] + stats["sent_to_llm"] == len(CAPTIONS)
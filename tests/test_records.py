@@ -0,0 +1,48 @@
+import json
+import msgspec
+import pytest
+from reels_scroller.records import ClipsConnection, UserInfo, CommentsPage
+from server.database.content import create_doc, build_content_doc
+
+MEDIA = {
+    "code": "C1", "pk": "3000000001", "taken_at": 1714000000,
+    "caption": {"text": "✅ Play on FUN88 - instant deposits", "pk": "1"},
+    "user": {"username": "alice", "pk": "1", "is_verified": False},
+    "image_versions2": {"candidates": [{"url": "https://instagram.example/v/1", "width": 640}]},
+    "clips_metadata": {"music_info": None},
+    "like_count": 12, "comment_count": 3, "view_count": 400, "location": None,
+}
+
+def clips_body(*medias) -> bytes:
+    return json.dumps({"edges": [{"node": {"media": media}} for media in medias] + [{"node": {"media": None}}]}).encode("utf-8")
+
+def test_reels_decode_with_the_fields_the_scraper_reads():
+    reels = msgspec.json.decode(clips_body(MEDIA), type=ClipsConnection).reels()
+    assert len(reels) == 1  # nodes without media are left out
+    reel = reels[0]
+    assert (reel.code, reel.caption_text, reel.username, reel.like_count) == ("C1", "✅ Play on FUN88 - instant deposits", "alice", 12)
+    assert not hasattr(reel, "image_versions2")
+
+def test_reel_record_stores_the_same_document_as_a_media_dict():
+    reel = msgspec.json.decode(clips_body(MEDIA), type=ClipsConnection).reels()[0]
+    assert reel.content_doc() == create_doc(MEDIA)
+    from_record, from_dict = build_content_doc("s1", reel), build_content_doc("s1", MEDIA)
+    from_record.pop("saved_on"), from_dict.pop("saved_on")
+    assert from_record == from_dict
+
+def test_missing_and_null_fields_get_defaults():
+    reel = msgspec.json.decode(clips_body({"code": "C2", "like_count": None, "caption": None}), type=ClipsConnection).reels()[0]
+    assert (reel.caption_text, reel.username, reel.like_count, reel.view_count) == ("", "", None, 0)
+
+def test_wrong_types_fail_to_decode():
+    with pytest.raises(msgspec.ValidationError):
+        msgspec.json.decode(clips_body({"code": 5}), type=ClipsConnection)
+
+def test_profile_and_comments_records():
+    user = msgspec.json.decode(json.dumps({
+        "username": "alice", "biography": None, "bio_links": [{"url": "https://bet.example", "title": "x"}], "follower_count": 10,
+    }), type=UserInfo)
+    assert (user.username, user.biography, [link.url for link in user.bio_links]) == ("alice", None, ["https://bet.example"])
+
+    comments = msgspec.json.decode(json.dumps({"caption": {"text": "bet now", "media_id": "31"}, "comments": [{"text": "hi"}]}), type=CommentsPage)
+    assert (comments.caption.text, comments.caption.media_id) == ("bet now", "31")
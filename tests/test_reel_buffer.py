@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from reels_scroller.reel_buffer import ReelBuffer
+from reels_scroller.records import ReelRecord, Caption
+
+def reel(code: str, pk: int, caption: str = None) -> ReelRecord:
+    return ReelRecord(code=code, pk=pk, caption=Caption(text=caption) if caption is not None else None)
+
+def test_add_returns_only_new_reels():
+    async def run():
+        buffer = ReelBuffer(max_reels=10)
+        first = buffer.add([reel("a", 1), reel("b", 2)])
+        second = buffer.add([reel("b", 2), reel("c", 3)])
+        return buffer, first, second
+    buffer, first, second = asyncio.run(run())
+    assert [r.code for r in first] == ["a", "b"]
+    assert [r.code for r in second] == ["c"]
+    assert len(buffer) == 3
+    assert buffer.loaded.is_set()
+
+def test_least_recently_used_reel_is_evicted():
+    async def run():
+        buffer = ReelBuffer(max_reels=3)
+        buffer.add([reel("a", 1), reel("b", 2), reel("c", 3)])
+        buffer["a"]    # looked up: most recently used
+        buffer.add([reel("d", 4)])
+        return buffer
+    buffer = asyncio.run(run())
+    assert "b" not in buffer
+    assert all(code in buffer for code in ["a", "c", "d"])
+    assert buffer.evicted == 1
+    # the pk index forgets evicted reels
+    assert buffer.set_caption_by_pk(2, "late") is None
+    with pytest.raises(KeyError):
+        buffer["b"]
+
+def test_caption_backfill_by_pk_wakes_the_waiter():
+    async def run():
+        buffer = ReelBuffer()
+        buffer.add([reel("a", 111)])
+        waiter = asyncio.ensure_future(buffer.wait_for_caption("a", timeout=1))
+        await asyncio.sleep(0)
+        backfilled = buffer.set_caption_by_pk("111", "free id")   # pk as string or int
+        return await waiter, backfilled, buffer.stats()
+    caption, backfilled, stats = asyncio.run(run())
+    assert caption == "free id"
+    assert backfilled.caption_text == "free id"
+    assert stats["captions_backfilled"] == 1
+    assert stats["waiting_for_caption"] == 0
+
+def test_caption_from_a_later_page_wakes_the_waiter():
+    async def run():
+        buffer = ReelBuffer()
+        buffer.add([reel("a", 1)])
+        waiter = asyncio.ensure_future(buffer.wait_for_caption("a", timeout=1))
+        await asyncio.sleep(0)
+        buffer.add([reel("a", 1, "bonus")])
+        return await waiter
+    assert asyncio.run(run()) == "bonus"
+
+def test_known_and_unknown_captions_return_at_once():
+    async def run():
+        buffer = ReelBuffer()
+        buffer.add([reel("a", 1, "known")])
+        return await buffer.wait_for_caption("a", timeout=1), await buffer.wait_for_caption("missing", timeout=1)
+    assert asyncio.run(run()) == ("known", "")
+
+def test_timeout_does_not_break_later_waits():
+    async def run():
+        buffer = ReelBuffer()
+        buffer.add([reel("a", 1)])
+        first = await buffer.wait_for_caption("a", timeout=0.01)
+        waiter = asyncio.ensure_future(buffer.wait_for_caption("a", timeout=1))
+        await asyncio.sleep(0)
+        buffer.set_caption_by_pk(1, "second try")
+        return first, await waiter
+    assert asyncio.run(run()) == ("", "second try")
+
+def test_eviction_resolves_waiters_with_no_caption():
+    async def run():
+        buffer = ReelBuffer(max_reels=1)
+        buffer.add([reel("a", 1)])
+        waiter = asyncio.ensure_future(buffer.wait_for_caption("a", timeout=1))
+        await asyncio.sleep(0)
+        buffer.add([reel("b", 2)])
+        return await waiter, buffer.stats()
+    caption, stats = asyncio.run(run())
+    assert caption == ""
+    assert stats["waiting_for_caption"] == 0
+
+def test_wait_until_loaded():
+    async def run():
+        buffer = ReelBuffer()
+        empty = await buffer.wait_until_loaded(timeout=0.01)
+        asyncio.get_running_loop().call_later(0.01, buffer.add, [reel("a", 1)])
+        return empty, await buffer.wait_until_loaded(timeout=1)
+    assert asyncio.run(run()) == (False, True)
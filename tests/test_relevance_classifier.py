@@ -0,0 +1,83 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+import relevance_classifier
+from relevance_classifier import CampaignClassifier, RelevanceClassifier, campaign_key, caption_features
+from server.database.relevancy_labels import build_label_doc
+
+PROMO = ["instant deposit and withdrawal on {}", "get your {} betting id now", "{} satta matka results, dm now", "100% bonus on first deposit at {}"]
+OFF_TOPIC = ["sunday run with {} and the crew", "grandma's {} biryani recipe", "look at this view from {} today", "new {} song out now"]
+NAMES = ["fun88", "ipl", "kolkata", "delhi", "mumbai", "lotus", "star", "crown"]
+
+def labeled_captions(count: int, seed: int = 0) -> tuple[list[str], list[bool]]:
+    rng = random.Random(seed)
+    captions, verdicts = [], []
+    for i in range(count):
+        relevant = i % 2 == 0
+        captions.append(rng.choice(PROMO if relevant else OFF_TOPIC).format(rng.choice(NAMES)))
+        verdicts.append(relevant)
+    return captions, verdicts
+
+def test_campaign_key_ignores_keyword_order_and_case():
+    assert campaign_key("betting ads ", ["Satta", "betting"]) == campaign_key("betting ads", ["betting", "satta"])
+    assert campaign_key("betting ads", ["satta"]) != campaign_key("fantasy apps", ["satta"])
+
+def test_features_are_stable_and_normalized():
+    assert caption_features("NO DEPOS!T bonus").tolist() == caption_features("no deposit bonus").tolist()
+    assert len(caption_features("a b")) == 3    # two words and the pair
+
+def test_classifier_separates_the_labels():
+    captions, verdicts = labeled_captions(200)
+    classifier = RelevanceClassifier()
+    classifier.fit(captions, verdicts)
+    assert classifier.predict_proba("instant deposit and withdrawal on fun88") > 0.95
+    assert classifier.predict_proba("grandma's sunday biryani recipe") < 0.05
+
+def test_no_verdict_before_enough_labels_of_both_classes(monkeypatch):
+    monkeypatch.setattr(relevance_classifier, "CLASSIFIER_MIN_LABELS", 20)
+    async def run():
+        classifier = CampaignClassifier("campaign")
+        for caption in labeled_captions(40)[0][::2]:
+            classifier.add_label(caption, True)     # only one class so far
+        await classifier.fit()
+        return classifier
+    classifier = asyncio.run(run())
+    assert classifier.verdict("instant deposit and withdrawal on fun88") is None
+    assert classifier.stats()["trained"] is False
+
+def test_loaded_labels_train_the_classifier(mock_db, monkeypatch):
+    monkeypatch.setattr(relevance_classifier, "CLASSIFIER_MIN_LABELS", 50)
+    async def run():
+        captions, verdicts = labeled_captions(120)
+        now = datetime.utcnow()
+        docs = []
+        for i, (caption, verdict) in enumerate(zip(captions, verdicts)):
+            doc = build_label_doc("s1", "campaign", caption, verdict)
+            doc["labeled_on"] = now - timedelta(minutes=len(captions) - i)
+            docs.append(doc)
+        await mock_db["relevancy_labels"].insert_many(docs)
+
+        classifier = CampaignClassifier("campaign")
+        classifier.add_label("label of this session", True)
+        await classifier.load()
+        return captions, classifier
+    captions, classifier = asyncio.run(run())
+    assert list(classifier.captions) == captions + ["label of this session"]   # oldest leftmost
+    assert classifier.verdict("get your ipl betting id now") is True
+    assert classifier.verdict("new delhi song out now") is False
+    assert classifier.stats()["decided_locally"] == 2
+
+def test_full_label_window_keeps_the_session_labels(mock_db, monkeypatch):
+    monkeypatch.setattr(relevance_classifier, "CLASSIFIER_MAX_LABELS", 5)
+    async def run():
+        await mock_db["relevancy_labels"].insert_many([
+            build_label_doc("s1", "campaign", f"stored {i}", i % 2 == 0) for i in range(10)
+        ])
+        classifier = CampaignClassifier("campaign")
+        for i in range(3):
+            classifier.add_label(f"session {i}", True)
+        await classifier.load()
+        return list(classifier.captions)
+    captions = asyncio.run(run())
+    assert captions[-3:] == ["session 0", "session 1", "session 2"]
+    assert len(captions) == 5
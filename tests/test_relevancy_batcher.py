@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from relevancy_batcher import RelevancyBatcher
+from llm_instructions import relevancy_check_batch
+
+class BatchBackend:
+    ''' answers yes for captions that mention "bet", records every batch it was asked '''
+    def __init__(self, error: Exception = None):
+        self.batches: list[list[str]] = []
+        self.error = error
+
+    async def relevancy_check_batch(self, captions, text_prompt, keywords):
+        self.batches.append(list(captions))
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return ["bet" in caption.lower() for caption in captions]
+
+def test_full_batch_is_sent_without_waiting():
+    async def run():
+        backend = BatchBackend()
+        batcher = RelevancyBatcher(backend, "betting", ["bet"], batch_size=3, max_wait=60)
+        verdicts = await asyncio.wait_for(asyncio.gather(*[batcher.check(c) for c in ["bet now", "cats", "BET big"]]), 1)
+        return backend.batches, verdicts
+    batches, verdicts = asyncio.run(run())
+    assert batches == [["bet now", "cats", "BET big"]]
+    assert verdicts == [True, False, True]
+
+def test_partial_batch_is_sent_after_max_wait():
+    async def run():
+        backend = BatchBackend()
+        batcher = RelevancyBatcher(backend, "betting", ["bet"], batch_size=10, max_wait=0.02)
+        futures = [batcher.submit("bet now"), batcher.submit("dogs")]
+        await asyncio.sleep(0.01)
+        sent_early = list(backend.batches)
+        verdicts = await asyncio.gather(*futures)
+        return sent_early, backend.batches, verdicts, batcher.batches_sent
+    sent_early, batches, verdicts, batches_sent = asyncio.run(run())
+    assert sent_early == []
+    assert batches == [["bet now", "dogs"]]
+    assert verdicts == [True, False]
+    assert batches_sent == 1
+
+def test_spelling_variants_are_asked_once():
+    async def run():
+        backend = BatchBackend()
+        batcher = RelevancyBatcher(backend, "betting", ["bet"], batch_size=3, max_wait=60)
+        verdicts = await asyncio.gather(*[batcher.check(c) for c in ["GET FREE !D", "get free id", "bet"]])
+        return backend.batches, verdicts, batcher.captions_sent
+    batches, verdicts, captions_sent = asyncio.run(run())
+    assert batches == [["GET FREE !D", "bet"]]
+    assert verdicts == [False, False, True]
+    assert captions_sent == 2
+
+def test_backend_error_reaches_every_caller():
+    async def run():
+        batcher = RelevancyBatcher(BatchBackend(RuntimeError("down")), "betting", ["bet"], batch_size=2, max_wait=60)
+        return await asyncio.gather(batcher.check("a"), batcher.check("b"), return_exceptions=True)
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeModel:
+    ''' batched prompts get batch_text, single caption prompts "yes" '''
+    def __init__(self, batch_text: str = None, error: Exception = None):
+        self.batch_text = batch_text
+        self.error = error
+        self.calls = 0
+
+    async def generate_content_async(self, contents, generation_config=None):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        if generation_config is not None:
+            return FakeResponse(self.batch_text)
+        return FakeResponse("yes")
+
+def test_batch_prompt_parses_one_verdict_per_caption():
+    model = FakeModel('```json["yes", "no", "Yes"]```')
+    verdicts = asyncio.run(relevancy_check_batch(model, ["a", "b", "c"], "betting", ["bet"]))
+    assert verdicts == [True, False, True]
+    assert model.calls == 1
+
+@pytest.mark.parametrize("batch_text", ["not json", '["yes"]', '{"a": "yes"}'])
+def test_bad_batch_output_falls_back_to_single_checks(batch_text):
+    model = FakeModel(batch_text)
+    verdicts = asyncio.run(relevancy_check_batch(model, ["a", "b"], "betting", ["bet"]))
+    assert verdicts == [True, True]
+    assert model.calls == 3
+
+def test_api_error_gives_error_dicts_without_fallback():
+    model = FakeModel(error=RuntimeError("429 quota"))
+    verdicts = asyncio.run(relevancy_check_batch(model, ["a", "b"], "betting", ["bet"]))
+    assert model.calls == 1
+    assert len(verdicts) == 2
+    assert all(isinstance(verdict, dict) and "error" in verdict for verdict in verdicts)
@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import pytest
+from server.database import screenshots
+from server.database.screenshots import save_screenshot, get_screenshot, is_screenshot_id, SCREENSHOTS_BUCKET
+
+class FakeBucket:
+    ''' GridFS bucket on the mongomock database (gridfs only accepts real pymongo databases) '''
+    def __init__(self, db):
+        self.files = db[f"{SCREENSHOTS_BUCKET}.files"]
+        self.blobs: dict = dict()
+        self.uploads = 0
+
+    async def upload_from_stream(self, filename: str, data: bytes, metadata: dict = None):
+        self.uploads += 1
+        result = await self.files.insert_one({"filename": filename, "length": len(data), "metadata": metadata})
+        self.blobs[result.inserted_id] = data
+        return result.inserted_id
+
+    async def open_download_stream(self, file_id):
+        data = self.blobs[file_id]
+        class Stream:
+            async def read(self):
+                return data
+        return Stream()
+
+@pytest.fixture
+def bucket(mock_db, monkeypatch):
+    bucket = FakeBucket(mock_db)
+    monkeypatch.setattr(screenshots, "get_bucket", lambda: bucket)
+    return bucket
+
+def test_identical_screenshots_are_stored_once(bucket):
+    async def run():
+        first = await save_screenshot(b"landing page", "image/png")
+        again = await save_screenshot(b"landing page", "image/png")
+        other = await save_screenshot(b"other page")
+        return first, again, other
+    first, again, other = asyncio.run(run())
+    assert first == again == hashlib.sha256(b"landing page").hexdigest()
+    assert other != first
+    assert bucket.uploads == 2
+
+def test_stored_screenshot_is_read_back_with_its_type(bucket):
+    async def run():
+        screenshot_id = await save_screenshot(b"landing page", "image/png")
+        return await get_screenshot(screenshot_id), await get_screenshot("0" * 64)
+    stored, missing = asyncio.run(run())
+    assert stored == (b"landing page", "image/png")
+    assert missing is None
+
+def test_screenshot_ids_are_sha256_hex():
+    assert is_screenshot_id(hashlib.sha256(b"x").hexdigest())
+    assert not is_screenshot_id("../etc/passwd")
+    assert not is_screenshot_id("A" * 64)
+
+class FakeRequest:
+    def __init__(self, headers: dict = None):
+        self.headers = headers or dict()
+
+def test_endpoint_answers_a_cached_copy_without_the_database(bucket, monkeypatch):
+    server_main = pytest.importorskip("server_main")  # needs the full server dependencies (uvicorn, psutil)
+
+    async def no_database(screenshot_id):
+        raise AssertionError("the database was asked")
+
+    async def run():
+        screenshot_id = await save_screenshot(b"landing page", "image/png")
+        fresh = await server_main.screenshot_image(screenshot_id, FakeRequest())
+        monkeypatch.setattr(server_main, "get_screenshot", no_database)
+        cached = await server_main.screenshot_image(screenshot_id, FakeRequest({"if-none-match": f'"{screenshot_id}"'}))
+        return screenshot_id, fresh, cached
+    screenshot_id, fresh, cached = asyncio.run(run())
+    assert fresh.status_code == 200
+    assert fresh.body == b"landing page"
+    assert fresh.headers["etag"] == f'"{screenshot_id}"'
+    assert "immutable" in fresh.headers["cache-control"]
+    assert cached.status_code == 304
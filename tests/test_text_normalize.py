@@ -0,0 +1,43 @@
+import pytest
+from text_normalize import normalize_text, split_hashtag
+
+@pytest.mark.parametrize("text, expected", [
+    # leetspeak inside words
+    ("JOIN AND GET FREE !D NO DEPOS!T", "join and get free id no deposit"),
+    ("w!n b!g t0day", "win big today"),
+    # math bold / fullwidth letters, emoji separators, glued hashtags
+    ("𝐁𝐞𝐭𝐭𝐢𝐧𝐠 𝐈𝐃 𝐢𝐧 𝟐 𝐦𝐢𝐧𝐮𝐭𝐞𝐬 ➡️ ＤＭ ＮＯＷ #OnlineBetting #CricketBetting #IPL2025",
+     "betting id in 2 minutes dm now online betting cricket betting ipl2025"),
+    # lookalike cyrillic letters
+    ("Вet оn the bіg match tonight 🔥🔥 #fantasysports #dream11", "bet on the big match tonight fantasysports dream11"),
+    # emoji that stand for a word
+    ("RP EXCH 🆔 in Just 2 Minutes", "rp exch id in just 2 minutes"),
+])
+def test_promo_tricks_fold_to_plain_words(text, expected):
+    assert normalize_text(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    # digits of names and numbers with units are not leetspeak
+    ("✅ Play on FUN88 this IPL", "play on fun88 this ipl"),
+    ("b3t365 and 10k views", "bet365 and 10k views"),
+    ("🎁 100% Bonus on 1st Deposit!🔄", "100% bonus on 1st deposit!"),
+    ("24x7 withdrawal support", "24x7 withdrawal support"),
+    # a run of symbols in front of a word is punctuation
+    ("!!!win big", "!!!win big"),
+])
+def test_names_and_numbers_are_kept(text, expected):
+    assert normalize_text(text) == expected
+
+def test_whitespace_and_empty_text():
+    assert normalize_text("  a\n\tb  ") == "a b"
+    assert normalize_text("") == ""
+    assert normalize_text(None) == ""
+
+def test_spelling_variants_normalize_the_same():
+    variants = ["Free ID no deposit", "FREE !D NO DEPOS!T", "ｆｒｅｅ ＩＤ ｎｏ ｄｅｐｏｓｉｔ", "𝐅𝐫𝐞𝐞 𝐈𝐃 𝐧𝐨 𝐝𝐞𝐩𝐨𝐬𝐢𝐭"]
+    assert len({normalize_text(variant) for variant in variants}) == 1
+
+def test_split_hashtag():
+    assert split_hashtag("OnlineCricketBetting") == "Online Cricket Betting"
+    assert split_hashtag("IPLBetting") == "IPL Betting"
+    assert split_hashtag("fantasy_sports") == "fantasy sports"
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from server.database import write_buffers
+from server.database.write_buffers import WriteBehindBuffer, FreqStatsBuffer
+from server.database.scrapers import create_freq_stats, get_freq_stats
+
+class RecordingBuffer(WriteBehindBuffer):
+    def __init__(self, flush_every: int = 3, flush_interval: float = 0.05, failures: int = 0):
+        super().__init__("s1", flush_every, flush_interval)
+        self.items: list[int] = []
+        self.writes: list[list[int]] = []
+        self.failures = failures    # writes that fail before the database is back
+
+    def add(self, item: int):
+        self.items.append(item)
+        self._item_added()
+
+    async def _write(self):
+        items, self.items = self.items, []
+        if not items:
+            return True
+        if self.failures > 0:
+            self.failures -= 1
+            self.items = items + self.items
+            return False
+        self.writes.append(items)
+        return True
+
+def test_flushes_when_full():
+    async def run():
+        buffer = RecordingBuffer(flush_every=3, flush_interval=60)
+        for item in range(3):
+            buffer.add(item)
+        await asyncio.sleep(0)
+        return buffer.writes
+    assert asyncio.run(run()) == [[0, 1, 2]]
+
+def test_flushes_after_interval_without_more_items():
+    async def run():
+        buffer = RecordingBuffer(flush_every=100, flush_interval=0.05)
+        buffer.add(1)
+        await asyncio.sleep(0.02)
+        buffer.add(2)   # doesn't push the deadline back
+        await asyncio.sleep(0.02)
+        before = list(buffer.writes)
+        await asyncio.sleep(0.05)
+        return before, buffer.writes
+    before, after = asyncio.run(run())
+    assert before == []
+    assert after == [[1, 2]]
+
+def test_close_writes_the_rest_and_disarms_the_timer():
+    async def run():
+        buffer = RecordingBuffer(flush_every=100, flush_interval=0.05)
+        buffer.add(1)
+        await buffer.close()
+        timer = buffer._flush_timer
+        await asyncio.sleep(0.08)
+        return buffer.writes, timer
+    writes, timer = asyncio.run(run())
+    assert writes == [[1]]
+    assert timer is None
+
+def test_write_must_be_implemented():
+    class NoWrite(WriteBehindBuffer):
+        pass
+    with pytest.raises(TypeError):
+        NoWrite("s1", 1, 1)
+
+def test_failed_write_is_retried_an_interval_later():
+    async def run():
+        buffer = RecordingBuffer(flush_every=2, flush_interval=0.05, failures=1)
+        buffer.add(1)
+        buffer.add(2)   # full, the write fails and nothing else is added
+        await asyncio.sleep(0)
+        armed = buffer._flush_timer is not None
+        await asyncio.sleep(0.08)
+        return armed, buffer.writes
+    armed, writes = asyncio.run(run())
+    assert armed
+    assert writes == [[1, 2]]
+
+def test_close_retries_a_failed_write(monkeypatch):
+    monkeypatch.setattr(write_buffers, "CLOSE_RETRY_DELAY", 0.01)
+    async def run():
+        buffer = RecordingBuffer(flush_every=100, flush_interval=60, failures=2)
+        buffer.add(1)
+        return await buffer.close(), buffer.writes, buffer._flush_timer
+    assert asyncio.run(run()) == (True, [[1]], None)
+
+def test_close_gives_up_after_the_retries(monkeypatch):
+    monkeypatch.setattr(write_buffers, "CLOSE_RETRY_DELAY", 0.01)
+    async def run():
+        buffer = RecordingBuffer(flush_every=100, flush_interval=60, failures=10)
+        buffer.add(1)
+        return await buffer.close(), buffer.items, buffer._flush_timer
+    assert asyncio.run(run()) == (False, [1], None)
+
+def test_freq_stats_keep_one_counter_per_topic(mock_db):
+    async def run():
+        await create_freq_stats({"scraper_id": "s1", "freq": {"24x7.bet": 0, "$ids": 0}, "priority": {"24x7.bet": 0, "$ids": 0}})
+        buffer = FreqStatsBuffer("s1")
+        buffer.record(["24x7.bet", "$ids"])
+        buffer.record(["24x7.bet"])
+        await buffer.close()
+        return await get_freq_stats("s1")
+    stats = asyncio.run(run())
+    assert stats["freq"] == {"24x7.bet": 2, "$ids": 1}
+    assert stats["priority"] == {"24x7.bet": 0, "$ids": 0}